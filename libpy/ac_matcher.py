@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Aho–Corasick多模式匹配 - 用于在字幕中查找补充词典（人名、地名等）里的词
+
+对每条字幕只做一次线性扫描，耗时与词典大小无关，也不依赖分词结果。
+构建好的自动机按词表哈希序列化到sys_cache，词典不变时之后的运行直接加载。
+
+用法：python ac_matcher.py <词典文件> <文本>    输出文本中匹配到的词及位置
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+from collections import deque
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sys_cache")
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick自动机
+    goto: 每个状态的转移表；fail: 失配指针；longest: 以该状态结尾的最长词长度（0表示没有词）
+    """
+
+    def __init__(self, words):
+        self.goto = [{}]
+        self.fail = [0]
+        self.longest = [0]
+        for word in words:
+            if word:
+                self._insert(word)
+        self._build()
+
+    def _insert(self, word):
+        node = 0
+        for char in word:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.longest.append(0)
+            node = nxt
+        self.longest[node] = len(word)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and char not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(char, 0)
+                # 自身不是词尾时，沿失配链继承最长的词（失配链上的词一定比自身短）
+                if not self.longest[nxt]:
+                    self.longest[nxt] = self.longest[self.fail[nxt]]
+
+    def find_spans(self, text):
+        """
+        扫描文本，返回每个结束位置上最长的匹配 [(start, end), ...]
+        这些区间的并集等于所有匹配的并集，足够用来标记需要高亮的字符
+        """
+        goto, fail, longest = self.goto, self.fail, self.longest
+        spans = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if longest[node]:
+                spans.append((i + 1 - longest[node], i + 1))
+        return spans
+
+    def find_words(self, text):
+        """返回文本中匹配到的词（去重，按出现顺序）"""
+        return list(dict.fromkeys(text[start:end] for start, end in self.find_spans(text)))
+
+
+def load_matcher(words, cache_dir=CACHE_DIR):
+    """构建（或从缓存加载）词表对应的自动机"""
+    words = sorted(set(w for w in words if w))
+    digest = hashlib.sha1("\n".join(words).encode("utf-8")).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"ac_{digest}.pkl")
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    matcher = AhoCorasick(words)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"警告：写入词典自动机缓存失败：{e}")
+    return matcher
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("使用方法: python ac_matcher.py <词典文件> <文本>")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        words = [line.strip() for line in f if line.strip()]
+    text = sys.argv[2]
+    matcher = load_matcher(words)
+    for start, end in matcher.find_spans(text):
+        print(f"{start}-{end}: {text[start:end]}")
+
+
+if __name__ == "__main__":
+    main()
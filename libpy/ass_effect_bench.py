@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASS特效开销测试 - 用固定的合成字幕，在纯色背景上用ffmpeg的ass滤镜渲染每种特效，
+统计渲染帧率、CPU时间和ASS文件大小，便于为--effects选择轮播组合，以及发现性能回退。
+--overlay 另外测试静态字幕预渲染叠加（ass_overlay.py，结果中的特效名为overlay），与none的libass烧录对比。
+
+用法：
+    python ass_effect_bench.py [--effects fade,shake] [--max-chars 0,8,15] [--duration 20] [--overlay]
+                               [--json 结果.json] [--baseline 上次结果.json] [--tolerance 0.15]
+指定--baseline时，帧率下降或文件变大超过tolerance的组合视为回退，退出码为1。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+from datetime import timedelta
+
+import srt
+from srt2ass_with_effect import EFFECTS, srt2ass
+
+# 合成字幕的文本：中文长句，包含标点，足够触发自动换行
+SAMPLE_LINES = [
+    "今天我们分享的是毛姆的一篇长篇小说",
+    "月亮和六便士讲述了一个画家追求理想的故事",
+    "他放弃了伦敦的家庭和工作，去巴黎学习绘画",
+    "在塔希提岛上，他终于找到了属于自己的世界",
+]
+
+
+def write_synthetic_srt(path, duration, cue_seconds=2.0):
+    """生成覆盖duration秒的合成字幕，每条cue_seconds秒"""
+    subs = []
+    count = max(1, int(duration / cue_seconds))
+    for i in range(count):
+        start = timedelta(seconds=i * cue_seconds)
+        subs.append(srt.Subtitle(i + 1, start, start + timedelta(seconds=cue_seconds),
+                                 SAMPLE_LINES[i % len(SAMPLE_LINES)]))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(srt.compose(subs))
+
+
+def render_cost(ass_path, duration, video_size, fps, fonts_dir, filter_script=None):
+    """
+    用ass滤镜（指定filter_script时用叠加滤镜脚本）渲染到空输出，返回 (墙钟时间, 子进程CPU时间)
+    """
+    width, height = video_size
+    if filter_script:
+        filter_args = ["-filter_complex_script", filter_script, "-map", "[vout]"]
+    else:
+        filter_args = ["-vf", f"ass='{ass_path}':fontsdir='{fonts_dir}'"]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    begin = time.time()
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={fps}:d={duration}"]
+        + filter_args + ["-f", "null", "-"],
+        check=True)
+    wall = time.time() - begin
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return wall, cpu
+
+
+def run_bench(effects, max_chars_list, duration=20, video_size=(1920, 1080), fps=25,
+              font_name="鸿雷板书简体-正式版", font_size=120, fonts_dir="./sys_font", highlight=False,
+              overlay=False):
+    """
+    对每个特效和每个max_chars组合渲染一次，返回结果列表
+    overlay: 另外测试效果为none时的预渲染叠加（特效名记为overlay，PNG预渲染的时间不计入）
+    """
+    results = []
+    frames = int(duration * fps)
+    with tempfile.TemporaryDirectory(prefix="ass_bench_") as work_dir:
+        srt_path = os.path.join(work_dir, "bench.srt")
+        write_synthetic_srt(srt_path, duration)
+        for effect in effects + (["overlay"] if overlay else []):
+            for max_chars in max_chars_list:
+                ass_path = os.path.join(work_dir, f"{effect}_{max_chars}.ass")
+                overlay_dir = os.path.join(work_dir, f"overlay_{max_chars}") if effect == "overlay" else None
+                with contextlib.redirect_stdout(open(os.devnull, "w")):
+                    srt2ass(srt_path, ass_path, font_size=font_size, font_name=font_name,
+                            effect="none" if overlay_dir else effect, max_chars=max_chars, highlight=highlight,
+                            overlay_dir=overlay_dir, video_size=video_size, fonts_dir=fonts_dir)
+                filter_script = os.path.join(overlay_dir, "filter.txt") if overlay_dir else None
+                wall, cpu = render_cost(ass_path, duration, video_size, fps, fonts_dir, filter_script)
+                result = {
+                    "effect": effect,
+                    "max_chars": max_chars,
+                    "fps": frames / wall if wall > 0 else 0.0,
+                    "cpu_seconds": cpu,
+                    "ass_bytes": os.path.getsize(ass_path),
+                }
+                results.append(result)
+                print(f"{effect:<14}{max_chars:>9}{result['fps']:>10.1f}{cpu:>10.2f}{result['ass_bytes']:>12}")
+    return results
+
+
+def compare_baseline(results, baseline, tolerance=0.15):
+    """与基线结果比较，返回回退说明列表"""
+    base = {(r["effect"], r["max_chars"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = base.get((r["effect"], r["max_chars"]))
+        if not old:
+            continue
+        if r["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{r['effect']} max_chars={r['max_chars']}: 帧率 {old['fps']:.1f} -> {r['fps']:.1f}")
+        if r["ass_bytes"] > old["ass_bytes"] * (1 + tolerance):
+            regressions.append(f"{r['effect']} max_chars={r['max_chars']}: ASS大小 {old['ass_bytes']} -> {r['ass_bytes']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试各ASS特效的烧录开销（帧率、CPU时间、文件大小）')
+    parser.add_argument('--effects', default=",".join(EFFECTS), help='要测试的特效，逗号分隔（默认: 全部）')
+    parser.add_argument('--max-chars', default="0,15", help='要测试的每行最大字符数，逗号分隔（默认: 0,15）')
+    parser.add_argument('--duration', type=float, default=20, help='合成字幕时长，秒（默认: 20）')
+    parser.add_argument('--video-size', default='1920x1080', help='背景分辨率（默认: 1920x1080）')
+    parser.add_argument('--fps', type=int, default=25, help='背景帧率（默认: 25）')
+    parser.add_argument('--font', default='鸿雷板书简体-正式版', help='字体名称')
+    parser.add_argument('--size', type=int, default=120, help='字体大小')
+    parser.add_argument('--fonts-dir', default='./sys_font', help='字体目录')
+    parser.add_argument('--highlight', action='store_true', help='同时启用关键词高亮')
+    parser.add_argument('--overlay', action='store_true', help='另外测试静态字幕预渲染叠加（与none对比）')
+    parser.add_argument('--json', help='结果保存为JSON文件')
+    parser.add_argument('--baseline', help='基线结果JSON文件，用于检查性能回退')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='回退判定阈值（默认: 0.15）')
+    args = parser.parse_args()
+
+    effects = [e.strip() for e in args.effects.split(',') if e.strip()]
+    unknown = [e for e in effects if e not in EFFECTS]
+    if unknown:
+        print(f"未知的特效: {', '.join(unknown)}（可用: {', '.join(EFFECTS)}）")
+        sys.exit(1)
+    max_chars_list = [int(x) for x in args.max_chars.split(',') if x.strip()]
+    video_size = tuple(int(x) for x in args.video_size.lower().split('x'))
+
+    print(f"{'特效':<12}{'max_chars':>9}{'帧率':>8}{'CPU秒':>8}{'ASS字节':>9}")
+    try:
+        results = run_bench(effects, max_chars_list, duration=args.duration, video_size=video_size, fps=args.fps,
+                            font_name=args.font, font_size=args.size, fonts_dir=args.fonts_dir,
+                            highlight=args.highlight, overlay=args.overlay)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"测试失败（需要安装带libass的ffmpeg）: {str(e)}")
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n发现性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n与基线相比没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态字幕叠加 - 把没有动画的字幕预先渲染为透明PNG，烧录时用overlay叠加，只有动画字幕交给libass逐帧渲染
+
+静态字幕（不含\\t、\\move、\\fade、卡拉OK计时等标签）在显示期间画面不变，没必要每帧都经过libass。
+做法：
+1. 静态事件重新定时为第k秒显示一条，用一次ffmpeg（1帧/秒）全部渲染为透明PNG，
+   再统一裁剪为所有事件不透明区域的并集（各PNG尺寸相同，位置固定）
+2. 按事件的起止时间写出ffconcat列表sprites.txt：每个时间区间一帧（空白区间为透明的blank.png，
+   同时显示多条静态字幕的区间合成为combo_NNNNN.png），duration为区间长度
+3. 生成ffmpeg滤镜脚本filter.txt：movie按列表读入这一路定时图片，只用一个overlay叠加，
+   最后对剩余的动画事件（animated.ass）使用ass滤镜
+每条字幕各用一个movie和overlay时，滤镜图随字幕条数线性增长，每帧都要逐个判断enable；
+现在滤镜数与字幕条数无关。
+
+输出目录内容：static.ass、animated.ass、cue_NNNNN.png、blank.png、combo_NNNNN.png、sprites.txt、filter.txt
+烧录：ffmpeg -i 输入.mp4 -filter_complex_script <目录>/filter.txt -map "[vout]" -map "0:a?" -c:a copy 输出.mp4
+"""
+
+import os
+import re
+import glob
+import subprocess
+
+# 会让画面随时间变化的标签：\t变换、\move、\fad/\fade、卡拉OK计时
+ANIMATED_TAG_PATTERN = re.compile(r'\\(?:t\(|move\(|fade?\(|[kK][fo]?\d)')
+
+
+def is_static_event(text):
+    """事件文本不含动画标签时，整个显示期间画面不变"""
+    return not ANIMATED_TAG_PATTERN.search(text)
+
+
+def ass_time(seconds):
+    """秒数转换为ASS时间格式 (H:MM:SS.cc)"""
+    cs = int(round(seconds * 100))
+    return f"{cs // 360000:d}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def _dialogue(start, end, style, text):
+    return f"Dialogue: 0,{ass_time(start)},{ass_time(end)},{style},,0,0,0,,{text}"
+
+
+def _quote(value):
+    """滤镜参数加单引号（路径中可能有冒号、逗号）"""
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+def rasterize_static(header, static_events, overlay_dir, video_size, fonts_dir):
+    """
+    一次ffmpeg调用把所有静态事件渲染为透明PNG，第k个事件对应第k帧，统一裁剪为不透明区域的并集
+    返回: ([PNG路径, ...]（完全透明的事件为None）, 并集区域 (左, 上, 右, 下)，全部透明时为None)
+    """
+    width, height = video_size
+    raster_ass = os.path.join(overlay_dir, "static.ass")
+    with open(raster_ass, "w", encoding="utf-8") as f:
+        f.write(header)
+        f.write("\n".join(_dialogue(k, k + 1, style, text) for k, (_, _, style, text) in enumerate(static_events)) + "\n")
+
+    for old in glob.glob(os.path.join(overlay_dir, "*.png")):
+        os.remove(old)
+    raster_pattern = os.path.join(overlay_dir, "raster_%05d.png")
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error",
+         "-f", "lavfi", "-i", f"color=c=black@0.0:s={width}x{height}:r=1:d={len(static_events)},format=rgba",
+         "-vf", f"ass={_quote(raster_ass)}:alpha=1:fontsdir={_quote(fonts_dir)}",
+         "-frames:v", str(len(static_events)), "-start_number", "0", raster_pattern],
+        check=True)
+
+    from PIL import Image
+    bboxes = []
+    for k in range(len(static_events)):
+        with Image.open(raster_pattern % k) as img:
+            bboxes.append(img.getchannel("A").getbbox())
+    boxes = [bbox for bbox in bboxes if bbox]
+    box = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+           max(b[2] for b in boxes), max(b[3] for b in boxes)) if boxes else None
+
+    sprites = []
+    for k, bbox in enumerate(bboxes):
+        raster_path = raster_pattern % k
+        if bbox is None:
+            sprites.append(None)
+        else:
+            sprite_path = os.path.join(overlay_dir, f"cue_{k:05d}.png")
+            with Image.open(raster_path) as img:
+                img.crop(box).save(sprite_path)
+            sprites.append(sprite_path)
+        os.remove(raster_path)
+    return sprites, box
+
+
+def sprite_timeline(static_events, sprites):
+    """
+    按事件起止时间切分区间，返回 [(区间开始, 区间结束, (显示的事件序号, ...)), ...]，
+    从0秒开始连续覆盖到最后一条结束，没有字幕的区间序号为空
+    """
+    shown = [(start, end, k) for k, ((start, end, _, _), sprite) in enumerate(zip(static_events, sprites))
+             if sprite and end > start]
+    times = sorted({0.0} | {t for start, end, _ in shown for t in (start, end)})
+    timeline = []
+    for begin, finish in zip(times, times[1:]):
+        active = tuple(k for start, end, k in shown if start <= begin and end >= finish)
+        if timeline and timeline[-1][2] == active:
+            timeline[-1] = (timeline[-1][0], finish, active)
+        else:
+            timeline.append((begin, finish, active))
+    return timeline
+
+
+def write_sprite_list(timeline, sprites, box, overlay_dir):
+    """
+    写出ffconcat列表（文件名相对列表所在目录），返回列表路径
+    多条同时显示的事件按事件顺序合成为一张（与libass的绘制顺序一致）
+    """
+    from PIL import Image
+    size = (box[2] - box[0], box[3] - box[1])
+    blank = os.path.join(overlay_dir, "blank.png")
+    Image.new("RGBA", size, (0, 0, 0, 0)).save(blank)
+
+    combos = {}
+    lines = ["ffconcat version 1.0"]
+    for begin, finish, active in timeline:
+        if not active:
+            name = os.path.basename(blank)
+        elif len(active) == 1:
+            name = os.path.basename(sprites[active[0]])
+        else:
+            if active not in combos:
+                combo = Image.new("RGBA", size, (0, 0, 0, 0))
+                for k in active:
+                    with Image.open(sprites[k]) as img:
+                        combo.alpha_composite(img.convert("RGBA"))
+                combos[active] = f"combo_{len(combos):05d}.png"
+                combo.save(os.path.join(overlay_dir, combos[active]))
+            name = combos[active]
+        lines.append(f"file {name}")
+        lines.append(f"duration {finish - begin:.3f}")
+    # 最后一条字幕结束后换成透明帧；concat分离器忽略最后一个文件的duration，需再列一次
+    lines.append(f"file {os.path.basename(blank)}")
+    lines.append("duration 1.000")
+    lines.append(f"file {os.path.basename(blank)}")
+
+    list_path = os.path.join(overlay_dir, "sprites.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return list_path
+
+
+def build_overlay(header, events, overlay_dir, video_size=(1920, 1080), fonts_dir="./sys_font"):
+    """
+    拆分静态/动画事件，渲染静态事件并写出滤镜脚本
+    events: [(开始秒数, 结束秒数, 样式名, 事件文本), ...]
+    返回: 滤镜脚本路径
+    """
+    os.makedirs(overlay_dir, exist_ok=True)
+    static_events = [event for event in events if is_static_event(event[3])]
+    animated_events = [event for event in events if not is_static_event(event[3])]
+
+    animated_ass = os.path.join(overlay_dir, "animated.ass")
+    with open(animated_ass, "w", encoding="utf-8") as f:
+        f.write(header)
+        f.write("\n".join(_dialogue(*event) for event in animated_events) + "\n")
+
+    sprites, box = (rasterize_static(header, static_events, overlay_dir, video_size, fonts_dir)
+                    if static_events else ([], None))
+
+    filters = []
+    last = "0:v"
+    if box:
+        list_path = write_sprite_list(sprite_timeline(static_events, sprites), sprites, box, overlay_dir)
+        # 一路定时图片：每个区间一帧，overlay始终使用时间戳不晚于当前帧的最近一张
+        filters.append(f"movie={_quote(os.path.abspath(list_path))}:f=concat[subs]")
+        filters.append(f"[{last}][subs]overlay=x={box[0]}:y={box[1]}:eof_action=pass[static]")
+        last = "static"
+    if animated_events:
+        filters.append(f"[{last}]ass={_quote(os.path.abspath(animated_ass))}:fontsdir={_quote(fonts_dir)}[vout]")
+    else:
+        filters.append(f"[{last}]null[vout]")
+
+    filter_path = os.path.join(overlay_dir, "filter.txt")
+    with open(filter_path, "w", encoding="utf-8") as f:
+        f.write(";\n".join(filters) + "\n")
+    print(f"静态字幕 {len(static_events)} 条已预渲染为PNG（一路定时图片叠加），动画字幕 {len(animated_events)} 条交给libass")
+    print(f"叠加滤镜脚本: {filter_path}")
+    return filter_path
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解码音频缓存 - 每个音频文件只解码一次，供时长探测、静音分析、语音识别等共用
+
+解码结果以 .npy 保存在音频文件旁边，文件名带内容哈希：
+    result.wav.<hash>.16k.npy        16kHz 单声道 float32（语音识别/静音分析）
+    result.wav.<hash>.pcm24000.npy   原始采样率 int16，形状 (采样数, 声道数)
+读取时使用 np.load(mmap_mode='r')，多个进程共享同一份页缓存，不产生拷贝。
+16kHz缓存由ffmpeg重采样（-ac 1 -ar 16000，带抗混叠滤波，与Whisper自己加载音频的方式相同），原始采样率已是16kHz时只混为单声道。
+缓存先写临时文件再改名；音频内容变化后只删除哈希不一致的旧缓存，不影响其他进程正在写入或读取的当前缓存。
+
+用法：
+    python audio_cache.py duration <音频文件>    输出音频时长（秒，不解码）
+    python audio_cache.py warm <音频文件>        预先解码并写入缓存
+"""
+
+import os
+import re
+import sys
+import json
+import wave
+import hashlib
+import subprocess
+import numpy as np
+
+ASR_SAMPLE_RATE = 16000
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_hash(path):
+    """计算文件内容哈希；文件大小和修改时间未变时直接复用上次的结果"""
+    meta_path = f"{path}.audio_cache.json"
+    key = _stat_key(path)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("size") == key["size"] and meta.get("mtime_ns") == key["mtime_ns"]:
+            return meta["hash"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()[:16]
+    tmp_path = f"{meta_path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(key, hash=digest), f)
+        os.replace(tmp_path, meta_path)
+    except OSError:
+        pass
+    return digest
+
+
+def _decode_wav(path):
+    """用wave模块读取WAV，返回 (int16采样 (n, 声道数), 采样率)"""
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+
+    if sampwidth == 1:
+        pcm = ((np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8)
+    elif sampwidth == 2:
+        pcm = np.frombuffer(raw, dtype="<i2")
+    elif sampwidth == 3:
+        # 24bit只保留高16位
+        pcm = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)[:, 1:].copy().view("<i2").reshape(-1)
+    elif sampwidth == 4:
+        pcm = (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"不支持的采样位宽: {sampwidth * 8} bit")
+    return pcm.reshape(-1, channels), rate
+
+
+def _decode_ffmpeg(path):
+    """用ffmpeg解码非WAV音频，返回 (int16采样 (n, 声道数), 采样率)"""
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate,channels",
+         "-of", "json", path],
+        capture_output=True, check=True, text=True)
+    stream = json.loads(probe.stdout)["streams"][0]
+    rate = int(stream["sample_rate"])
+    channels = int(stream["channels"])
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+        capture_output=True, check=True)
+    return np.frombuffer(out.stdout, dtype="<i2").reshape(-1, channels), rate
+
+
+def _asr_audio(path, pcm, rate):
+    """
+    16kHz单声道float32
+    采样率已是16kHz时直接混为单声道；否则由ffmpeg重采样（线性插值没有低通滤波，高频会混叠到语音频段）
+    """
+    if rate == ASR_SAMPLE_RATE or len(pcm) == 0:
+        return (pcm.astype(np.float32).mean(axis=1) / 32768.0).astype(np.float32)
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-vn", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE),
+         "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+        capture_output=True, check=True)
+    return np.frombuffer(out.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.tmp{os.getpid()}.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _cache_entries(path):
+    """音频文件旁已完成的缓存 [(哈希, 类型（16k/pcm采样率）, 缓存路径), ...]（不含其他进程正在写入的临时文件）"""
+    directory = os.path.dirname(path) or "."
+    pattern = re.compile(re.escape(os.path.basename(path)) + r"\.([0-9a-f]{16})\.(16k|pcm\d+)\.npy")
+    entries = []
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if match:
+            entries.append((match.group(1), match.group(2), os.path.join(directory, name)))
+    return entries
+
+
+def ensure_cache(path):
+    """确保音频文件已解码缓存，返回 (16k缓存路径, 原始PCM缓存路径)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"音频文件不存在: {path}")
+
+    digest = file_hash(path)
+    asr_path = f"{path}.{digest}.16k.npy"
+    entries = _cache_entries(path)
+    existing = [p for d, kind, p in entries if d == digest and kind.startswith("pcm")]
+    if os.path.exists(asr_path) and existing:
+        return asr_path, existing[0]
+
+    if path.lower().endswith(".wav"):
+        try:
+            pcm, rate = _decode_wav(path)
+        except (wave.Error, EOFError):
+            pcm, rate = _decode_ffmpeg(path)
+    else:
+        pcm, rate = _decode_ffmpeg(path)
+
+    pcm_path = f"{path}.{digest}.pcm{rate}.npy"
+    if not os.path.exists(pcm_path):
+        _save_npy(pcm_path, np.ascontiguousarray(pcm))
+    if not os.path.exists(asr_path):
+        _save_npy(asr_path, _asr_audio(path, pcm, rate))
+
+    # 内容变化后清理旧缓存：只删除哈希不一致的
+    for old_digest, _, old in entries:
+        if old_digest != digest:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return asr_path, pcm_path
+
+
+def load_audio(path):
+    """16kHz单声道float32音频（只读内存映射）"""
+    asr_path, _ = ensure_cache(path)
+    return np.load(asr_path, mmap_mode="r")
+
+
+def load_pcm(path):
+    """原始采样率的int16 PCM（只读内存映射），返回 (采样 (n, 声道数), 采样率)"""
+    _, pcm_path = ensure_cache(path)
+    rate = int(pcm_path.rsplit(".pcm", 1)[1][:-len(".npy")])
+    return np.load(pcm_path, mmap_mode="r"), rate
+
+
+def probe_duration(path):
+    """
+    音频时长（秒）：WAV读文件头，其他格式用ffprobe
+    只为时长不解码、不哈希整个文件（解码缓存在真正需要采样时才生成）
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as wf:
+                return wf.getnframes() / wf.getframerate()
+        except (wave.Error, EOFError):
+            pass
+    out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+                         capture_output=True, check=True, text=True)
+    return float(out.stdout.strip())
+
+
+def join_pcm(parts, out_path, block=1 << 20):
+    """
+    按采样精确拼接多段音频为一个WAV，供最终合成时只编码一次AAC
+    parts: [(音频文件, 时长秒数), ...]，每段补静音或截断到对应视频段的时长，保证各段边界与视频对齐
+    各段采样率必须一致；单声道与立体声混合时统一为最多的声道数
+    """
+    loaded = [(load_pcm(path), duration) for path, duration in parts]
+    rates = {rate for (_, rate), _ in loaded}
+    if len(rates) != 1:
+        raise ValueError(f"各段音频采样率不一致: {sorted(rates)}")
+    rate = rates.pop()
+    channels = max(pcm.shape[1] for (pcm, _), _ in loaded)
+
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    with wave.open(tmp_path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        for (pcm, _), duration in loaded:
+            n = int(round(duration * rate))
+            used = min(n, pcm.shape[0])
+            for start in range(0, used, block):
+                chunk = np.asarray(pcm[start:min(start + block, used)])
+                if chunk.shape[1] != channels:
+                    chunk = np.repeat(chunk[:, :1], channels, axis=1)
+                wf.writeframes(np.ascontiguousarray(chunk, dtype="<i2").tobytes())
+            if n > used:
+                wf.writeframes(np.zeros((n - used, channels), dtype="<i2").tobytes())
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("duration", "warm"):
+        print("使用方法:")
+        print("python audio_cache.py duration <音频文件>")
+        print("python audio_cache.py warm <音频文件>")
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    try:
+        if command == "duration":
+            print(f"{probe_duration(path):.3f}")
+        else:
+            asr_path, pcm_path = ensure_cache(path)
+            print(f"已缓存: {asr_path}")
+            print(f"已缓存: {pcm_path}")
+    except Exception as e:
+        print(f"音频缓存失败: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景视频缓存 - 多段共用的同一张背景图只做一次缩放、动效和叠加，各段渲染时直接解码缓存的背景视频
+
+以（图片内容哈希、动效、尺寸、帧率、编码参数）为键，在 sys_cache/backgrounds/ 中保存一段较长的背景视频。
+part_render.py --bg-cache 读取其前duration秒作为背景，替代逐帧的图片缩放、动效滤镜和叠加；
+字幕和标题仍需烧录，所以背景只是换了来源，整段仍然编码一次（不是流复制截取）。
+缓存背景用无损H.264（-qp 0）编码，解码后与直接生成的背景相同，不增加一次有损编码。
+需要的时长超过缓存长度时，按两倍长度重新生成。
+
+缓存背景要解码整段无损视频，是否比直接缩放图片更快取决于机器和动效，先测量再启用
+（sys_common.sh的bg_cache设置，默认关闭）：
+    python bg_cache.py bench <背景图> [--effect none] [--duration 60]
+
+只有画面与总时长无关的效果可以缓存：none、move_*、swing。
+纯色背景不缓存：lavfi的color源几乎没有开销，解码缓存视频反而更慢。
+
+旧的（较短的）缓存背景可能正被其他段的渲染读取：读取方在使用期间持有 <键>.lock 的共享锁，
+生成新背景后只有拿到排他锁（没有其他读取方）时才删除旧文件，否则留到下次。
+"""
+
+import os
+import sys
+import glob
+import math
+import time
+import fcntl
+import hashlib
+import argparse
+import subprocess
+
+from part_render import build_command
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT_DIR, "sys_cache", "backgrounds")
+CACHEABLE_EFFECTS = {"none", "move_right", "move_left", "move_up", "move_down", "swing"}
+# 编码参数变化时缓存自动失效
+ENCODE_PROFILE = "libx264-ultrafast-qp0-yuv420p-gop1s"
+MIN_CLIP_SECONDS = 120
+
+
+def is_cacheable(image=None, effect="none"):
+    """有背景图、且画面只与时间t有关、与总时长无关时才缓存"""
+    return bool(image) and effect in CACHEABLE_EFFECTS
+
+
+def _image_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(image, bg_color="black", effect="none", width=1536, height=900, fps=30, zoom=1.0, speed=1.0):
+    raw = (f"image:{_image_hash(image)}|{bg_color}|{effect}|{width}x{height}|{fps}|{zoom:g}|{speed:g}"
+           f"|{ENCODE_PROFILE}")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _cached_clips(key, cache_dir):
+    """已有的缓存背景 [(时长, 路径), ...]，按时长从长到短"""
+    clips = []
+    for path in glob.glob(os.path.join(cache_dir, f"{key}_*s.mp4")):
+        try:
+            clips.append((int(os.path.basename(path)[len(key) + 1:-len("s.mp4")]), path))
+        except ValueError:
+            continue
+    return sorted(clips, reverse=True)
+
+
+def _prune(lock_file, old_clips):
+    """没有其他读取方时删除旧的缓存背景；锁从共享转为排他失败则保留"""
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # 转换失败时原来的共享锁已经被释放，需要重新加上
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        return
+    try:
+        for path in old_clips:
+            if os.path.exists(path):
+                os.remove(path)
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+
+
+def open_clip(duration, image, bg_color="black", effect="none", width=1536, height=900, fps=30,
+              zoom=1.0, speed=1.0, cache_dir=CACHE_DIR):
+    """
+    返回 (至少duration秒的缓存背景路径, 锁文件)，没有时生成
+    调用方在读取完背景之前保持锁文件打开（共享锁），用完后close
+    """
+    key = cache_key(image, bg_color, effect, width, height, fps, zoom, speed)
+    os.makedirs(cache_dir, exist_ok=True)
+    lock_file = open(os.path.join(cache_dir, f"{key}.lock"), "a")
+    fcntl.flock(lock_file, fcntl.LOCK_SH)
+    try:
+        clips = _cached_clips(key, cache_dir)
+        if clips and clips[0][0] >= duration:
+            return clips[0][1], lock_file
+
+        length = max(MIN_CLIP_SECONDS, int(math.ceil(duration)), 2 * clips[0][0] if clips else 0)
+        path = os.path.join(cache_dir, f"{key}_{length}s.mp4")
+        tmp_path = f"{path}.tmp{os.getpid()}.mp4"
+        cmd = build_command(None, tmp_path, length, image=image, bg_color=bg_color, effect=effect,
+                            width=width, height=height, fps=fps, zoom=zoom, speed=speed, audio=False)
+        # 无损编码（解码结果与直接生成的背景相同）；每秒一个关键帧，分段并行渲染（--chunks）从整秒处读取时
+        # 不需要从很远的关键帧开始解码
+        preset = cmd.index("-preset")
+        cmd[preset:preset + 4] = ["-preset", "ultrafast", "-qp", "0"]
+        cmd[-1:-1] = ["-force_key_frames", "expr:gte(t,n_forced)", "-sc_threshold", "0"]
+        print(f"生成缓存背景（{length}秒）: {path}")
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        _prune(lock_file, [old for _, old in clips if old != path])
+        if not os.path.exists(path):
+            # 重新加共享锁的间隙中被其他进程当作旧背景删除了
+            lock_file.close()
+            return open_clip(duration, image, bg_color, effect, width, height, fps, zoom, speed, cache_dir)
+        return path, lock_file
+    except BaseException:
+        lock_file.close()
+        raise
+
+
+def _timed(cmd):
+    begin = time.time()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.time() - begin
+
+
+def bench(image, duration=60, effect="none", width=1536, height=900, fps=30, cache_dir=CACHE_DIR):
+    """
+    同一背景图分别直接生成背景和读取缓存背景，渲染duration秒（同样编码，输出到空设备）
+    返回 {"direct": 秒, "cached": 秒, "build": 生成缓存的秒数（已有缓存时为0）}
+    """
+    def null_output(cmd):
+        return cmd[:-1] + ["-f", "null", "-"]
+
+    direct = _timed(null_output(build_command(None, "-", duration, image=image, effect=effect, width=width,
+                                              height=height, fps=fps, audio=False)))
+    begin = time.time()
+    clip, lock_file = open_clip(duration, image, effect=effect, width=width, height=height, fps=fps,
+                                cache_dir=cache_dir)
+    build = time.time() - begin
+    try:
+        cached = _timed(null_output(build_command(None, "-", duration, bg_clip=clip, width=width, height=height,
+                                                  fps=fps, audio=False)))
+    finally:
+        lock_file.close()
+    return {"direct": direct, "cached": cached, "build": build}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='背景视频缓存（测量缓存背景与直接生成背景的渲染耗时）')
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench_parser = sub.add_parser('bench', help='测量同一背景图直接渲染和使用缓存背景渲染的耗时')
+    bench_parser.add_argument('image', help='背景图片')
+    bench_parser.add_argument('-e', '--effect', default='none', help='图片动态效果（默认: none）')
+    bench_parser.add_argument('--duration', type=int, default=60, help='渲染时长，秒（默认: 60）')
+    bench_parser.add_argument('-w', '--width', type=int, default=1536, help='输出宽度（默认: 1536）')
+    bench_parser.add_argument('--height', type=int, default=900, help='输出高度（默认: 900）')
+    bench_parser.add_argument('-f', '--fps', type=int, default=30, help='帧率（默认: 30）')
+    args = parser.parse_args()
+
+    if not is_cacheable(args.image, args.effect):
+        print(f"效果 {args.effect} 不能缓存（可缓存: {', '.join(sorted(CACHEABLE_EFFECTS))}）")
+        sys.exit(1)
+    try:
+        result = bench(args.image, args.duration, args.effect, args.width, args.height, args.fps)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"测量失败: {str(e)}")
+        sys.exit(1)
+    print(f"直接生成背景: {result['direct']:.2f} 秒")
+    print(f"使用缓存背景: {result['cached']:.2f} 秒（生成缓存 {result['build']:.2f} 秒，只在第一次需要）")
+    saved = result["direct"] - result["cached"]
+    if saved > 0:
+        print(f"每段节省 {saved:.2f} 秒（{saved / result['direct']:.0%}），可以设置 bg_cache=true")
+    else:
+        print("缓存背景没有更快，保持 bg_cache=false")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整本书并发渲染 - 替代x_run_*.sh中all函数逐段串行执行content_video_gen的方式
+
+书文本按text_partition.py分段（--target指定每段的目标朗读时长，0表示一行一段；语速校准固定在
+<输出目录>/partition_calibration.json，--recalibrate重新校准；编号超出段数的旧段目录合并时忽略，--prune-stale才删除），各段并发推进，每段内部仍按
+语音生成 -> 语音识别 -> 字幕对齐 -> ASS -> 图片视频 -> 烧录字幕 的顺序执行。
+不同资源分别限制并发数：
+    tts     同时进行的网络任务数（语音服务排队从提交到下载完成一直占用，内容图获取也计入）
+    asr     同时运行的语音识别（Whisper）进程数
+    cpu     字幕对齐、ASS生成等轻量步骤
+    ffmpeg  同时运行的ffmpeg编码数
+这样语音服务排队、Whisper识别和ffmpeg编码可以重叠进行，不再互相等待。
+
+每段的阶段定义和缓存复用pipeline.py：输入和参数未变化的阶段直接跳过，中断后重跑会从断点继续。
+语音生成改为每段使用不同的输出文件名提交，由一个后台线程统一下载并按文件名分发到各段目录，
+避免原voice_gen中清空服务器数据、固定文件名result导致的并发冲突。
+
+输出目录与原脚本一致：<输出目录>/NNN/x_final.mp4，merge函数无需修改；
+每段的详细日志在 NNN/render.log，整体进度在 <输出目录>/render_progress.json。
+指定--scratch时各段的中间文件写到临时目录（如tmpfs），成功后只把最终产物移回NNN/（见workdir.py），
+清单和语音、识别结果也保存在NNN/，修改字幕参数后重跑不会重新生成语音和识别。
+
+用法：
+    python book_renderer.py <书文本> <输出目录> --voice <音色> [--first-id 2] [--parts 2,5] [--target 60 [--recalibrate]] [--prune-stale]
+                            [--tts 4] [--asr 1] [--ffmpeg 2] [--var 变量=值 ...]
+                            [--scratch 临时目录 [--keep-intermediates]]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from text_partition import CALIBRATION_NAME, frozen_calibration, partition, report_stale_parts
+from workdir import PartWorkdir
+from pipeline import (ROOT_DIR, Manifest, MANIFEST_NAME, PERSIST_ARTIFACTS, content_stages, is_up_to_date,
+                      load_shell_defaults, pipeline_key, run_pipeline, stage_key)
+
+TTS_FOLDER_ID = 4
+PIC_NAME = "pic_cover_0.jpg"
+
+
+class TtsQueue:
+    """
+    语音生成队列：提交任务后由一个后台线程定期下载服务器上的语音文件，
+    按文件名（提交时的输出名 + .wav）移动到对应段的目录
+    """
+
+    def __init__(self, inbox_dir, poll_interval=10, timeout=1800):
+        self.inbox_dir = inbox_dir
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        os.makedirs(inbox_dir, exist_ok=True)
+
+    def start(self):
+        # 只在开始时清空一次服务器上的语音数据，之后各段并发提交
+        subprocess.run(["python", "libpy/api_operate.py", "clear", str(TTS_FOLDER_ID)], cwd=ROOT_DIR,
+                       stdout=subprocess.DEVNULL)
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def _deliver(self):
+        with self.lock:
+            items = list(self.pending.items())
+        for name, (target, done) in items:
+            path = os.path.join(self.inbox_dir, f"{name}.wav")
+            if os.path.exists(path):
+                os.replace(path, target)
+                with self.lock:
+                    self.pending.pop(name, None)
+                done.set()
+
+    def _poll(self):
+        while not self.stopped.is_set():
+            with self.lock:
+                waiting = bool(self.pending)
+            if waiting:
+                subprocess.run(["python", "libpy/download_wavs.py", str(TTS_FOLDER_ID), "--delete-after-download",
+                                "-d", self.inbox_dir], cwd=ROOT_DIR, stdout=subprocess.DEVNULL)
+                self._deliver()
+            self.stopped.wait(self.poll_interval)
+
+    def synthesize(self, text_file, name, voice, target, log=None):
+        """提交语音生成任务并等待下载到target"""
+        done = threading.Event()
+        with self.lock:
+            self.pending[name] = (target, done)
+        result = subprocess.run(["python", "libpy/clone_voice.py", "-f", text_file, "-o", name, "-v", voice],
+                                cwd=ROOT_DIR, stdout=log, stderr=log)
+        if result.returncode != 0 or not done.wait(self.timeout):
+            with self.lock:
+                self.pending.pop(name, None)
+            raise RuntimeError(f"语音生成失败或超时: {name}")
+
+
+class Progress:
+    """记录每段当前所处的阶段和状态，写入JSON文件并在终端输出一行"""
+
+    def __init__(self, path, part_ids):
+        self.path = path
+        self.lock = threading.Lock()
+        self.parts = {part_id: {"stage": "等待", "status": ""} for part_id in part_ids}
+        self._save()
+
+    def update(self, part_id, stage, status):
+        with self.lock:
+            self.parts[part_id] = {"stage": stage, "status": status, "time": time.strftime("%H:%M:%S")}
+            finished = sum(1 for p in self.parts.values() if p["stage"] == "全部" and p["status"] == "完成")
+            self._save()
+        print(f"[{part_id}] {stage} {status}（已完成 {finished}/{len(self.parts)} 段）", flush=True)
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.parts, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def render_part(part_id, text, base_dir, voice, shell_vars, tts, limits, progress, scratch=None, keep=False):
+    """
+    渲染一段：准备文案和内容图，生成语音，然后执行pipeline中的其余阶段
+    文案、内容图和日志留在段目录，各阶段的输出在工作目录（指定scratch时在临时目录中）
+    """
+    part_dir = os.path.join(base_dir, part_id)
+    os.makedirs(part_dir, exist_ok=True)
+    content_file = os.path.join(part_dir, "content.txt")
+    content_fix = os.path.join(part_dir, "content_fix.txt")
+    pic_file = os.path.join(part_dir, PIC_NAME)
+    report = lambda stage, status: progress.update(part_id, stage, status)
+
+    with open(os.path.join(part_dir, "render.log"), "a", encoding="utf-8") as log:
+        with open(content_file, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        subprocess.run(["python", "libpy/remove_ending_numbers.py", content_file, content_fix],
+                       cwd=ROOT_DIR, stdout=log, stderr=log, check=True)
+
+        if not os.path.exists(pic_file):
+            report("content_pic_get", "开始")
+            with limits["tts"]:
+                subprocess.run(["python", "libpy/coze_content_pic_gen.py", part_dir, text],
+                               cwd=ROOT_DIR, stdout=log, stderr=log)
+            if not os.path.exists(pic_file):
+                raise RuntimeError("内容图下载失败")
+
+        finals = ["x_final.mp4"] + (["result.wav"] if shell_vars.get("intermediate_audio") == "none" else [])
+        workdir = PartWorkdir(part_dir, scratch, keep=keep, finals=finals, persist=PERSIST_ARTIFACTS)
+        stages, final_video = content_stages(workdir.path, content_fix, pic_file, voice, shell_vars)
+        manifest = Manifest(os.path.join(workdir.path, MANIFEST_NAME))
+        done_key = pipeline_key(stages, manifest)
+        if workdir.is_done(done_key):
+            report("全部", "跳过")
+            return
+
+        # 语音阶段由TtsQueue完成，完成后按pipeline的键记入清单，下次内容和音色不变时跳过
+        voice_stage = stages[0]
+        if is_up_to_date(voice_stage, manifest, stage_key(voice_stage, manifest)):
+            report(voice_stage.name, "跳过")
+        else:
+            report(voice_stage.name, "开始")
+            with limits["tts"]:
+                name = f"{os.path.basename(os.path.abspath(base_dir))}_{part_id}"
+                tts.synthesize(content_fix, name, voice, voice_stage.outputs[0], log=log)
+            manifest.stages[voice_stage.name] = stage_key(voice_stage, manifest)
+            manifest.save()
+            report(voice_stage.name, "完成")
+
+        run_pipeline(stages[1:], manifest, limits=limits, log=log, progress=report)
+        shutil.copyfile(final_video, os.path.join(workdir.path, "x_final.mp4"))
+        workdir.finish(done_key)
+
+
+def read_parts(book_file, first_id=2, target=0, calibration_file=None, recalibrate=False):
+    """
+    按预计朗读时长切分书文本（target为0时一行一段），返回 [(NNN, 文本), ...]
+    校准结果保存在calibration_file，同一本书重复运行时段的边界不变
+    """
+    with open(book_file, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    sec_per_char, sec_per_part = 0, 0
+    if target > 0:
+        sec_per_char, sec_per_part, _ = frozen_calibration(calibration_file, os.path.join(ROOT_DIR, "data_*"),
+                                                           recalibrate)
+    parts = partition(lines, target, sec_per_char, sec_per_part)
+    return [(f"{first_id + i:03d}", text) for i, (text, _) in enumerate(parts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='整本书按段并发渲染（各资源分别限制并发数）')
+    parser.add_argument('book_file', help='书文本')
+    parser.add_argument('base_dir', help='输出目录（如data_history），每段输出到 <目录>/NNN/x_final.mp4')
+    parser.add_argument('--voice', required=True, help='音色')
+    parser.add_argument('--first-id', type=int, default=2, help='第一段的编号（默认: 2，000/001留给封面）')
+    parser.add_argument('--parts', help='只渲染指定编号的段，逗号分隔（如"2,5"）')
+    parser.add_argument('--target', type=float, default=0, help='每段目标朗读时长（秒，默认: 0表示一行一段）')
+    parser.add_argument('--recalibrate', action='store_true', help=f'重新校准语速并覆盖输出目录中的{CALIBRATION_NAME}')
+    parser.add_argument('--prune-stale', action='store_true', help='删除编号超出本次段数的旧段目录（其中的渲染结果会丢失）')
+    parser.add_argument('--tts', type=int, default=4, help='同时排队的语音生成任务数（默认: 4）')
+    parser.add_argument('--asr', type=int, default=1, help='同时运行的语音识别进程数（默认: 1）')
+    parser.add_argument('--ffmpeg', type=int, default=2, help='同时运行的ffmpeg编码数（默认: 2）')
+    parser.add_argument('--var', action='append', default=[], help='sys_common.sh设置变量，格式: 变量=值（可多次指定）')
+    parser.add_argument('--scratch', help='中间文件所在的临时目录（如/dev/shm下的目录），成功后只保留最终产物')
+    parser.add_argument('--keep-intermediates', action='store_true', help='使用临时目录时仍把全部中间文件移回段目录（调试用）')
+    args = parser.parse_args()
+
+    shell_vars = load_shell_defaults()
+    for item in args.var:
+        name, sep, value = item.partition('=')
+        if not sep:
+            print(f"无效的变量设置: {item}（格式: 变量=值）")
+            sys.exit(1)
+        shell_vars[name] = value
+
+    # 之后会切换到项目根目录，路径参数先按调用时的当前目录转为绝对路径
+    base_dir = os.path.abspath(args.base_dir)
+    scratch = os.path.abspath(args.scratch) if args.scratch else None
+    parts = read_parts(args.book_file, args.first_id, args.target,
+                       os.path.join(base_dir, CALIBRATION_NAME), args.recalibrate)
+    # 记录段编号范围（合并时忽略上次分段更多时留下的旧段目录），旧段目录只在--prune-stale时删除
+    os.makedirs(base_dir, exist_ok=True)
+    report_stale_parts(base_dir, args.first_id, len(parts), args.prune_stale)
+    if args.parts:
+        wanted = {int(x) for x in args.parts.split(',') if x.strip()}
+        parts = [(part_id, text) for part_id, text in parts if int(part_id) in wanted]
+    if not parts:
+        print("没有需要渲染的段")
+        sys.exit(1)
+
+    os.chdir(ROOT_DIR)
+    limits = {
+        "tts": threading.BoundedSemaphore(args.tts),
+        "asr": threading.BoundedSemaphore(args.asr),
+        "cpu": threading.BoundedSemaphore(os.cpu_count() or 1),
+        "ffmpeg": threading.BoundedSemaphore(args.ffmpeg),
+    }
+    progress = Progress(os.path.join(base_dir, "render_progress.json"), [part_id for part_id, _ in parts])
+    tts = TtsQueue(os.path.join(base_dir, "tts_inbox"))
+    tts.start()
+    print(f"共 {len(parts)} 段，并发限制: 语音 {args.tts}，识别 {args.asr}，ffmpeg {args.ffmpeg}")
+
+    failed = []
+
+    def worker(part):
+        part_id, text = part
+        try:
+            render_part(part_id, text, base_dir, args.voice, shell_vars, tts, limits, progress,
+                        scratch=scratch, keep=args.keep_intermediates)
+            progress.update(part_id, "全部", "完成")
+        except Exception as e:
+            # 任何异常都只算这一段失败，记录下来，其余段继续渲染
+            failed.append(part_id)
+            progress.update(part_id, "全部", f"失败: {type(e).__name__}: {str(e)}")
+
+    try:
+        # 线程大多在等待资源，线程数按段数设置，实际并发由各资源的信号量控制
+        with ThreadPoolExecutor(max_workers=min(len(parts), 64)) as pool:
+            list(pool.map(worker, parts))
+    finally:
+        tts.stop()
+
+    if failed:
+        print(f"\n以下段渲染失败（详见各段render.log）: {', '.join(sorted(failed))}")
+        sys.exit(1)
+    print(f"\n全部 {len(parts)} 段渲染完成，输出目录: {base_dir}")
+
+
+if __name__ == "__main__":
+    main()
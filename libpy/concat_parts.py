@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各段视频的兼容性检查与分层拼接 - 支持上千段，拼接始终是流复制
+
+原merge只查找前100段、遇到缺失的段就停止，并且假定所有段都能直接 -c copy 拼接；
+但封面段和内容页来自不同脚本，编码参数可能不同，直接流复制会得到花屏或时间戳错乱的视频。
+这里：
+    1. 按编号扫描 <目录>/NNN/x_final.mp4（不限段数，缺失的编号只提示不中断；
+       有text_partition.py记录的part_range.json时只到最后一段为止，之后的旧段目录忽略）
+    2. 并行ffprobe各段的视频/音频参数（编码、档次、分辨率、像素格式、帧率、采样率、声道）
+    3. 以段数最多的一组参数为基准，只把不一致的段重新编码为基准参数（保存为同目录的x_final_norm.mp4，
+       旁边的x_final_norm.mp4.json记录源文件和基准参数，两者都未变时才复用）
+    4. 段数超过--group时先每组流复制拼接成中间文件，再拼接中间文件
+各段目录不变，final_assemble.py --part-wav 仍能找到每段的result.wav。
+--list-out写出的列表在每段后用注释（# duration 秒）记录探测到的时长，final_assemble.py读到后不再重复探测。
+
+用法：
+    python concat_parts.py <输出目录> [-o 拼接结果.mp4] [--list-out video_list.txt]
+                           [--name x_final.mp4] [--workers 8] [--ffmpeg 2] [--group 200]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from text_partition import read_part_range
+
+NORM_SUFFIX = "_norm"
+NORM_META_EXT = ".json"
+GROUP_SIZE = 200
+
+
+def _quote(value):
+    """concat列表中的路径加单引号"""
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+def collect_parts(base_dir, name="x_final.mp4"):
+    """按编号顺序返回 <目录>/NNN/<name>，以及缺失的编号；有分段记录时编号超过最后一段的目录忽略"""
+    ids = sorted(int(d) for d in os.listdir(base_dir)
+                 if re.fullmatch(r"\d{3,}", d) and os.path.isdir(os.path.join(base_dir, d)))
+    part_range = read_part_range(base_dir)
+    if part_range:
+        ignored = [part_id for part_id in ids if part_id > part_range[1]]
+        if ignored:
+            print(f"警告: 以下段目录超出分段记录的最后一段 {part_range[1]:03d}，已忽略: "
+                  f"{', '.join(f'{part_id:03d}' for part_id in ignored)}")
+        ids = [part_id for part_id in ids if part_id <= part_range[1]]
+    # 有分段记录时扫描到最后一段，尚未渲染的段也会提示
+    last = part_range[1] if part_range else (ids[-1] if ids else -1)
+    videos, missing = [], []
+    for part_id in range(ids[0], last + 1) if ids else []:
+        path = os.path.join(base_dir, f"{part_id:03d}", name)
+        if os.path.isfile(path):
+            videos.append(path)
+        else:
+            missing.append(f"{part_id:03d}")
+    return videos, missing
+
+
+def probe(path):
+    """
+    ffprobe一段视频，返回 {"duration": 秒, "video": (参数...), "audio": (参数...) 或 None}
+    参数一致的段才能流复制拼接
+    """
+    out = subprocess.run(["ffprobe", "-v", "error", "-show_entries",
+                          "format=duration:stream=codec_type,codec_name,profile,level,width,height,pix_fmt,"
+                          "r_frame_rate,sample_rate,channels",
+                          "-of", "json", path], capture_output=True, text=True, check=True).stdout
+    info = json.loads(out)
+    video = audio = None
+    for s in info.get("streams", []):
+        if s.get("codec_type") == "video" and video is None:
+            video = (s.get("codec_name"), s.get("profile"), s.get("level"), s.get("width"), s.get("height"),
+                     s.get("pix_fmt"), s.get("r_frame_rate"))
+        elif s.get("codec_type") == "audio" and audio is None:
+            audio = (s.get("codec_name"), s.get("sample_rate"), s.get("channels"))
+    return {"duration": float(info["format"]["duration"]), "video": video, "audio": audio}
+
+
+def probe_all(paths, workers=8):
+    """并行ffprobe，结果与paths顺序一致"""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(probe, paths))
+
+
+def reference_profile(infos):
+    """段数最多的一组 (视频参数, 音频参数) 作为基准"""
+    return Counter((info["video"], info["audio"]) for info in infos).most_common(1)[0][0]
+
+
+def normalize_command(src, dst, reference, has_audio=True):
+    """把一段重新编码为基准参数（缩放并补边到基准分辨率，帧率、像素格式、档次一致）"""
+    (codec, profile, level, width, height, pix_fmt, fps), audio = reference
+    vf = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+          f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format={pix_fmt}")
+    cmd = ["ffmpeg", "-y", "-i", src]
+    if audio and not has_audio:
+        # 基准带音轨而这一段没有时补静音，保证拼接后音视频对齐
+        layout = "mono" if audio[2] == 1 else "stereo"
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={audio[1]}:cl={layout}", "-shortest"]
+    cmd += ["-map", "0:v:0", "-vf", vf]
+    if codec == "hevc":
+        cmd += ["-c:v", "libx265"]
+    else:
+        cmd += ["-c:v", "libx264"]
+        if profile:
+            cmd += ["-profile:v", profile.lower().replace("constrained ", "")]
+        if level and level > 0:
+            cmd += ["-level", f"{level / 10:g}"]
+    cmd += ["-preset", "medium", "-crf", "23"]
+    if audio:
+        audio_codec, sample_rate, channels = audio
+        cmd += ["-map", "0:a:0" if has_audio else "1:a:0", "-c:a", audio_codec, "-ar", str(sample_rate),
+                "-ac", str(channels)]
+    else:
+        cmd += ["-an"]
+    return cmd + [dst]
+
+
+def norm_meta(video, reference):
+    """重新编码结果对应的源文件（大小、修改时间）和基准参数，按JSON读回后的形式比较"""
+    st = os.stat(video)
+    return json.loads(json.dumps({"source": [st.st_size, st.st_mtime_ns], "reference": reference}))
+
+
+def _read_meta(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def normalize_parts(videos, infos, reference, ffmpeg_workers=2):
+    """
+    把与基准不一致的段重新编码，返回 (拼接用的视频列表, 重新编码的段数)
+    已有的x_final_norm.mp4只在记录的源文件和基准参数都与本次一致时复用
+    """
+    def work(item):
+        video, info = item
+        if (info["video"], info["audio"]) == reference:
+            return video, False
+        root, ext = os.path.splitext(video)
+        norm = f"{root}{NORM_SUFFIX}{ext}"
+        meta_file = norm + NORM_META_EXT
+        meta = norm_meta(video, reference)
+        if os.path.exists(norm) and _read_meta(meta_file) == meta:
+            return norm, False
+        tmp_path = f"{norm}.tmp{os.getpid()}{ext}"
+        print(f"重新编码为基准参数: {video}")
+        try:
+            subprocess.run(normalize_command(video, tmp_path, reference, has_audio=bool(info["audio"])),
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            os.replace(tmp_path, norm)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # 视频写完后再写记录，中途失败时不会留下与记录不符的文件被复用
+        tmp_meta = f"{meta_file}.tmp{os.getpid()}"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_file)
+        return norm, True
+
+    with ThreadPoolExecutor(max_workers=max(1, ffmpeg_workers)) as pool:
+        results = list(pool.map(work, zip(videos, infos)))
+    return [video for video, _ in results], sum(1 for _, encoded in results if encoded)
+
+
+def check_parts(videos, workers=8, ffmpeg_workers=2):
+    """并行探测各段参数，只重新编码不一致的段，返回 (拼接用的视频列表, 各段时长)"""
+    infos = probe_all(videos, workers)
+    missing_video = [v for v, info in zip(videos, infos) if not info["video"]]
+    if missing_video:
+        raise ValueError(f"没有视频流: {', '.join(missing_video)}")
+    reference = reference_profile(infos)
+    matched = sum(1 for info in infos if (info["video"], info["audio"]) == reference)
+    print(f"基准参数: 视频{reference[0]} 音频{reference[1]}（{matched}/{len(videos)} 段一致）")
+    videos, encoded = normalize_parts(videos, infos, reference, ffmpeg_workers)
+    if encoded:
+        print(f"已重新编码 {encoded} 段")
+    return videos, [info["duration"] for info in infos]
+
+
+def write_list(videos, list_file, durations=None):
+    """写出concat列表；给出durations时每段后加注释记录时长（concat分离器忽略#开头的行）"""
+    with open(list_file, "w", encoding="utf-8") as f:
+        for i, video in enumerate(videos):
+            f.write("file " + _quote(os.path.abspath(video)) + "\n")
+            if durations:
+                f.write(f"# duration {durations[i]:.6f}\n")
+
+
+def concat_copy(videos, output_file):
+    """concat分离器流复制拼接"""
+    list_file = f"{output_file}.list.txt"
+    write_list(videos, list_file)
+    try:
+        subprocess.run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-map", "0",
+                        "-c", "copy", output_file], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        os.remove(list_file)
+
+
+def hierarchical_groups(videos, work_dir, group=GROUP_SIZE, level=0):
+    """
+    段数超过group时，每group段流复制拼接为一个中间文件，逐层减少到不超过group个，
+    返回最终拼接用的视频列表
+    """
+    if len(videos) <= group:
+        return videos
+    os.makedirs(work_dir, exist_ok=True)
+    merged = []
+    for i in range(0, len(videos), group):
+        out = os.path.join(work_dir, f"group_{level}_{i // group:04d}.mp4")
+        concat_copy(videos[i:i + group], out)
+        merged.append(out)
+    print(f"第{level + 1}层: {len(videos)} 段合并为 {len(merged)} 个中间文件")
+    return hierarchical_groups(merged, work_dir, group, level + 1)
+
+
+def prepare_parts(videos, work_dir, workers=8, ffmpeg_workers=2, group=GROUP_SIZE):
+    """
+    探测、统一参数、分层预拼接，返回 (拼接用的视频列表, 各段时长)
+    各段时长按原段顺序，供按段拼接旁白使用
+    """
+    videos, durations = check_parts(videos, workers, ffmpeg_workers)
+    return hierarchical_groups(videos, work_dir, group), durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查各段编码参数、只重编码不一致的段，分层流复制拼接')
+    parser.add_argument('base_dir', help='输出目录（各段在 <目录>/NNN/ 下）')
+    parser.add_argument('-o', '--output', help='拼接结果视频（不指定时只检查、统一参数并写出列表）')
+    parser.add_argument('--list-out', help='写出ffmpeg concat列表（统一参数后的各段，供final_assemble.py --list使用）')
+    parser.add_argument('--name', default='x_final.mp4', help='每段的视频文件名（默认: x_final.mp4）')
+    parser.add_argument('--workers', type=int, default=8, help='并行ffprobe数（默认: 8）')
+    parser.add_argument('--ffmpeg', type=int, default=2, help='同时重新编码的段数（默认: 2）')
+    parser.add_argument('--group', type=int, default=GROUP_SIZE, help=f'每个中间文件拼接的段数（默认: {GROUP_SIZE}）')
+    args = parser.parse_args()
+
+    videos, missing = collect_parts(args.base_dir, args.name)
+    if missing:
+        print(f"警告: 以下编号没有{args.name}，已跳过: {', '.join(missing)}")
+    if not videos:
+        print(f"错误: {args.base_dir} 下没有找到 {args.name}")
+        sys.exit(1)
+    print(f"共 {len(videos)} 段")
+
+    try:
+        videos, durations = check_parts(videos, args.workers, args.ffmpeg)
+        if args.list_out:
+            write_list(videos, args.list_out, durations)
+            print(f"拼接列表: {args.list_out}")
+        if args.output:
+            with tempfile.TemporaryDirectory(prefix="concat_parts_", dir=os.path.dirname(os.path.abspath(args.output))) as work_dir:
+                concat_copy(hierarchical_groups(videos, work_dir, args.group), args.output)
+            print(f"✅ 拼接完成: {args.output}")
+    except (OSError, ValueError, KeyError, subprocess.CalledProcessError) as e:
+        print(f"❌ 拼接失败: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成片一次编码合成 - 拼接各段、混入背景音乐、添加左右上角水印，只编码一次
+
+原流程：concat拼接（流复制）-> add_bgm.sh混音（重新封装）-> video_add_watermark 两次drawtext，
+整本书的长视频要完整重新编码两次。这里用concat分离器读入各段，视频只经过一次drawtext滤镜链，
+音频只混音一次，背景音乐的参数与add_bgm.sh一致。
+
+各段先经concat_parts.py并行探测编码参数，只重新编码参数不一致的段，段数很多时分层预拼接（均为流复制）。
+--list是concat_parts.py --list-out写出的列表（每段带时长注释）时，各段已经检查过，直接使用记录的时长，不再重复探测。
+
+指定--part-wav时（中间视频不带音频，见sys_common.sh的intermediate_audio），旁白取每段视频目录下的WAV，
+按各段视频时长补齐/截断后按采样拼接，整条音轨只在这里编码一次AAC，段与段之间不会有AAC起始填充造成的空隙。
+
+用法：
+    python final_assemble.py <输出视频> (--list video_list.txt | 视频1 视频2 ...)
+                             [--bgm 背景音乐 -v 0.4 -o 1.0 -m mix -l -f 1 -F 1]
+                             [--pre-text 左上角文字] [--post-text 右上角文字] [--part-wav result.wav]
+                             [--workers 8] [--group 200]
+"""
+
+import os
+import re
+import sys
+import argparse
+import tempfile
+import subprocess
+
+from audio_cache import join_pcm
+from concat_parts import GROUP_SIZE, hierarchical_groups, prepare_parts, write_list
+from font_subset import subset_for_text
+
+WATERMARK_FONT = "./sys_font/鸿雷板书简体-正式版.ttf"
+
+
+def _quote(value):
+    """滤镜参数加单引号（路径中可能有冒号、逗号）"""
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+def read_concat_list(list_file):
+    """
+    读取ffmpeg concat列表（file '路径'），相对路径按列表文件所在目录解析
+    返回 (视频列表, 各段时长)；每段都有concat_parts.py写的时长注释时才返回时长，否则为None
+    """
+    base = os.path.dirname(os.path.abspath(list_file))
+    videos, durations = [], []
+    with open(list_file, "r", encoding="utf-8") as f:
+        for line in f:
+            match = re.match(r"^\s*file\s+'(.*)'\s*$", line) or re.match(r"^\s*file\s+(\S+)\s*$", line)
+            if match:
+                videos.append(os.path.join(base, match.group(1).replace("'\\''", "'")))
+                durations.append(None)
+                continue
+            match = re.match(r"^\s*#\s*duration\s+([\d.]+)\s*$", line)
+            if match and videos:
+                durations[-1] = float(match.group(1))
+    return videos, (durations if videos and None not in durations else None)
+
+
+def watermark_filters(pre_text_file=None, post_text_file=None, font=WATERMARK_FONT):
+    """左上角/右上角水印，位置和字号与video_add_watermark一致"""
+    filters = []
+    if pre_text_file:
+        filters.append(f"drawtext=textfile={_quote(pre_text_file)}:fontfile={_quote(font)}"
+                       f":fontsize=36:fontcolor=white:x=10:y=10")
+    if post_text_file:
+        filters.append(f"drawtext=textfile={_quote(post_text_file)}:fontfile={_quote(font)}"
+                       f":fontsize=36:fontcolor=white:x=W-tw-10:y=10")
+    return filters
+
+
+def bgm_filter(duration, mode="mix", bgm_volume=0.3, original_volume=1.0, fade_in=0, fade_out=0,
+               voice_input="0:a", bgm_input="1:a"):
+    """背景音乐滤镜，与add_bgm.sh的build_audio_filter一致"""
+    chain = f"[{bgm_input}]volume={bgm_volume}"
+    if fade_in:
+        chain += f",afade=t=in:st=0:d={fade_in:g}"
+    if fade_out:
+        chain += f",afade=t=out:st={int(duration) - fade_out:g}:d={fade_out:g}"
+    if mode == "replace":
+        return chain + "[aout]"
+    return f"[{voice_input}]volume={original_volume}[orig];{chain}[bg];[orig][bg]amix=inputs=2:duration=first:dropout_transition=3[aout]"
+
+
+def build_command(concat_file, output_file, duration, bgm_file=None, loop_bgm=False, mode="mix", bgm_volume=0.3,
+                  original_volume=1.0, fade_in=0, fade_out=0, pre_text_file=None, post_text_file=None,
+                  font=WATERMARK_FONT, voice_wav=None):
+    """构造一次编码的ffmpeg命令；voice_wav为拼接好的旁白，不指定时使用各段视频自带的音频"""
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_file]
+    voice_input = "0:a"
+    if voice_wav:
+        cmd += ["-i", voice_wav]
+        voice_input = "1:a"
+    graph = []
+    video_filters = watermark_filters(pre_text_file, post_text_file, font)
+    if video_filters:
+        graph.append("[0:v]" + ",".join(video_filters) + "[vout]")
+        video_map = "[vout]"
+    else:
+        video_map = "0:v:0"
+
+    if bgm_file:
+        if loop_bgm:
+            cmd += ["-stream_loop", "-1"]
+        cmd += ["-i", bgm_file]
+        graph.append(bgm_filter(duration, mode, bgm_volume, original_volume, fade_in, fade_out,
+                                voice_input=voice_input, bgm_input=f"{2 if voice_wav else 1}:a"))
+        audio_map = "[aout]"
+    else:
+        audio_map = voice_input if voice_wav else "0:a?"
+
+    if graph:
+        cmd += ["-filter_complex", ";".join(graph)]
+    cmd += ["-map", video_map, "-map", audio_map]
+    # 没有水印时视频流直接复制，只处理音频
+    if video_filters:
+        cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-pix_fmt", "yuv420p"]
+    else:
+        cmd += ["-c:v", "copy"]
+    if bgm_file or voice_wav:
+        cmd += ["-c:a", "aac", "-b:a", "128k"]
+    else:
+        cmd += ["-c:a", "copy"]
+    cmd += ["-t", f"{duration:.3f}", output_file]
+    return cmd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='拼接、背景音乐和水印一次编码生成成片')
+    parser.add_argument('output', help='输出视频文件')
+    parser.add_argument('videos', nargs='*', help='按顺序拼接的视频文件')
+    parser.add_argument('--list', help='ffmpeg concat列表文件（每行 file \'路径\'）')
+    parser.add_argument('--bgm', help='背景音乐文件')
+    parser.add_argument('-v', '--bgm-volume', type=float, default=0.3, help='背景音乐音量（默认: 0.3）')
+    parser.add_argument('-o', '--original-volume', type=float, default=1.0, help='原视频音量（默认: 1.0）')
+    parser.add_argument('-m', '--mode', choices=['mix', 'replace'], default='mix', help='混合模式（默认: mix）')
+    parser.add_argument('-l', '--loop', action='store_true', help='循环背景音乐直到视频结束')
+    parser.add_argument('-f', '--fade-in', type=float, default=0, help='背景音乐淡入时间（秒）')
+    parser.add_argument('-F', '--fade-out', type=float, default=0, help='背景音乐淡出时间（秒）')
+    parser.add_argument('--pre-text', help='左上角水印文字（null表示不添加）')
+    parser.add_argument('--post-text', help='右上角水印文字（null表示不添加）')
+    parser.add_argument('--font', default=WATERMARK_FONT, help='水印字体文件')
+    parser.add_argument('--workers', type=int, default=8, help='并行ffprobe数（默认: 8）')
+    parser.add_argument('--group', type=int, default=GROUP_SIZE, help=f'段数超过时分层预拼接，每组段数（默认: {GROUP_SIZE}）')
+    parser.add_argument('--part-wav', help='各段视频目录下的旁白WAV文件名（如result.wav），指定时按采样拼接后作为音轨')
+    args = parser.parse_args()
+
+    videos, listed_durations = read_concat_list(args.list) if args.list else ([], None)
+    if args.videos:
+        listed_durations = None
+    videos += args.videos
+    if not videos:
+        print("错误: 没有要拼接的视频")
+        sys.exit(1)
+    missing = [v for v in videos if not os.path.isfile(v)]
+    if missing:
+        print(f"错误: 视频文件不存在: {', '.join(missing)}")
+        sys.exit(1)
+
+    # 分层预拼接的中间文件可能很大，临时目录放在输出文件旁边
+    with tempfile.TemporaryDirectory(prefix="final_assemble_", dir=os.path.dirname(os.path.abspath(args.output))) as work_dir:
+        try:
+            if listed_durations:
+                # concat_parts.py已经探测并统一过参数，只做分层预拼接
+                durations = listed_durations
+                concat_videos = hierarchical_groups(videos, os.path.join(work_dir, "groups"), args.group)
+            else:
+                concat_videos, durations = prepare_parts(videos, os.path.join(work_dir, "groups"),
+                                                         workers=args.workers, group=args.group)
+        except (OSError, ValueError, KeyError, subprocess.CalledProcessError) as e:
+            print(f"检查各段视频失败: {str(e)}")
+            sys.exit(1)
+        duration = sum(durations)
+        print(f"共 {len(videos)} 段，总时长: {duration:.1f}秒")
+        concat_file = os.path.join(work_dir, "concat.txt")
+        write_list(concat_videos, concat_file)
+
+        # 水印文字用textfile传入，避免引号、冒号需要转义
+        texts = {key: text for key, text in (("pre", args.pre_text), ("post", args.post_text))
+                 if text and text != "null"}
+        text_files = {}
+        for key, text in texts.items():
+            text_files[key] = os.path.join(work_dir, f"{key}_text.txt")
+            with open(text_files[key], "w", encoding="utf-8") as f:
+                f.write(text)
+
+        voice_wav = None
+        if args.part_wav:
+            wavs = [os.path.join(os.path.dirname(v), args.part_wav) for v in videos]
+            missing = [w for w in wavs if not os.path.isfile(w)]
+            if missing:
+                print(f"错误: 旁白文件不存在: {', '.join(missing)}")
+                sys.exit(1)
+            try:
+                voice_wav = join_pcm(list(zip(wavs, durations)), os.path.join(work_dir, "voice.wav"))
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                print(f"旁白拼接失败: {str(e)}")
+                sys.exit(1)
+
+        font = args.font
+        if texts:
+            try:
+                font = subset_for_text(args.font, "".join(texts.values()))
+            except Exception as e:
+                print(f"字体子集化失败，使用原字体: {str(e)}")
+
+        cmd = build_command(concat_file, args.output, duration, bgm_file=args.bgm, loop_bgm=args.loop,
+                            mode=args.mode, bgm_volume=args.bgm_volume, original_volume=args.original_volume,
+                            fade_in=args.fade_in, fade_out=args.fade_out, pre_text_file=text_files.get("pre"),
+                            post_text_file=text_files.get("post"), font=font, voice_wav=voice_wav)
+        print("执行命令:")
+        print(" ".join(cmd))
+        try:
+            subprocess.run(cmd, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"❌ 合成失败: {str(e)}")
+            sys.exit(1)
+    print(f"✅ 成片生成完成: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
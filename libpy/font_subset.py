@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字体子集化 - 只保留本次任务实际用到的字形，减少libass/drawtext加载大字库的时间和内存
+
+收集ASS字幕（以及drawtext标题）用到的字符，把sys_font中被引用的字体裁剪为子集，
+写入 sys_cache/fonts/<哈希>/，哈希由字符集合和源字体文件决定，内容相同的任务直接复用。
+每个任务的字符集合基本都不同，缓存按最近使用时间只保留 MAX_CACHED 个子集目录，
+生成新子集时清理更早的目录（最近 KEEP_RECENT 秒内用过的不删，可能正被并行任务使用）。
+依赖fontTools（pip install fonttools）；未安装或子集化失败时输出原字体目录/文件，不影响后续流程。
+
+用法：
+    python font_subset.py ass <ASS文件> [附加文字...]    输出子集字体目录（用于 ass=...:fontsdir=）
+    python font_subset.py font <字体文件> <文字>         输出子集字体文件（用于 drawtext=fontfile=）
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+
+FONTS_DIR = "./sys_font"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sys_cache", "fonts")
+FONT_EXTS = (".ttf", ".otf", ".ttc")
+MAX_CACHED = 32
+KEEP_RECENT = 3600
+
+# 除了文本本身，始终保留的字符（空格、半角数字和常用标点，避免标题里的小改动导致缺字）
+BASE_CHARS = " 0123456789.,:!?-《》，。！？：、"
+
+
+def ass_fonts_and_text(ass_path):
+    """从ASS文件中收集用到的字体名称和字符"""
+    font_names = set()
+    chars = set()
+    with open(ass_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Style:"):
+                fields = line[len("Style:"):].split(",")
+                if len(fields) > 1:
+                    font_names.add(fields[1].strip())
+            elif line.startswith("Dialogue:"):
+                text = line.rstrip("\n").split(",", 9)[-1]
+                font_names.update(name.strip() for name in re.findall(r"\\fn([^\\}]+)", text))
+                text = re.sub(r"\{[^}]*\}", "", text)
+                text = text.replace("\\N", "").replace("\\n", "").replace("\\h", " ")
+                chars.update(text)
+    return font_names, chars
+
+
+def font_names_in_file(font_path):
+    """读取字体文件中的家族名和全名（libass按这些名称匹配字体）"""
+    from fontTools.ttLib import TTFont
+    kwargs = {"fontNumber": 0} if font_path.lower().endswith(".ttc") else {}
+    font = TTFont(font_path, lazy=True, **kwargs)
+    try:
+        return {record.toUnicode().strip() for record in font["name"].names if record.nameID in (1, 4, 16)}
+    finally:
+        font.close()
+
+
+def _cache_key(chars, font_files):
+    h = hashlib.sha1("".join(sorted(chars)).encode("utf-8"))
+    for path in sorted(font_files):
+        st = os.stat(path)
+        h.update(f"\n{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def subset_font(src, dst, chars):
+    """把字体裁剪为只包含chars中字符的子集，保留全部名称记录"""
+    from fontTools import subset
+    options = subset.Options()
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.name_legacy = True
+    options.layout_features = ["*"]
+    options.notdef_outline = True
+    if src.lower().endswith(".ttc"):
+        options.font_number = 0
+    font = subset.load_font(src, options)
+    try:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text="".join(sorted(chars)))
+        subsetter.subset(font)
+        subset.save_font(font, dst, options)
+    finally:
+        font.close()
+
+
+def prune_cache(cache_dir=CACHE_DIR, keep=MAX_CACHED, keep_recent=KEEP_RECENT):
+    """按最近使用时间（目录mtime）清理子集缓存，只保留最新的keep个，近期用过的不删"""
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return
+    entries = []
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        # 跳过其他进程正在生成的临时目录
+        if ".tmp" in name or not os.path.isdir(path):
+            continue
+        try:
+            entries.append((os.stat(path).st_mtime, path))
+        except FileNotFoundError:
+            continue
+    entries.sort(reverse=True)
+    now = time.time()
+    for mtime, path in entries[keep:]:
+        if now - mtime >= keep_recent:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_subset_dir(chars, font_files, cache_dir=CACHE_DIR):
+    """为一组字体生成子集目录，已存在时更新使用时间并直接返回"""
+    chars = set(chars) | set(BASE_CHARS)
+    target = os.path.join(cache_dir, _cache_key(chars, font_files))
+    if os.path.isdir(target):
+        try:
+            os.utime(target)
+        except FileNotFoundError:
+            pass
+        else:
+            return target
+
+    tmp_dir = f"{target}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        for path in font_files:
+            subset_font(path, os.path.join(tmp_dir, os.path.basename(path)), chars)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # 其他进程已生成相同的子集
+            if not os.path.isdir(target):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    prune_cache(cache_dir)
+    return target
+
+
+def subset_for_ass(ass_path, extra_text="", fonts_dir=FONTS_DIR):
+    """
+    为ASS文件生成子集字体目录，只包含ASS中引用到的字体
+    按字体内部名称匹配不到时，对目录中的全部字体做子集
+    """
+    font_names, chars = ass_fonts_and_text(ass_path)
+    chars.update(extra_text)
+    font_files = [os.path.join(fonts_dir, name) for name in sorted(os.listdir(fonts_dir))
+                  if name.lower().endswith(FONT_EXTS)]
+    used = [path for path in font_files if font_names & font_names_in_file(path)]
+    return build_subset_dir(chars, used or font_files)
+
+
+def subset_for_text(font_file, text):
+    """为drawtext生成只包含text中字符的子集字体文件"""
+    target_dir = build_subset_dir(set(text), [font_file])
+    return os.path.join(target_dir, os.path.basename(font_file))
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("ass", "font"):
+        print("使用方法:")
+        print("python font_subset.py ass <ASS文件> [附加文字...]")
+        print("python font_subset.py font <字体文件> <文字>")
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    extra_text = "".join(sys.argv[3:])
+    # 只把结果路径输出到stdout，供shell直接引用；失败时输出原字体目录/文件
+    try:
+        if command == "ass":
+            print(subset_for_ass(path, extra_text))
+        else:
+            print(subset_for_text(path, extra_text))
+    except Exception as e:
+        print(f"字体子集化失败，使用原字体: {str(e)}", file=sys.stderr)
+        print(FONTS_DIR if command == "ass" else path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单次编码渲染一段视频 - 背景（图片动效或纯色）、ASS字幕和大字标题在一个滤镜图中完成，只编码一次
+
+原流程每段至少三次完整的H.264编码：image_to_video.sh生成背景视频、ass滤镜烧录字幕、
+drawtext添加标题，每次都要解码上一步的结果再重新编码，既慢又累积画质损失。
+这里按image_to_video.sh的参数和动效构造同样的背景，后面直接接ass和drawtext滤镜。
+
+用法：
+    python part_render.py <音频文件> <输出视频> [--image 图片 | --color-only] [--background black]
+                          [--effect none] [--ass 字幕.ass] [--title 标题] [--width 1536 --height 900 --fps 30]
+                          [--no-audio] [--bg-cache] [--chunks 1]
+--no-audio时输出不带音轨（音频只在最终合成时编码一次，见final_assemble.py --part-wav）。
+--bg-cache时背景图的缩放、动效和叠加取自bg_cache.py缓存的背景视频（多段共用同一张背景图时），纯色背景不受影响。
+--chunks N时把时间轴按整秒切成N段，各用一个ffmpeg进程渲染（滤镜图相同，时间戳平移到该段的起点，
+动效、字幕和淡出都与整段渲染一致），再流复制拼接；每段单独编码，段首自然是关键帧。
+x264在preset medium下超过十几个线程就很难再提速，长视频在多核机器上分段并行更快。
+zoompan类效果（kenburns、zoom_in）逐帧累积缩放，不能从中间开始，始终整段渲染。
+"""
+
+import os
+import sys
+import math
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_cache import probe_duration
+from font_subset import FONTS_DIR, subset_for_ass, subset_for_text
+
+TITLE_FONT = os.path.join(FONTS_DIR, "Aa剑豪体.ttf")
+EFFECTS = ["none", "kenburns", "move_right", "move_left", "move_up", "move_down", "fade", "swing", "zoom_in"]
+# 按帧累积状态的效果，不能从时间轴中间开始渲染
+STATEFUL_EFFECTS = {"kenburns", "zoom_in"}
+
+
+def _quote(value):
+    """滤镜参数加单引号（路径中可能有冒号、逗号）"""
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+def effect_filter(effect, duration, zoom=1.0, speed=1.0, final_zoom=1.5, width=1536, height=900, bg_color="black"):
+    """图片动效滤镜，与image_to_video.sh中各效果的参数一致"""
+    chain = f"format=yuv420p,scale=iw*{zoom}:ih*{zoom}"
+    if effect == "kenburns":
+        return chain + (f",zoompan=z='min(zoom+{0.0005 * speed:g},1.2)':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+                        f":d={duration}:s={width}x{height}")
+    if effect == "move_right":
+        return chain + f",crop={width}:{height}:x='t*{20 * speed:g}':y=0"
+    if effect == "move_left":
+        return chain + f",crop={width}:{height}:x='max(iw-w-t*{20 * speed:g},0)':y=0"
+    if effect == "move_up":
+        return chain + f",crop={width}:{height}:x=0:y='max(ih-h-t*{20 * speed:g},0)'"
+    if effect == "move_down":
+        return chain + f",crop={width}:{height}:x=0:y='t*{20 * speed:g}'"
+    if effect == "fade":
+        return chain + f",fade=t=in:st=0:d=2,fade=t=out:st={duration - 2}:d=2"
+    if effect == "swing":
+        return chain + f",rotate='sin(t*PI/{int(8 / speed)})*2':c={bg_color}"
+    if effect == "zoom_in":
+        return chain + (f",zoompan=z='min(zoom+{0.0005 * speed:g},{final_zoom})':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+                        f":d={duration}:s={width}x{height}")
+    return chain
+
+
+def build_command(audio_file, output_file, duration, image=None, bg_color="black", effect="none", ass_file=None,
+                  fonts_dir=FONTS_DIR, title_file=None, title_font=TITLE_FONT, width=1536, height=900, fps=30,
+                  zoom=1.0, speed=1.0, final_zoom=1.5, volume=1.0, audio=True, bg_clip=None, start=None, length=None):
+    """
+    构造单次编码的ffmpeg命令
+    bg_clip: 预先编码好的背景（bg_cache.py），指定时直接读取前duration秒，不再逐帧生成背景
+    start/length: 只渲染时间轴上[start, start+length)这一段（分段并行渲染），
+                  输入帧的时间戳平移到start，滤镜看到的时间与整段渲染相同，输出时间戳从0开始
+    """
+    width, height = (width + 1) // 2 * 2, (height + 1) // 2 * 2
+    color_source = f"color=c={bg_color}:s={width}x{height}:r={fps}"
+    chunked = start is not None
+    shift = f"setpts=PTS+{start:g}/TB," if chunked else ""
+    cmd = ["ffmpeg", "-y"]
+    if bg_clip:
+        cmd += (["-ss", f"{start:g}", "-t", f"{length:g}"] if chunked else ["-t", str(duration)]) + ["-i", bg_clip]
+        graph = [f"[0:v]{shift}null[bg]"] if chunked else []
+        last = "bg" if chunked else "0:v"
+        audio_index = 1
+    elif image:
+        # 与image_to_video.sh相同：图片动效后缩放到画面内，居中叠加在纯色背景上
+        cmd += ["-loop", "1", "-i", image, "-f", "lavfi", "-i", color_source]
+        graph = [
+            f"[0:v]{shift}{effect_filter(effect, duration, zoom, speed, final_zoom, width, height, bg_color)}[scaled]",
+            f"[scaled]scale='min({width},iw)':'min({height},ih)':force_original_aspect_ratio=decrease[resized]",
+            f"[1:v]{shift}null[base]",
+            "[base][resized]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2[bg]",
+        ]
+        last = "bg"
+        audio_index = 2
+    else:
+        # 与image_to_video.sh --color-only相同：纯色背景，最后1秒淡出
+        cmd += ["-f", "lavfi", "-i", color_source]
+        graph = [f"[0:v]{shift}fade=t=out:st={duration - 1}:d=1[bg]"]
+        last = "bg"
+        audio_index = 1
+
+    if ass_file:
+        graph.append(f"[{last}]ass={_quote(ass_file)}:fontsdir={_quote(fonts_dir)}[sub]")
+        last = "sub"
+    if title_file:
+        # 标题用textfile传入，避免文字中的引号、冒号需要转义
+        graph.append(f"[{last}]drawtext=textfile={_quote(title_file)}:fontfile={_quote(title_font)}"
+                     f":fontsize=160:fontcolor=red@0.8:x=(W-tw)/2:y=100[title]")
+        last = "title"
+    if chunked:
+        graph.append(f"[{last}]setpts=PTS-STARTPTS[chunk]")
+        last = "chunk"
+    if audio:
+        cmd += ["-i", audio_file]
+        graph.append(f"[{audio_index}:a]volume={volume}[audio]")
+
+    if graph:
+        cmd += ["-filter_complex", ";".join(graph)]
+    cmd += ["-map", last if last == "0:v" else f"[{last}]"]
+    cmd += ["-map", "[audio]", "-c:a", "aac", "-b:a", "128k"] if audio else ["-an"]
+    if chunked:
+        cmd += ["-frames:v", str(int(round(length * fps)))]
+    else:
+        cmd += ["-t", str(duration)]
+    cmd += ["-r", str(fps), "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-pix_fmt", "yuv420p", output_file]
+    return cmd
+
+
+def chunk_ranges(duration, chunks):
+    """把[0, duration)按整秒切成不超过chunks段，返回 [(起点, 时长), ...]"""
+    step = max(1, math.ceil(duration / max(1, chunks)))
+    return [(start, min(step, duration - start)) for start in range(0, int(duration), step)]
+
+
+def render_chunked(output_file, duration, chunks, audio_file=None, volume=1.0, **kwargs):
+    """
+    分段并行渲染：每段一个ffmpeg进程（x264线程数按CPU核数平分），流复制拼接，
+    需要音轨时最后把音频封装进去（视频不再重新编码）
+    """
+    from concat_parts import concat_copy
+
+    ranges = chunk_ranges(duration, chunks)
+    threads = max(1, (os.cpu_count() or 1) // len(ranges))
+    root, ext = os.path.splitext(output_file)
+    chunk_files = [f"{root}.chunk{i:03d}{ext}" for i in range(len(ranges))]
+    video_file = f"{root}.video{ext}" if audio_file else output_file
+
+    def work(i):
+        start, length = ranges[i]
+        cmd = build_command(None, chunk_files[i], duration, start=start, length=length, audio=False, **kwargs)
+        cmd[-1:-1] = ["-threads", str(threads)]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    print(f"分{len(ranges)}段并行渲染，每段 {ranges[0][1]}秒，x264线程 {threads}")
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            list(pool.map(work, range(len(ranges))))
+        concat_copy(chunk_files, video_file)
+        if audio_file:
+            subprocess.run(["ffmpeg", "-y", "-i", video_file, "-i", audio_file, "-map", "0:v", "-map", "1:a",
+                            "-af", f"volume={volume}", "-c:v", "copy", "-c:a", "aac", "-b:a", "128k",
+                            "-t", str(duration), output_file], check=True)
+    finally:
+        for path in chunk_files + ([video_file] if audio_file else []):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='背景、ASS字幕和标题一次编码生成一段视频')
+    parser.add_argument('audio', help='音频文件')
+    parser.add_argument('output', help='输出视频文件')
+    parser.add_argument('--image', help='背景图片（不指定时使用纯色背景）')
+    parser.add_argument('--color-only', action='store_true', help='只使用纯色背景')
+    parser.add_argument('-b', '--background', default='black', help='背景颜色（默认: black）')
+    parser.add_argument('-e', '--effect', default='none', choices=EFFECTS, help='图片动态效果（默认: none）')
+    parser.add_argument('-s', '--speed', type=float, default=1.0, help='效果速度（默认: 1.0）')
+    parser.add_argument('-z', '--zoom', type=float, default=1.0, help='缩放比例（默认: 1.0）')
+    parser.add_argument('--final-zoom', type=float, default=1.5, help='最终放大倍数（仅用于zoom_in效果）')
+    parser.add_argument('--ass', help='要烧录的ASS字幕')
+    parser.add_argument('--title', help='画面上方的大字标题（null表示不添加）')
+    parser.add_argument('-w', '--width', type=int, default=1536, help='输出宽度（默认: 1536）')
+    parser.add_argument('--height', type=int, default=900, help='输出高度（默认: 900）')
+    parser.add_argument('-f', '--fps', type=int, default=30, help='帧率（默认: 30）')
+    parser.add_argument('--no-audio', action='store_true', help='输出不带音轨（音频在最终合成时统一编码）')
+    parser.add_argument('--bg-cache', action='store_true', help='背景使用缓存的预编码视频（适合多段共用的背景）')
+    parser.add_argument('--chunks', type=int, default=1, help='把时间轴切成N段并行编码后流复制拼接（默认: 1，不切分）')
+    args = parser.parse_args()
+
+    if args.image and not args.color_only and not os.path.isfile(args.image):
+        print(f"错误: 图片文件不存在: {args.image}")
+        sys.exit(1)
+    image = None if args.color_only else args.image
+
+    # 与image_to_video.sh相同，时长按音频时长向上取整到整秒（否则会截掉结尾最多半秒旁白）
+    duration = int(math.ceil(probe_duration(args.audio)))
+    print(f"音频时长: {duration}秒")
+
+    bg_clip, clip_lock = None, None
+    if args.bg_cache:
+        import bg_cache
+        if bg_cache.is_cacheable(image, args.effect):
+            try:
+                bg_clip, clip_lock = bg_cache.open_clip(duration, image, bg_color=args.background, effect=args.effect,
+                                                        width=args.width, height=args.height, fps=args.fps,
+                                                        zoom=args.zoom, speed=args.speed)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"缓存背景生成失败，逐帧生成背景: {str(e)}")
+
+    fonts_dir = FONTS_DIR
+    if args.ass:
+        try:
+            fonts_dir = subset_for_ass(args.ass)
+        except Exception as e:
+            print(f"字体子集化失败，使用原字体: {str(e)}")
+
+    title_file, title_font = None, TITLE_FONT
+    if args.title and args.title != "null":
+        title_file = f"{args.output}.title.txt"
+        with open(title_file, "w", encoding="utf-8") as f:
+            f.write(args.title)
+        try:
+            title_font = subset_for_text(TITLE_FONT, args.title)
+        except Exception as e:
+            print(f"字体子集化失败，使用原字体: {str(e)}")
+
+    options = dict(image=image, bg_color=args.background, effect=args.effect, ass_file=args.ass,
+                   fonts_dir=fonts_dir, title_file=title_file, title_font=title_font, width=args.width,
+                   height=args.height, fps=args.fps, zoom=args.zoom, speed=args.speed, final_zoom=args.final_zoom,
+                   bg_clip=bg_clip)
+    chunks = args.chunks
+    if chunks > 1 and image and not bg_clip and args.effect in STATEFUL_EFFECTS:
+        print(f"效果 {args.effect} 逐帧累积，不能分段渲染，整段渲染")
+        chunks = 1
+    try:
+        if chunks > 1 and duration > 1:
+            render_chunked(args.output, duration, chunks, audio_file=None if args.no_audio else args.audio, **options)
+        else:
+            cmd = build_command(args.audio, args.output, duration, audio=not args.no_audio, **options)
+            print("执行命令:")
+            print(" ".join(cmd))
+            subprocess.run(cmd, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ 生成失败: {str(e)}")
+        sys.exit(1)
+    finally:
+        if title_file and os.path.exists(title_file):
+            os.remove(title_file)
+        if clip_lock:
+            clip_lock.close()
+    print(f"✅ 视频生成完成: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
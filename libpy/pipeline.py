@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带内容哈希缓存的视频生成流水线 - 替代sys_common.sh中逐步执行、每步先rm再重新生成的方式
+
+每个阶段声明输入文件、输出文件和参数（sys_common.sh中的设置变量），按依赖关系（DAG）依次执行。
+阶段的键 = 命令 + 参数 + 全部输入文件（含阶段用到的脚本）的内容哈希
+          + 调用的sys_common.sh函数（及其调用的函数）的源码；
+键与清单（<目录>/pipeline_manifest.json）中记录的一致且输出都存在时跳过该阶段。
+上游重新生成但内容没变时，下游的键也不变，同样跳过；修改字体或特效只会重跑受影响的下游阶段。
+
+各阶段的实际工作仍由sys_common.sh中的函数和libpy中的脚本完成：
+    voice_gen -> srt_gen(语音识别) -> srt_final -> srt_gen_fromwords -> srt2ass ┐
+    image_to_video ─────────────────────────────────────────────────────────────┴> gen_ass_video -> [bgm] -> [watermark]
+
+用法：
+    python pipeline.py <目录> --content <文案文件> --pic <内容图> --voice <音色>
+                       [--var 变量=值 ...] [--bgm 背景音乐] [--pre-text 文字 --post-text 文字]
+                       [--force 阶段,...] [--dry-run] [--scratch 临时目录 [--keep-intermediates]]
+未通过--var指定的设置变量使用sys_common.sh开头的默认值。
+指定--scratch时中间文件写到临时目录，成功后只把最终产物移回<目录>（见workdir.py）；
+清单和语音、识别结果（PERSIST_ARTIFACTS）也保存在<目录>，下次运行时复制回临时目录继续按清单跳过。
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+import shutil
+import hashlib
+import argparse
+import subprocess
+
+from functools import lru_cache
+
+from workdir import PartWorkdir
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYS_COMMON = os.path.join(ROOT_DIR, "sys_common.sh")
+FONTS_DIR = "sys_font"
+MANIFEST_NAME = "pipeline_manifest.json"
+# 使用临时目录时也保存到段目录的文件：清单，以及语音和识别的输出（最慢的两个阶段），
+# 修改字幕参数或字体后重跑时这两个阶段仍可跳过
+PERSIST_ARTIFACTS = (MANIFEST_NAME, "result.wav", "content.srt", "content_srt_words.txt")
+
+
+def load_shell_defaults(path=SYS_COMMON):
+    """读取sys_common.sh开头（第一个函数之前）的设置变量默认值"""
+    defaults = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("function "):
+                break
+            match = re.match(r"^([A-Za-z_]\w*)=(\S*)", line)
+            if match:
+                defaults[match.group(1)] = match.group(2)
+    return defaults
+
+
+class Stage:
+    """
+    流水线阶段
+    name: 阶段名；inputs/outputs: 文件或目录路径；params: 影响结果的参数
+    command: 执行的命令（参数列表），在仓库根目录下运行
+    resource: 占用的资源类别（tts/asr/cpu/ffmpeg），多个流水线并发时用于限制同类阶段的并发数
+    """
+
+    def __init__(self, name, inputs, outputs, params, command, resource=None):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params)
+        self.command = list(command)
+        self.resource = resource
+
+
+def shell_step(function, args, shell_vars):
+    """在source sys_common.sh后，按给定的设置变量调用其中的函数"""
+    assigns = "".join(f"{name}={shlex.quote(str(value))}; " for name, value in sorted(shell_vars.items()))
+    script = f'source sys_common.sh; {assigns}{function} "$@"'
+    return ["bash", "-c", script, "bash"] + [str(arg) for arg in args]
+
+
+@lru_cache(maxsize=None)
+def shell_functions(path=SYS_COMMON):
+    """sys_common.sh中各函数的源码 {函数名: 源码}"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return {m.group(1): m.group(0) for m in re.finditer(r"^function (\w+)\(\) \{\n.*?^\}", text, re.M | re.S)}
+
+
+def shell_function_source(command):
+    """
+    shell_step命令调用的sys_common.sh函数及其（递归）调用的函数的源码，不是shell_step命令时返回None
+    修改函数中写死的字体、参数时阶段的键随之变化
+    """
+    if command[:2] != ["bash", "-c"]:
+        return None
+    match = re.search(r'(\w+) "\$@"$', command[2])
+    functions = shell_functions()
+    pending, seen = [match.group(1)] if match else [], set()
+    while pending:
+        name = pending.pop()
+        if name in seen or name not in functions:
+            continue
+        seen.add(name)
+        # 只看命令位置（行首、$(…)、;/&&/||之后）的函数名，不把srt_gen.py之类的文件名当作调用
+        calls = re.findall(r"(?:^|\$\(|;|&&|\|\|)\s*(\w+)", functions[name], re.M)
+        pending.extend(call for call in calls if call in functions and call != name)
+    return "\n".join(functions[name] for name in sorted(seen))
+
+
+class Manifest:
+    """
+    阶段清单：记录每个阶段上次成功执行时的键
+    同时缓存文件哈希（按大小和修改时间），未变化的大文件不重复计算
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.stages = data.get("stages", {})
+        self.files = data.get("files", {})
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["hash"]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.files[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        return digest
+
+    def path_hash(self, path):
+        """文件或目录（递归）的内容哈希，不存在时返回None"""
+        if os.path.isdir(path):
+            h = hashlib.sha1()
+            for base, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    full = os.path.join(base, name)
+                    h.update(f"{os.path.relpath(full, path)}:{self.file_hash(full)}\n".encode("utf-8"))
+            return h.hexdigest()
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        return None
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages, "files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def stage_key(stage, manifest):
+    """阶段的键；有输入文件不存在时返回None"""
+    input_hashes = {}
+    for path in stage.inputs:
+        digest = manifest.path_hash(path)
+        if digest is None:
+            return None
+        input_hashes[path] = digest
+    payload = {"command": stage.command, "params": stage.params, "inputs": input_hashes,
+               "shell": shell_function_source(stage.command)}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def pipeline_key(stages, manifest):
+    """
+    整条流水线的键：各阶段的命令、参数、调用的shell函数，以及全部外部输入（不由其他阶段生成的文件和脚本）的内容哈希
+    不依赖中间文件，临时目录已删除时也能计算；任何阶段的键可能变化时它都会变化，用于判断整段能否跳过
+    """
+    produced = {path for stage in stages for path in stage.outputs}
+    payload = [{"name": stage.name, "command": stage.command, "params": stage.params,
+                "shell": shell_function_source(stage.command),
+                "inputs": {path: manifest.path_hash(path) for path in stage.inputs if path not in produced}}
+               for stage in stages]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def topo_order(stages):
+    """按输出->输入的依赖关系排序，检查重复输出和环"""
+    producer = {}
+    for stage in stages:
+        for path in stage.outputs:
+            if path in producer:
+                raise ValueError(f"输出 {path} 同时由 {producer[path].name} 和 {stage.name} 生成")
+            producer[path] = stage
+    deps = {stage.name: {producer[path].name for path in stage.inputs if path in producer} for stage in stages}
+
+    ordered, done = [], set()
+    pending = list(stages)
+    while pending:
+        ready = [stage for stage in pending if deps[stage.name] <= done]
+        if not ready:
+            raise ValueError(f"阶段之间存在循环依赖: {', '.join(stage.name for stage in pending)}")
+        for stage in ready:
+            ordered.append(stage)
+            done.add(stage.name)
+        pending = [stage for stage in pending if stage.name not in done]
+    return ordered, deps
+
+
+def is_up_to_date(stage, manifest, key):
+    """键与清单记录一致且输出都存在"""
+    return (key is not None and manifest.stages.get(stage.name) == key
+            and all(os.path.exists(path) for path in stage.outputs))
+
+
+def run_pipeline(stages, manifest, force=(), dry_run=False, limits=None, log=None, progress=None):
+    """
+    按依赖顺序执行阶段，键未变化的阶段跳过
+    limits: {资源类别: 信号量}，执行阶段前先获取对应资源
+    log: 阶段信息和命令输出写入的文件对象（默认标准输出）
+    progress: 回调 progress(阶段名, 状态)，状态为 跳过/开始/完成/失败
+    返回: 实际执行（dry_run时为需要执行）的阶段名列表
+    """
+    limits = limits or {}
+    report = progress or (lambda name, status: None)
+    ordered, deps = topo_order(stages)
+    executed = []
+    for stage in ordered:
+        print("=" * 87, file=log, flush=True)
+        key = None if dry_run and deps[stage.name] & set(executed) else stage_key(stage, manifest)
+        if stage.name not in force and is_up_to_date(stage, manifest, key):
+            print(f"阶段: {stage.name}（输入和参数未变化，跳过）", file=log, flush=True)
+            report(stage.name, "跳过")
+            continue
+
+        executed.append(stage.name)
+        if dry_run:
+            print(f"阶段: {stage.name}（需要执行）", file=log, flush=True)
+            continue
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            report(stage.name, "失败")
+            raise RuntimeError(f"阶段 {stage.name} 的输入不存在: {', '.join(missing)}")
+
+        manifest.stages.pop(stage.name, None)
+        limit = limits.get(stage.resource)
+        if limit:
+            limit.acquire()
+        try:
+            print(f"阶段: {stage.name}", file=log, flush=True)
+            report(stage.name, "开始")
+            result = subprocess.run(stage.command, cwd=ROOT_DIR, stdout=log, stderr=log)
+        finally:
+            if limit:
+                limit.release()
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if result.returncode != 0 or missing:
+            manifest.save()
+            report(stage.name, "失败")
+            raise RuntimeError(f"阶段 {stage.name} 执行失败（返回码 {result.returncode}，缺少输出: {', '.join(missing) or '无'}）")
+        manifest.stages[stage.name] = stage_key(stage, manifest)
+        manifest.save()
+        report(stage.name, "完成")
+    return executed
+
+
+def content_stages(work_dir, content_file, pic_file, voice, shell_vars, bgm_file=None, pre_text=None, post_text=None):
+    """内容页视频（对应sys_common.sh的content_video_gen）的阶段定义"""
+    voice_file = f"{work_dir}/result.wav"
+    srt_raw = f"{work_dir}/content.srt"
+    srt_words = f"{work_dir}/content_srt_words.txt"
+    srt_words_punc = f"{work_dir}/content_srt_words_punc.txt"
+    srt_final = f"{work_dir}/content_srt_final.srt"
+    ass_file = f"{work_dir}/content_corrected.ass"
+    video = f"{work_dir}/video.mp4"
+    video_ass = f"{work_dir}/video_ass.mp4"
+
+    def pick(*names):
+        return {name: shell_vars[name] for name in names}
+
+    asr_vars = pick("srt_engine", "asr_draft_model", "asr_cer_threshold", "asr_workers", "asr_stream")
+    ass_vars = pick("ass_font_size", "line_max_chars", "ass_effect", "ass_overlay")
+    overlay = ass_vars["ass_overlay"] == "true"
+    ass_outputs = [ass_file] + ([f"{work_dir}/content_corrected_overlay"] if overlay else [])
+    # 叠加模式下静态字幕在srt2ass阶段就用字体渲染成了PNG
+    ass_inputs = [srt_final, "libpy/srt2ass_with_effect.py", "libpy/ass_overlay.py"] + ([FONTS_DIR] if overlay else [])
+
+    stages = [
+        Stage("voice_gen", [content_file], [voice_file], {"voice": voice},
+              shell_step("voice_gen", [content_file, work_dir, voice], {}), resource="tts"),
+        Stage("srt_gen", [content_file, voice_file, "libpy/srt_gen.py", "libpy/srt_gen_silence.py"],
+              [srt_raw, srt_words], asr_vars,
+              shell_step("srt_asr", [content_file, voice_file, srt_raw, srt_words], asr_vars), resource="asr"),
+        Stage("srt_final", [content_file, srt_words, "libpy/srt_final.py"], [srt_words_punc], {},
+              ["python", "libpy/srt_final.py", content_file, srt_words, srt_words_punc], resource="cpu"),
+        Stage("srt_gen_fromwords", [srt_words_punc, "libpy/srt_gen_fromwords.py"], [srt_final], {},
+              ["python", "libpy/srt_gen_fromwords.py", srt_words_punc, srt_final], resource="cpu"),
+        Stage("srt2ass", ass_inputs, ass_outputs, ass_vars,
+              shell_step("srt_ass_gen", [srt_final, ass_file], ass_vars), resource="cpu"),
+        Stage("image_to_video", [pic_file, voice_file, "libsh/image_to_video.sh"], [video], pick("intermediate_audio"),
+              shell_step("content_video_pic_gen", [pic_file, voice_file, video], pick("intermediate_audio")),
+              resource="ffmpeg"),
+        Stage("gen_ass_video", [video] + ass_outputs + [FONTS_DIR, "libpy/font_subset.py"], [video_ass],
+              pick("ass_overlay"),
+              shell_step("gen_ass_video", [video, ass_file, video_ass], pick("ass_overlay")), resource="ffmpeg"),
+    ]
+    last = video_ass
+
+    if bgm_file:
+        if shell_vars["intermediate_audio"] == "none":
+            raise ValueError("中间视频不带音轨（intermediate_audio=none），背景音乐请在最终合成时用final_assemble.py添加")
+        video_bgm = f"{work_dir}/video_bgm.mp4"
+        stages.append(Stage("bgm", [last, bgm_file, "libsh/add_bgm.sh"], [video_bgm], {},
+                            shell_step("video_add_bgm", [last, bgm_file, video_bgm], {}), resource="ffmpeg"))
+        last = video_bgm
+
+    if pre_text:
+        # video_add_watermark的输出文件名由输入文件名加后缀得到
+        watermarked = f"{last}_post_text.mp4" if post_text else f"{last}_pre_text.mp4"
+        stages.append(Stage("watermark", [last, FONTS_DIR, "libpy/font_subset.py"], [watermarked],
+                            {"pre_text": pre_text, "post_text": post_text or "null"},
+                            shell_step("video_add_watermark", [last, pre_text, post_text or "null"], {}),
+                            resource="ffmpeg"))
+        last = watermarked
+    return stages, last
+
+
+def main():
+    parser = argparse.ArgumentParser(description='带内容哈希缓存的内容页视频生成流水线')
+    parser.add_argument('work_dir', help='工作目录（同content_video_gen的目录参数）')
+    parser.add_argument('--content', required=True, help='语音和字幕使用的文案文件')
+    parser.add_argument('--pic', required=True, help='内容图片')
+    parser.add_argument('--voice', required=True, help='音色')
+    parser.add_argument('--var', action='append', default=[], help='sys_common.sh设置变量，格式: 变量=值（可多次指定）')
+    parser.add_argument('--bgm', help='背景音乐文件（指定时增加bgm阶段，需要--var intermediate_audio=aac）')
+    parser.add_argument('--pre-text', help='左上角水印文字（指定时增加watermark阶段）')
+    parser.add_argument('--post-text', help='右上角水印文字')
+    parser.add_argument('--force', default='', help='强制执行的阶段，逗号分隔')
+    parser.add_argument('--dry-run', action='store_true', help='只显示需要执行的阶段')
+    parser.add_argument('--scratch', help='中间文件所在的临时目录（如/dev/shm下的目录），成功后只保留最终产物')
+    parser.add_argument('--keep-intermediates', action='store_true', help='使用临时目录时仍把全部中间文件移回<目录>（调试用）')
+    args = parser.parse_args()
+
+    shell_vars = load_shell_defaults()
+    for item in args.var:
+        name, sep, value = item.partition('=')
+        if not sep:
+            print(f"无效的变量设置: {item}（格式: 变量=值）")
+            sys.exit(1)
+        shell_vars[name] = value
+    if args.bgm and shell_vars.get("intermediate_audio") == "none":
+        parser.error("--bgm 需要中间视频带音轨（--var intermediate_audio=aac）；"
+                     "默认intermediate_audio=none时背景音乐请在最终合成时用final_assemble.py添加")
+
+    os.chdir(ROOT_DIR)
+    part_dir = args.work_dir.rstrip('/')
+    finals = ["x_final.mp4"] + (["result.wav"] if shell_vars.get("intermediate_audio") == "none" else [])
+    workdir = PartWorkdir(part_dir, args.scratch, keep=args.keep_intermediates, finals=finals,
+                          persist=PERSIST_ARTIFACTS)
+    work_dir = workdir.path
+    stages, final_video = content_stages(work_dir, args.content, args.pic, args.voice, shell_vars,
+                                         bgm_file=args.bgm, pre_text=args.pre_text, post_text=args.post_text)
+    manifest = Manifest(os.path.join(work_dir, MANIFEST_NAME))
+    done_key = pipeline_key(stages, manifest)
+    force = {name.strip() for name in args.force.split(',') if name.strip()}
+    unknown = force - {stage.name for stage in stages}
+    if unknown:
+        print(f"未知的阶段: {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    if not force and workdir.is_done(done_key):
+        print(f"输入和参数未变化，跳过: {part_dir}/x_final.mp4")
+        return
+
+    try:
+        executed = run_pipeline(stages, manifest, force=force, dry_run=args.dry_run)
+    except (RuntimeError, ValueError) as e:
+        print(f"流水线失败: {str(e)}")
+        sys.exit(1)
+
+    if args.dry_run:
+        print(f"\n需要执行的阶段: {', '.join(executed) or '无'}")
+        return
+    shutil.copyfile(final_video, os.path.join(work_dir, "x_final.mp4"))
+    workdir.finish(done_key)
+    print(f"\n执行了 {len(executed)}/{len(stages)} 个阶段，最终视频: {part_dir}/x_final.mp4")
+
+
+if __name__ == "__main__":
+    main()
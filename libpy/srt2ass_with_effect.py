@@ -9,20 +9,29 @@
 支持通过--per-line参数启用逐行关键词分析（每行字幕提取最重要的词）。
 支持通过--dict-file参数指定补充词典文件，文件中每行一个词，这些词会作为NLP分析的补充被高亮显示。
 支持通过--skip-lines参数指定要跳过分析的字幕行号（从1开始），多个行号用逗号分隔。
-支持通过--effect typewriter参数实现单字逐个显示的打字机效果。
+支持通过--effect typewriter参数实现单字逐个显示的打字机效果；--effect typewriter_k为卡拉OK计时实现的打字机效果，生成的ASS更小、渲染更快。
 支持通过--max-chars参数指定每行最大字符数，超过时自动换行。
-用法：python3 srt2ass_with_effect.py input.srt output.ass [--align 5] [--font "行书"] [--size 100] [--color white] [--effects "fade,move,scale,typewriter"] [--highlight] [--keyword-size 120] [--per-line] [--dict-file words.txt] [--skip-lines "1,3,5"] [--max-chars 20]
+支持通过--variant参数（可重复）一次生成多个样式不同的ASS文件，如--variant "out_bottom.ass:align=2,color=red,max_chars=10"，只解析和分析一次。
+支持通过--overlay-dir参数把没有动画的字幕预渲染为透明PNG，烧录时用overlay叠加，只有动画字幕交给libass逐帧渲染。
+支持通过--jobs参数指定关键词分析的进程数；逐行分析结果缓存在sys_cache目录，重复渲染时不再做NLP分析。
+用法：python3 srt2ass_with_effect.py input.srt output.ass [--align 5] [--font "行书"] [--size 100] [--color white] [--effects "fade,move,scale,typewriter"] [--highlight] [--keyword-size 120] [--per-line] [--dict-file words.txt] [--skip-lines "1,3,5"] [--max-chars 20] [--jobs 4]
 """
 import sys
 import os
 import srt
 import re
+import gc
+import json
+import pickle
+import hashlib
 from datetime import timedelta
 import argparse
 import math
-import jieba
-import jieba.analyse
 from collections import defaultdict
+from ac_matcher import load_matcher
+
+# jieba只在启用关键词高亮时才导入和初始化（见load_jieba），普通转换不承担加载词典的开销
+jieba = None
 
 # 预定义的颜色（BGR格式）
 COLORS = {
@@ -44,6 +53,16 @@ HIGHLIGHT_COLORS = [
     COLORS["yellow"],   # 次重要
 ]
 
+# 关键词高亮使用的命名样式：普通文字、重要关键词、次要关键词
+NORMAL_STYLE = "Normal"
+HIGHLIGHT_STYLES = ["HighlightHigh", "HighlightLow"]
+
+# 关键词分析缓存目录（项目根目录下的sys_cache）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sys_cache")
+
+# 未缓存的行数达到该值时才启用多进程分析（进程启动开销大于小文件的分析时间）
+PARALLEL_MIN_LINES = 200
+
 # 视频分辨率
 VIDEO_WIDTH = 1920
 VIDEO_HEIGHT = 1080
@@ -101,6 +120,10 @@ EFFECTS = {
     "typewriter": lambda duration_ms, align_tag: (
         f"{{{align_tag}\\bord3\\shad2}}"
     ),
+    "typewriter_k": lambda duration_ms, align_tag: (
+        # 次要颜色完全透明：\ko计时到达之前字、边框和阴影都不显示
+        f"{{{align_tag}\\2a&HFF&\\bord3\\shad2}}"
+    ),
     "none": lambda duration_ms, align_tag: (
         f"{{{align_tag}\\bord3\\shad2}}"
     ),
@@ -114,8 +137,18 @@ def srt_time_to_ass(ts: timedelta) -> str:
     centiseconds = int(ts.microseconds / 10000)
     return f"{hours:01d}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
 
-def generate_ass_header(font_name="行书", font_size=100, primary_color="&H00FFFFFF", outline_color="&H00000000", shadow_color="&H80000000", alignment=5):
+def generate_style_line(name, font_name, font_size, primary_color, outline_color="&H00000000", shadow_color="&H80000000", alignment=5):
+    return f"Style: {name},{font_name},{font_size},{primary_color},&H000000FF,{outline_color},{shadow_color},-1,0,0,0,100,100,0,0,1,3,2,{alignment},30,30,30,1"
+
+def generate_ass_header(font_name="行书", font_size=100, primary_color="&H00FFFFFF", outline_color="&H00000000", shadow_color="&H80000000", alignment=5, extra_styles=()):
+    """
+    extra_styles: 额外的命名样式 [(样式名, 颜色, 字体大小), ...]，字体、边框和对齐与Default相同
+    """
     # Alignment: 1=左下, 2=中下, 3=右下, 4=左中, 5=正中, 6=右中, 7=左上, 8=中上, 9=右上
+    styles = [generate_style_line("Default", font_name, font_size, primary_color, outline_color, shadow_color, alignment)]
+    for name, color, size in extra_styles:
+        styles.append(generate_style_line(name, font_name, size, color, outline_color, shadow_color, alignment))
+    styles = "\n".join(styles)
     return f"""[Script Info]
 ScriptType: v4.00+
 PlayResX: {VIDEO_WIDTH}
@@ -125,26 +158,107 @@ ScaledBorderAndShadow: yes
 
 [V4+ Styles]
 Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,{font_name},{font_size},{primary_color},&H000000FF,{outline_color},{shadow_color},-1,0,0,0,100,100,0,0,1,3,2,{alignment},30,30,30,1
+{styles}
 
 [Events]
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
 
-def analyze_keywords(text, top_k=3, min_word_len=2):
+def load_jieba(user_words=()):
+    """
+    导入并初始化jieba，补充词典中的词加入分词词典（词性记为nz），保证这些词不会被切开
+    构建好的前缀词典序列化到sys_cache，之后的运行直接反序列化，不再重新构建
+    返回: jieba模块
+    """
+    global jieba
+    if jieba is not None:
+        return jieba
+    import jieba
+    import jieba.posseg
+    import jieba.analyse
+
+    tokenizer = jieba.dt
+    cache_path = os.path.join(CACHE_DIR, f"jieba_{jieba_dict_version(user_words)}.pkl")
+    try:
+        gc.disable()
+        try:
+            with open(cache_path, 'rb') as f:
+                freq, total, user_tags = pickle.load(f)
+        finally:
+            gc.enable()
+        tokenizer.FREQ, tokenizer.total = freq, total
+        tokenizer.user_word_tag_tab.update(user_tags)
+        tokenizer.initialized = True
+        return jieba
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    tokenizer.initialize()
+    for word in user_words:
+        tokenizer.add_word(word, tag='nz')
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((tokenizer.FREQ, tokenizer.total, tokenizer.user_word_tag_tab), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"警告：写入分词词典缓存失败：{e}")
+    return jieba
+
+def tokenize_cue(text, user_words=()):
+    """
+    对字幕文本做一次带词性的分词，结果供关键词分析、最长词回退和样式输出共用
+    返回: [(词, 词性), ...]
+    """
+    return [(pair.word, pair.flag) for pair in load_jieba(user_words).posseg.cut(text)]
+
+def textrank_from_tokens(tokens, top_k, allow_pos=('ns', 'n', 'vn', 'v'), span=5):
+    """
+    在已分词的结果上运行TextRank（与jieba.analyse.textrank的算法一致，但不再重新分词）
+    返回: [(词, 权重), ...]
+    """
+    from jieba.analyse import default_textrank
+    from jieba.analyse.textrank import UndirectWeightedGraph
+    stop_words = default_textrank.stop_words
+    pos_filt = frozenset(allow_pos)
+
+    def pair_filter(token):
+        word, flag = token
+        return flag in pos_filt and len(word.strip()) >= 2 and word.lower() not in stop_words
+
+    graph = UndirectWeightedGraph()
+    co_occurrence = defaultdict(int)
+    for i, token in enumerate(tokens):
+        if not pair_filter(token):
+            continue
+        for j in range(i + 1, min(i + span, len(tokens))):
+            if pair_filter(tokens[j]):
+                co_occurrence[(token[0], tokens[j][0])] += 1
+
+    for (word1, word2), weight in co_occurrence.items():
+        graph.addEdge(word1, word2, weight)
+    ranks = graph.rank()
+    return sorted(ranks.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+def analyze_keywords(text, top_k=3, min_word_len=2, tokens=None):
     """
     使用TextRank算法分析文本中的关键词
     Args:
         text: 要分析的文本
         top_k: 提取前k个关键词
         min_word_len: 最小词长度，小于此长度的词将被忽略
+        tokens: 已有的分词结果（tokenize_cue），不传则重新分词
     返回: 关键词列表及其权重
     """
     if not text or len(text.strip()) < min_word_len:
         return []
         
     # 使用jieba分词获取所有词
-    words = list(jieba.cut(text, cut_all=False))
+    if tokens is None:
+        tokens = tokenize_cue(text)
+    words = [word for word, _ in tokens]
     # 过滤掉太短的词和停用词
     valid_words = [w for w in words if len(w) >= min_word_len and not w.isspace()]
     
@@ -153,7 +267,7 @@ def analyze_keywords(text, top_k=3, min_word_len=2):
     
     try:
         # 首先尝试使用TextRank算法
-        keywords = jieba.analyse.textrank(text, topK=top_k, withWeight=True)
+        keywords = textrank_from_tokens(tokens, top_k)
         # 过滤掉太短的词
         keywords = [(word, weight) for word, weight in keywords if len(word) >= min_word_len]
         
@@ -172,15 +286,16 @@ def analyze_keywords(text, top_k=3, min_word_len=2):
             return [(longest_word, 0.5)]
         return []
 
-def find_longest_word(text, min_word_len=2):
+def find_longest_word(text, min_word_len=2, tokens=None):
     """
     找出文本中最长的词
     """
     if not text:
         return None, 0
     
-    words = list(jieba.cut(text, cut_all=False))
-    valid_words = [w for w in words if len(w) >= min_word_len and not w.isspace()]
+    if tokens is None:
+        tokens = tokenize_cue(text)
+    valid_words = [w for w, _ in tokens if len(w) >= min_word_len and not w.isspace()]
     
     if not valid_words:
         return None, 0
@@ -188,6 +303,118 @@ def find_longest_word(text, min_word_len=2):
     longest_word = max(valid_words, key=len)
     return longest_word, 0.5  # 使用0.5作为默认权重
 
+def analyze_line(text, top_k=1, min_word_len=2, user_words=()):
+    """
+    分析单行字幕：分词并提取关键词，找不到关键词时用最长的词代替
+    top_k为0时只分词，不提取关键词
+    返回: {"tokens": [(词, 词性), ...], "keywords": [(词, 权重), ...]}
+    """
+    tokens = tokenize_cue(text, user_words)
+    keywords = []
+    if top_k > 0:
+        keywords = analyze_keywords(text, top_k=top_k, min_word_len=min_word_len, tokens=tokens)
+        if not keywords:
+            word, weight = find_longest_word(text, min_word_len=min_word_len, tokens=tokens)
+            if word:
+                keywords = [(word, weight)]
+    return {"tokens": tokens, "keywords": keywords}
+
+def analyze_chunk(args):
+    """进程池任务：按顺序分析一批字幕行"""
+    texts, top_k, min_word_len, user_words = args
+    return [analyze_line(text, top_k, min_word_len, user_words) for text in texts]
+
+def jieba_dict_version(user_words=()):
+    """
+    jieba词典版本标识（jieba版本 + 主词典文件 + 补充词），词典变化后旧的缓存自动失效
+    只导入jieba包本身，不加载词典
+    """
+    import jieba as jieba_pkg
+    dict_path = os.path.abspath(jieba_pkg.dt.dictionary or
+                                os.path.join(os.path.dirname(jieba_pkg.__file__), jieba_pkg.DEFAULT_DICT_NAME))
+    h = hashlib.sha1(jieba_pkg.__version__.encode('utf-8'))
+    h.update(dict_path.encode('utf-8'))
+    if os.path.exists(dict_path):
+        st = os.stat(dict_path)
+        h.update(f"{st.st_size}:{st.st_mtime_ns}".encode('utf-8'))
+    for word in sorted(user_words):
+        h.update(f"\n{word}".encode('utf-8'))
+    return h.hexdigest()[:12]
+
+class KeywordCache:
+    """
+    关键词分析结果的磁盘缓存，键为 (字幕文本, top_k, min_word_len)，每个词典版本一个文件
+    """
+    def __init__(self, version, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, f"keywords_{version}.json")
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(text, top_k, min_word_len):
+        return hashlib.sha1(f"{top_k}\x00{min_word_len}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get(self, text, top_k, min_word_len):
+        entry = self.entries.get(self.key(text, top_k, min_word_len))
+        if entry is None:
+            return None
+        return {name: [tuple(item) for item in items] for name, items in entry.items()}
+
+    def put(self, text, top_k, min_word_len, result):
+        self.entries[self.key(text, top_k, min_word_len)] = result
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"警告：写入关键词缓存失败：{e}")
+
+def analyze_lines(texts, top_k=1, min_word_len=2, jobs=1, cache=None, user_words=()):
+    """
+    批量分析字幕行，结果与texts一一对应
+    已缓存的行直接复用；未缓存的行较多且jobs>1时按顺序分块交给进程池处理
+    """
+    results = [cache.get(text, top_k, min_word_len) if cache else None for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if cache and texts:
+        print(f"关键词缓存命中：{len(texts) - len(missing)}/{len(texts)} 行")
+
+    if missing:
+        pending = [texts[i] for i in missing]
+        if jobs > 1 and len(pending) >= PARALLEL_MIN_LINES:
+            from concurrent.futures import ProcessPoolExecutor
+            # 父进程先加载词典，fork出的子进程直接复用
+            load_jieba(user_words).dt.check_initialized()
+            chunk_size = max(1, math.ceil(len(pending) / (jobs * 4)))
+            chunks = [(pending[k:k + chunk_size], top_k, min_word_len, user_words)
+                      for k in range(0, len(pending), chunk_size)]
+            print(f"使用 {jobs} 个进程分析 {len(pending)} 行字幕")
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                analyzed = [result for chunk in executor.map(analyze_chunk, chunks) for result in chunk]
+        else:
+            analyzed = analyze_chunk((pending, top_k, min_word_len, user_words))
+
+        for i, result in zip(missing, analyzed):
+            results[i] = result
+            if cache:
+                cache.put(texts[i], top_k, min_word_len, result)
+        if cache:
+            cache.save()
+    return results
+
 def load_custom_dictionary(dict_file):
     """
     从文件加载自定义词典
@@ -224,35 +451,117 @@ def merge_keywords(nlp_keywords, dict_keywords):
             
     return merged
 
-def process_subtitle_text(text, keywords_dict, base_size, keyword_size):
+def found_dict_keywords(dict_matcher, dict_keywords, text):
+    """
+    文本中实际出现的词典词 {word: weight}，用于打印分析结果（词典较大时不再逐行列出全部词）
+    """
+    if dict_matcher is None:
+        return {}
+    return {word: dict_keywords[word] for word in dict_matcher.find_words(text.replace('\n', ''))
+            if word in dict_keywords}
+
+def align_tokens(tokens, text):
+    """
+    将原始字幕的分词结果对齐到换行处理后的文本（其中插入了\\N），跨行的词会被拆成两段
+    返回: 文本片段列表，\\N单独作为一个片段；对不齐时返回None
+    """
+    pieces = []
+    pos = 0
+    for word, _ in tokens:
+        buf = ""
+        for char in word:
+            while text.startswith('\\N', pos):
+                if buf:
+                    pieces.append(buf)
+                    buf = ""
+                pieces.append('\\N')
+                pos += 2
+            if char == '\n':
+                # 原始换行已经替换为\N，并在上面被消耗
+                continue
+            if pos >= len(text) or text[pos] != char:
+                return None
+            buf += char
+            pos += 1
+        if buf:
+            pieces.append(buf)
+    while text.startswith('\\N', pos):
+        pieces.append('\\N')
+        pos += 2
+    return pieces if pos == len(text) else None
+
+def style_for_weight(weight):
+    """关键词权重对应的高亮样式：权重高用红色，低用黄色"""
+    return HIGHLIGHT_STYLES[1 if weight < 0.5 else 0]
+
+def process_subtitle_text(text, keywords_dict, tokens=None, user_words=(), reset_tags="", inline_styles=None,
+                          dict_matcher=None, dict_keywords=None):
     """
-    处理字幕文本，为关键词添加颜色和大小标记
+    处理字幕文本，按关键词切换命名样式（事件本身使用Normal样式）
+    相同样式的连续文字合并为一段，只在样式变化处插入{\\r样式名}（回到Normal时为{\\r}）
+    tokens: 原始字幕的分词结果（tokenize_cue），传入时不再重新分词
+    user_words: 补充词典中的词，需要重新分词时使用
+    reset_tags: \\r会清除的效果标签（如typewriter_k的\\2a），每次切换样式后重新附加
+    inline_styles: {样式名: 覆盖标签}，指定时样式切换改用颜色和字号覆盖标签（如\\c&H000000FF\\fs120），
+                   不用\\r（\\r会清除动画效果的\\t变换，每次切换都要重新附加全部变换，文件反而变大）
+    dict_matcher: 补充词典的Aho–Corasick自动机（ac_matcher），词典中的词按字符位置高亮，不依赖分词结果
     """
     if not text:
         return text
         
-    # 使用jieba分词
-    words = jieba.cut(text, cut_all=False)
-    words = list(words)
+    words = align_tokens(tokens, text) if tokens is not None else None
+    if words is None:
+        # 使用jieba分词
+        words = [w for w, _ in tokenize_cue(text, user_words)]
     
-    # 为每个词分配样式
-    word_styles = []
+    # 逐字记录关键词权重：先按分词结果标记NLP关键词
+    pieces = []
+    weights = []
     for word in words:
-        if word in keywords_dict:
-            # 根据关键词权重选择颜色
-            weight = keywords_dict[word]
-            # 将权重归一化到[0,1]区间，然后用于选择颜色
-            color_index = 1 if weight < 0.5 else 0  # 权重高用红色，低用黄色
-            word_styles.append((word, HIGHLIGHT_COLORS[color_index], keyword_size))
-        else:
-            word_styles.append((word, COLORS["white"], base_size))
+        if word == '\\N':
+            pieces.append(word)
+            continue
+        pieces.extend(word)
+        weights.extend([keywords_dict.get(word)] * len(word))
     
-    # 构建带样式的文本
-    result = ""
-    for word, color, size in word_styles:
-        result += f"{{\\c{color}\\fs{size}}}{word}"
+    # 再用自动机扫描去掉换行符的文本，标记词典中的词（跨行的词也能匹配）
+    if dict_matcher is not None:
+        plain = "".join(piece for piece in pieces if piece != '\\N')
+        for start, end in dict_matcher.find_spans(plain):
+            weight = dict_keywords.get(plain[start:end], 0.8)
+            for k in range(start, end):
+                if weights[k] is None or weights[k] < weight:
+                    weights[k] = weight
     
-    return result
+    result = []
+    current_style = NORMAL_STYLE
+    char_index = 0
+    for piece in pieces:
+        # 换行符不切换样式，避免把\N拆开
+        if piece != '\\N':
+            weight = weights[char_index]
+            char_index += 1
+            style = NORMAL_STYLE if weight is None else style_for_weight(weight)
+            if style != current_style:
+                if inline_styles:
+                    result.append(f"{{{inline_styles[style]}}}")
+                else:
+                    result.append(f"{{\\r{'' if style == NORMAL_STYLE else style}{reset_tags}}}")
+                current_style = style
+        result.append(piece)
+    
+    return "".join(result)
+
+def effect_reset_tags(effect_tag):
+    """
+    提取动画效果标签中会被\\r清除、需要在样式切换后重新附加的部分（次要颜色透明度）
+    \\an、\\pos、\\move、\\fade、\\org作用于整行，不受\\r影响；\\t变换不重新附加，见effect_has_transform
+    """
+    return "".join(re.findall(r'\\2a&H[0-9A-Fa-f]+&', effect_tag))
+
+def effect_has_transform(effect_tag):
+    """动画效果是否含有\\t变换（会被\\r清除，样式切换需改用覆盖标签）"""
+    return '\\t(' in effect_tag
 
 def apply_dual_style(content, primary_color, secondary_color, primary_size, secondary_size, split_pos):
     """应用双重样式（颜色和大小）到文本"""
@@ -278,49 +587,61 @@ def apply_typewriter_effect(text, duration_ms):
         style_tag = style_match.group(1)
         content = style_match.group(2)
     
+    # 换行符\N和样式切换标签（如关键词高亮的{\\r样式名}）作为整体保留，不添加动画效果
+    pieces = re.findall(r'\{[^}]*\}|\\N|.', content)
+    
     # 计算每个字符的延迟时间
-    char_count = len(content)
+    char_count = sum(1 for piece in pieces if piece[0] != '{' and piece != '\\N')
     if char_count <= 1:
         return text
         
     # 每个字符显示的时间间隔
     interval = duration_ms / (char_count * 1.2)  # 留一些时间让最后的字符可见
     
-    result = ""
+    result = []
     current_time = 0
     
-    # 特殊处理换行符\N
-    segments = []
-    current_segment = ""
-    i = 0
-    while i < len(content):
-        # 检查是否是\N换行符
-        if i < len(content) - 1 and content[i] == '\\' and content[i+1] == 'N':
-            if current_segment:
-                segments.append(current_segment)
-            segments.append("\\N")  # 保留\N作为一个整体
-            current_segment = ""
-            i += 2  # 跳过\N两个字符
-        else:
-            current_segment += content[i]
-            i += 1
-    
-    # 添加最后一个片段
-    if current_segment:
-        segments.append(current_segment)
-    
-    # 为每个字符添加延迟显示标签，但\N作为一个整体处理
-    for segment in segments:
-        if segment == "\\N":
-            # 换行符直接添加，不添加动画效果
-            result += "\\N"
-        else:
-            # 正常字符逐个添加动画效果
-            for char in segment:
-                result += f"{style_tag}{{\\alpha&HFF&\\t({int(current_time)},{int(current_time+10)},\\alpha&H00&)}}{char}"
-                current_time += interval
+    for piece in pieces:
+        if piece[0] == '{' or piece == "\\N":
+            result.append(piece)
+            continue
+        # 正常字符逐个添加动画效果
+        result.append(f"{style_tag}{{\\alpha&HFF&\\t({int(current_time)},{int(current_time+10)},\\alpha&H00&)}}{piece}")
+        current_time += interval
     
-    return result
+    return "".join(result)
+
+def apply_karaoke_typewriter(text, duration_ms):
+    """
+    用\\ko卡拉OK计时实现打字机效果（配合typewriter_k效果中的\\2a&HFF&）
+    每个字前只有一个很短的\\ko标签，原有的样式标签（如关键词高亮）原样保留并入其中
+    """
+    if not text:
+        return text
+    
+    pieces = re.findall(r'\{[^}]*\}|\\N|.', text)
+    char_count = sum(1 for piece in pieces if piece[0] != '{' and piece != '\\N')
+    if char_count <= 1:
+        return text
+    
+    # 第i个字在 i*interval 毫秒时出现，\ko的单位是厘秒，按累计时间取整避免误差累积
+    interval = duration_ms / (char_count * 1.2)
+    result = []
+    pending_tags = ""
+    index = 0
+    for piece in pieces:
+        if piece[0] == '{':
+            pending_tags += piece[1:-1]
+        elif piece == '\\N':
+            result.append(piece)
+        else:
+            index += 1
+            karaoke_cs = round(index * interval / 10) - round((index - 1) * interval / 10)
+            result.append(f"{{{pending_tags}\\ko{karaoke_cs}}}{piece}")
+            pending_tags = ""
+    if pending_tags:
+        result.append(f"{{{pending_tags}}}")
+    return "".join(result)
 
 def wrap_text_by_char_count(text, max_chars):
     """
@@ -366,17 +687,8 @@ def wrap_text_by_char_count(text, max_chars):
     
     return '\\N'.join(result)
 
-def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5, color="white", 
-            effect="fade", effects=None, color2=None, size2=None, split_pos=0, highlight=False, 
-            keyword_size=None, per_line=False, dict_file=None, skip_lines=None, max_chars=0):
-    """
-    转换SRT到ASS，支持关键词高亮和动画效果轮播
-    """
-    with open(srt_path, 'r', encoding='utf-8') as f:
-        srt_content = f.read()
-    subs = list(srt.parse(srt_content))
-    
-    # 解析动画效果列表
+def parse_effect_list(effect="fade", effects=None):
+    """解析动画效果列表：--effects指定的多个效果轮播，否则使用单一效果"""
     effect_list = []
     if effects:
         # 解析多个效果
@@ -394,6 +706,15 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
         effect_list = [effect]
     
     print(f"\n动画效果轮播顺序：{' → '.join(effect_list)}")
+    return effect_list
+
+def prepare_subtitles(srt_path, highlight=False, per_line=False, dict_file=None, skip_lines=None, jobs=1):
+    """
+    解析SRT并完成与输出样式无关的工作（时间转换、分词和关键词分析），结果供多个输出变体共用
+    """
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        srt_content = f.read()
+    subs = list(srt.parse(srt_content))
     
     # 解析要跳过的行号
     skip_lines_set = set()
@@ -411,11 +732,25 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
         dict_keywords = load_custom_dictionary(dict_file)
         print(f"\n已从词典文件加载 {len(dict_keywords)} 个补充词")
     
+    # 补充词典中的词加入分词词典，保证高亮时不会被切开（全部命中缓存时不加载分词词典）
+    user_words = tuple(sorted(dict_keywords))
+    # 词典中的词由Aho–Corasick自动机逐字匹配高亮，自动机按词表缓存
+    dict_matcher = load_matcher(dict_keywords) if highlight and dict_keywords else None
+    
     # 如果启用高亮，预处理字幕文本以提取关键词
     keywords_dict = {}
+    cue_tokens = {}
     if highlight:
+        # 每行字幕只分词一次，关键词分析、最长词回退和样式输出共用；结果缓存到磁盘
+        cache = KeywordCache(jieba_dict_version(user_words))
+        line_numbers = [i for i in range(1, len(subs) + 1) if i not in skip_lines_set]
+        texts = [subs[i - 1].content for i in line_numbers]
+        line_results = analyze_lines(texts, top_k=1 if per_line else 0, min_word_len=2, jobs=jobs, cache=cache,
+                                     user_words=user_words)
+        cue_tokens = {i: result["tokens"] for i, result in zip(line_numbers, line_results)}
         if per_line:
             print("逐行分析关键词：")
+            line_keywords = {i: result["keywords"] for i, result in zip(line_numbers, line_results)}
             # 每行字幕单独分析，提取关键词
             for i, sub in enumerate(subs, 1):  # 从1开始计数，与SRT文件行号对应
                 # 如果当前行需要跳过分析
@@ -423,20 +758,11 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
                     print(f"  跳过第{i}行：{sub.content.replace(chr(10), ' ')}")
                     continue
                 
-                # NLP分析
-                line_keywords = analyze_keywords(sub.content, top_k=1, min_word_len=2)
-                nlp_dict = {}
-                if line_keywords:
-                    word, weight = line_keywords[0]
-                    nlp_dict[word] = weight
-                else:
-                    # 如果没有找到关键词，使用最长的词
-                    word, weight = find_longest_word(sub.content)
-                    if word:
-                        nlp_dict[word] = weight
+                # NLP分析（找不到关键词时analyze_line已回退为最长的词）
+                nlp_dict = dict(line_keywords[i][:1])
                 
-                # 合并NLP结果和词典词
-                line_dict = merge_keywords(nlp_dict, dict_keywords)
+                # 合并NLP结果和本行出现的词典词
+                line_dict = merge_keywords(nlp_dict, found_dict_keywords(dict_matcher, dict_keywords, sub.content))
                 
                 # 更新全局关键词字典
                 keywords_dict.update(line_dict)
@@ -450,13 +776,23 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
                 print()
         else:
             # 合并所有非跳过行的字幕文本进行整体分析
-            all_text = ' '.join(sub.content for i, sub in enumerate(subs, 1) 
-                              if i not in skip_lines_set)
-            nlp_keywords = analyze_keywords(all_text, top_k=5, min_word_len=2)  # 提取前5个关键词
+            all_text = ' '.join(texts)
+            cached = cache.get(all_text, 5, 2)
+            if cached is not None:
+                nlp_keywords = cached["keywords"]
+            else:
+                all_tokens = []
+                for tokens in cue_tokens.values():
+                    if all_tokens:
+                        all_tokens.append((' ', 'x'))
+                    all_tokens.extend(tokens)
+                nlp_keywords = analyze_keywords(all_text, top_k=5, min_word_len=2, tokens=all_tokens)  # 提取前5个关键词
+                cache.put(all_text, 5, 2, {"keywords": nlp_keywords})
+                cache.save()
             nlp_dict = {word: weight for word, weight in nlp_keywords}
             
-            # 合并NLP结果和词典词
-            keywords_dict = merge_keywords(nlp_dict, dict_keywords)
+            # 合并NLP结果和字幕中出现的词典词
+            keywords_dict = merge_keywords(nlp_dict, found_dict_keywords(dict_matcher, dict_keywords, all_text))
             
             # 打印分析结果
             print("关键词分析结果：")
@@ -467,6 +803,53 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
                 color = "红色" if weight >= 0.5 else "黄色"
                 print(f"  {word}: {weight:.4f} ({color}) [{source}]")
     
+    # 时间转换与输出样式无关，只做一次
+    timings = [(srt_time_to_ass(sub.start), srt_time_to_ass(sub.end),
+                int((sub.end - sub.start).total_seconds() * 1000)) for sub in subs]
+    
+    return {
+        "subs": subs,
+        "timings": timings,
+        "highlight": highlight,
+        "per_line": per_line,
+        "dict_file": dict_file,
+        "skip_lines_set": skip_lines_set,
+        "keywords_dict": keywords_dict,
+        "cue_tokens": cue_tokens,
+        "user_words": user_words,
+        "dict_matcher": dict_matcher,
+        "dict_keywords": dict_keywords,
+        "wrapped": {},
+    }
+
+def wrapped_contents(prepared, max_chars):
+    """换行处理后的字幕文本（\\N换行），相同max_chars的变体共用"""
+    if max_chars not in prepared["wrapped"]:
+        contents = []
+        for sub in prepared["subs"]:
+            # 替换文本中的换行符
+            content = sub.content.replace('\n', '\\N')
+            # 如果指定了最大字符数，进行自动换行处理
+            if max_chars > 0:
+                content = wrap_text_by_char_count(content, max_chars)
+            contents.append(content)
+        prepared["wrapped"][max_chars] = contents
+    return prepared["wrapped"][max_chars]
+
+def render_ass(prepared, ass_path, font_size=100, font_name="行书", alignment=5, color="white",
+               effect="fade", effects=None, color2=None, size2=None, split_pos=0, keyword_size=None, max_chars=0,
+               overlay_dir=None, video_size=(VIDEO_WIDTH, VIDEO_HEIGHT), fonts_dir="./sys_font"):
+    """
+    按一组样式参数把prepare_subtitles的结果写成ASS文件
+    overlay_dir: 指定时另外把静态字幕预渲染为PNG并生成叠加滤镜脚本（见ass_overlay.py）
+    """
+    effect_list = parse_effect_list(effect, effects)
+    highlight = prepared["highlight"]
+    skip_lines_set = prepared["skip_lines_set"]
+    keywords_dict = prepared["keywords_dict"]
+    cue_tokens = prepared["cue_tokens"]
+    user_words = prepared["user_words"]
+    
     # 设置关键词字体大小
     if keyword_size is None:
         keyword_size = int(font_size * 1.2)  # 默认比普通字体大20%
@@ -475,40 +858,26 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
     primary_color = COLORS.get(color.lower(), COLORS["white"])
     secondary_color = COLORS.get(color2.lower(), primary_color) if color2 else primary_color
     
-    ass_lines = [generate_ass_header(
+    # 高亮模式注册命名样式，事件文本中只在样式变化处使用\r切换
+    extra_styles = []
+    if highlight:
+        extra_styles = [(NORMAL_STYLE, COLORS["white"], font_size)]
+        extra_styles += [(name, color, keyword_size) for name, color in zip(HIGHLIGHT_STYLES, HIGHLIGHT_COLORS)]
+    # 带\t变换的效果：样式切换用颜色和字号覆盖标签，不清除变换（各样式只有颜色和字号不同）
+    inline_styles = {name: f"\\c{color}\\fs{size}" for name, color, size in extra_styles}
+    
+    header = generate_ass_header(
         font_name=font_name,
         font_size=font_size,
         primary_color=primary_color,
-        alignment=alignment
-    )]
+        alignment=alignment,
+        extra_styles=extra_styles
+    )
+    ass_lines = [header]
+    events = []
     
-    for i, sub in enumerate(subs, 1):
-        start = srt_time_to_ass(sub.start)
-        end = srt_time_to_ass(sub.end)
-        duration_ms = int((sub.end - sub.start).total_seconds() * 1000)
-        
-        # 替换文本中的换行符
-        content = sub.content.replace('\n', '\\N')
-        
-        # 如果指定了最大字符数，进行自动换行处理
-        if max_chars > 0:
-            content = wrap_text_by_char_count(content, max_chars)
-        
-        # 处理文本样式
-        if highlight:
-            # 如果是跳过的行，使用普通样式
-            if i in skip_lines_set:
-                content = f"{{\\c{primary_color}\\fs{font_size}}}{content}"
-            else:
-                # 使用NLP处理添加关键词高亮
-                content = process_subtitle_text(content, keywords_dict, font_size, keyword_size)
-        elif (color2 or size2) and split_pos > 0:
-            # 使用传统的双重样式
-            content = apply_dual_style(content, primary_color, secondary_color, font_size, size2, split_pos)
-        else:
-            # 使用单一样式
-            content = f"{{\\c{primary_color}\\fs{font_size}}}{content}"
-        
+    contents = wrapped_contents(prepared, max_chars)
+    for i, ((start, end, duration_ms), content) in enumerate(zip(prepared["timings"], contents), 1):
         # 获取当前行的动画效果（轮播）
         current_effect = effect_list[(i - 1) % len(effect_list)]
         effect_func = EFFECTS[current_effect]
@@ -516,27 +885,46 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
         # 强制加\anX对齐标签和动画效果
         effect_tag = effect_func(duration_ms, f"\\an{alignment}")
         
+        # 处理文本样式（颜色和大小与行样式相同时不再写内联标签）
+        line_style = "Default"
+        if highlight and i not in skip_lines_set:
+            # 使用NLP处理添加关键词高亮（跳过的行使用Default样式）
+            line_style = NORMAL_STYLE
+            content = process_subtitle_text(content, keywords_dict, tokens=cue_tokens.get(i),
+                                            user_words=user_words, reset_tags=effect_reset_tags(effect_tag),
+                                            inline_styles=inline_styles if effect_has_transform(effect_tag) else None,
+                                            dict_matcher=prepared["dict_matcher"],
+                                            dict_keywords=prepared["dict_keywords"])
+        elif not highlight and (color2 or size2) and split_pos > 0:
+            # 使用传统的双重样式
+            content = apply_dual_style(content, primary_color, secondary_color, font_size, size2, split_pos)
+        
         # 如果是打字机效果，应用特殊处理
         if current_effect == "typewriter":
             content = apply_typewriter_effect(content, duration_ms)
+        elif current_effect == "typewriter_k":
+            content = apply_karaoke_typewriter(content, duration_ms)
         
-        # 移除可能重复的花括号
-        effect_tag = effect_tag.rstrip('}')
-        if not current_effect == "typewriter":  # 打字机效果已经处理过内容，不需要再处理
-            content = content.lstrip('{')
-        
-        # 组合所有标签和内容
-        text = effect_tag + content
-        dialogue = f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}"
+        # 内容以标签开头时与效果标签合并为一个标签块
+        if content.startswith('{'):
+            text = effect_tag[:-1] + content[1:]
+        else:
+            text = effect_tag + content
+        dialogue = f"Dialogue: 0,{start},{end},{line_style},,0,0,0,,{text}"
         ass_lines.append(dialogue)
+        sub = prepared["subs"][i - 1]
+        events.append((sub.start.total_seconds(), sub.end.total_seconds(), line_style, text))
     
     with open(ass_path, 'w', encoding='utf-8') as f:
         f.write('\n'.join(ass_lines))
     print(f"\n转换完成: {ass_path}")
+    if overlay_dir:
+        from ass_overlay import build_overlay
+        build_overlay(header, events, overlay_dir, video_size=video_size, fonts_dir=fonts_dir)
     if highlight:
-        mode = "逐行分析" if per_line else "整体分析"
+        mode = "逐行分析" if prepared["per_line"] else "整体分析"
         sources = []
-        if dict_file:
+        if prepared["dict_file"]:
             sources.append("词典补充")
         sources.append("NLP分析")
         print(f"已启用关键词高亮功能（{mode} + {' + '.join(sources)}）")
@@ -556,6 +944,75 @@ def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5,
     if max_chars > 0:
         print(f"已启用自动换行，每行最大字符数: {max_chars}")
 
+
+def srt2ass(srt_path, ass_path, font_size=100, font_name="行书", alignment=5, color="white", 
+            effect="fade", effects=None, color2=None, size2=None, split_pos=0, highlight=False, 
+            keyword_size=None, per_line=False, dict_file=None, skip_lines=None, max_chars=0, jobs=1,
+            variants=None, overlay_dir=None, video_size=(VIDEO_WIDTH, VIDEO_HEIGHT), fonts_dir="./sys_font"):
+    """
+    转换SRT到ASS，支持关键词高亮和动画效果轮播
+    variants: 额外的输出变体 [(ASS路径, {参数名: 值}), ...]，未指定的参数沿用本次调用的参数；
+              所有输出共用一次解析和关键词分析
+    """
+    prepared = prepare_subtitles(srt_path, highlight=highlight, per_line=per_line, dict_file=dict_file,
+                                 skip_lines=skip_lines, jobs=jobs)
+    style = dict(font_size=font_size, font_name=font_name, alignment=alignment, color=color,
+                 effect=effect, effects=effects, color2=color2, size2=size2, split_pos=split_pos,
+                 keyword_size=keyword_size, max_chars=max_chars, video_size=video_size, fonts_dir=fonts_dir)
+    render_ass(prepared, ass_path, overlay_dir=overlay_dir, **style)
+    for variant_path, overrides in variants or []:
+        render_ass(prepared, variant_path, **dict(style, **overrides))
+
+# --variant中可以覆盖的参数：名称 -> (render_ass参数名, 类型)
+VARIANT_KEYS = {
+    "align": ("alignment", int),
+    "font": ("font_name", str),
+    "size": ("font_size", int),
+    "color": ("color", str),
+    "effect": ("effect", str),
+    "effects": ("effects", str),
+    "color2": ("color2", str),
+    "size2": ("size2", int),
+    "split": ("split_pos", int),
+    "keyword_size": ("keyword_size", int),
+    "max_chars": ("max_chars", int),
+    "overlay_dir": ("overlay_dir", str),
+}
+
+def parse_variant(spec):
+    """
+    解析输出变体，格式："输出.ass:align=2,color=red,max_chars=10"
+    effects的值本身含逗号（如effects=fade,zoom），不含=的片段并入前一个参数
+    返回: (ASS路径, {render_ass参数名: 值})
+    """
+    path, _, options = spec.partition(':')
+    if not path:
+        raise argparse.ArgumentTypeError(f"变体缺少输出路径: {spec}")
+    overrides = {}
+    last_name = None
+    for part in options.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '=' not in part:
+            if last_name is None or not isinstance(overrides[last_name], str):
+                raise argparse.ArgumentTypeError(f"无法解析的变体参数: {part}")
+            overrides[last_name] += ',' + part
+            continue
+        key, value = (x.strip() for x in part.split('=', 1))
+        key = key.replace('-', '_')
+        if key not in VARIANT_KEYS:
+            raise argparse.ArgumentTypeError(f"未知的变体参数: {key}（可用: {', '.join(VARIANT_KEYS)}）")
+        name, convert = VARIANT_KEYS[key]
+        try:
+            overrides[name] = convert(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"变体参数 {key} 的值无效: {value}")
+        last_name = name
+    if overrides.get("alignment", 5) not in range(1, 10):
+        raise argparse.ArgumentTypeError(f"变体对齐方式必须是1-9: {overrides['alignment']}")
+    return path, overrides
+
 def main():
     parser = argparse.ArgumentParser(description='将SRT字幕转换为ASS字幕，并添加特效')
     parser.add_argument('input', help='输入的SRT文件路径')
@@ -564,7 +1021,7 @@ def main():
     parser.add_argument('--size', type=int, default=100, help='字体大小')
     parser.add_argument('--align', type=int, choices=range(1,10), default=5, help='对齐方式(1-9)')
     parser.add_argument('--color', default='white', help='字体颜色')
-    parser.add_argument('--effect', default='fade', help='单一动画效果(包括typewriter打字机效果)')
+    parser.add_argument('--effect', default='fade', help='单一动画效果(包括typewriter打字机效果、typewriter_k卡拉OK计时打字机效果)')
     parser.add_argument('--effects', help='多个动画效果，用逗号分隔（如"fade,move,typewriter"）')
     parser.add_argument('--color2', help='第二种颜色（用于双重样式）')
     parser.add_argument('--size2', type=int, help='第二种字体大小（用于双重样式）')
@@ -575,6 +1032,13 @@ def main():
     parser.add_argument('--dict-file', help='补充词典文件路径')
     parser.add_argument('--skip-lines', help='要跳过分析的行号列表，用逗号分隔（如"1,3,5"）')
     parser.add_argument('--max-chars', type=int, default=0, help='每行最大字符数，超过时自动换行（0表示不限制）')
+    parser.add_argument('--variant', action='append', type=parse_variant, default=[],
+                        help='额外输出的变体，可重复指定，格式"输出.ass:align=2,color=red,max_chars=10"，'
+                             '未指定的参数沿用命令行参数')
+    parser.add_argument('--overlay-dir', help='静态字幕预渲染为PNG并在该目录生成ffmpeg叠加滤镜脚本filter.txt（需要ffmpeg）')
+    parser.add_argument('--video-size', default=f'{VIDEO_WIDTH}x{VIDEO_HEIGHT}', help='叠加模式下视频的分辨率（默认: 1920x1080）')
+    parser.add_argument('--fonts-dir', default='./sys_font', help='叠加模式下渲染字幕使用的字体目录')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='关键词分析的进程数（默认: CPU核数，字幕行数较少时不启用多进程）')
     
     args = parser.parse_args()
     
@@ -594,7 +1058,12 @@ def main():
         per_line=args.per_line,
         dict_file=args.dict_file,
         skip_lines=args.skip_lines,
-        max_chars=args.max_chars
+        max_chars=args.max_chars,
+        jobs=args.jobs,
+        variants=args.variant,
+        overlay_dir=args.overlay_dir,
+        video_size=tuple(int(x) for x in args.video_size.lower().split('x')),
+        fonts_dir=args.fonts_dir
     )
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ import os
 import sys
 import pypinyin
 from difflib import SequenceMatcher
+from stream_progress import wait_until_done
 
 pre_punc = "《“"
 post_punc = "，。！？,.!?;；:：、》”"
@@ -355,6 +356,8 @@ if __name__ == "__main__":
     srt_file = sys.argv[2]
     srt_file_new = sys.argv[3]
 
+    #srt_gen.py --stream 仍在写出时先等待识别结束（中途失败则使用已落盘的部分结果）
+    wait_until_done(srt_file)
     content_map_list = gen_content_map(content_file)
     srt_map_list     = srt_to_content(srt_file)
     #for item in content_map_list: print(item)
@@ -6,8 +6,17 @@
 
 from faster_whisper import WhisperModel
 import os
+import re
 import sys
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
+from difflib import SequenceMatcher
+from srt_gen_silence import frame_rms_db, find_pauses
+from audio_cache import load_audio, file_hash, ASR_SAMPLE_RATE as SAMPLE_RATE
+from stream_progress import write_progress, clear_progress, current_state
 
 
 def format_timestamp(seconds):
@@ -35,46 +44,109 @@ def generate_srt(segments, output_file):
 
     print(f"SRT字幕文件已生成: {output_file}")
 
-def transcribe_to_srt(audio_file, output_srt=None, model_size="large-v3", language="zh", word_output_file=None):
-    """将音频文件转录为SRT字幕文件，并保存词级时间戳"""
-    if not os.path.exists(audio_file):
-        raise FileNotFoundError(f"音频文件不存在: {audio_file}")
-
-    if output_srt is None:
-        base_name = os.path.splitext(audio_file)[0]
-        output_srt = f"{base_name}.srt"
-    
-    # 如果未指定词级时间戳文件路径，则根据SRT文件路径生成
-    if word_output_file is None:
-        word_output_file = f"{os.path.splitext(output_srt)[0]}_words.txt"
-
-    print(f"正在加载faster-whisper模型: {model_size}")
-    model = WhisperModel(model_size)
+def collect_segments(segments_gen, on_result=None, offset=0.0):
+    """收集faster-whisper的分段结果，返回 (分段列表, 词级时间戳列表)
 
-    print(f"正在转录音频文件: {audio_file}")
-    segments_gen, info = model.transcribe(
-        audio_file,
-        language=language,
-        word_timestamps=True,
-        vad_filter=True
-    )
-
-    # 收集分段 + 词级时间戳
+    分段为 (start, end, text)，词为 (start, end, word)
+    on_result: 每识别出一个分段就以 ([分段], [该分段的词]) 调用一次，用于流式写出
+    offset: 识别的音频从原音频第offset秒开始时，时间戳加上offset
+    """
     segments = []
-    word_lines = []
-    full_text = ""
+    words = []
     for seg in segments_gen:
-        start = seg.start
-        end = seg.end
-        text = seg.text
-        segments.append((start, end, text))
-        full_text += text
-
+        segment = (seg.start + offset, seg.end + offset, seg.text)
+        seg_words = []
         if seg.words:  # 如果有词级时间戳
             for word in seg.words:
-                word_line = f"{format_timestamp(word.start)} --> {format_timestamp(word.end)}  {word.word}"
-                word_lines.append(word_line)
-
+                seg_words.append((word.start + offset, word.end + offset, word.word))
+        segments.append(segment)
+        words.extend(seg_words)
+        if on_result:
+            on_result([segment], seg_words)
+    return segments, words
+
+
+class StreamingWriter:
+    """边识别边追加写出SRT和词级时间戳文件
+
+    每累计flush_every个分段fsync一次，并更新 <文件>.progress 进度标记，
+    标记中记录已落盘的字节数，下游可以安全地跟随读取；识别中途失败时已落盘的部分结果仍然可用。
+    source: 写入标记的识别来源（音频哈希、模型、语言），重跑时只有来源一致才能接着失败的位置继续
+    resume: 上次失败时的 (SRT标记, 词文件标记)，指定时截断到已落盘的字节数后追加写出
+    """
+
+    def __init__(self, output_srt, word_output_file, flush_every=10, source=None, resume=None):
+        self.output_srt = output_srt
+        self.word_output_file = word_output_file
+        self.flush_every = flush_every
+        self.source = dict(source or {})
+        self.segment_count = 0
+        self.word_count = 0
+        self.pending = 0
+        self.audio_time = 0.0
+        if resume:
+            srt_state, word_state = resume
+            for path, state in ((output_srt, srt_state), (word_output_file, word_state)):
+                with open(path, "r+b") as f:
+                    f.truncate(state["bytes"])
+            self.segment_count = srt_state["segments"]
+            self.word_count = srt_state["words"]
+            self.audio_time = srt_state["audio_time"]
+        mode = "a" if resume else "w"
+        self.srt_file = open(output_srt, mode, encoding="utf-8")
+        self.word_file = open(word_output_file, mode, encoding="utf-8")
+        self.sync("running")
+
+    def add(self, segments, words):
+        for start, end, text in segments:
+            self.segment_count += 1
+            self.srt_file.write(f"{self.segment_count}\n")
+            self.srt_file.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n")
+            self.srt_file.write(f"{text.strip()}\n\n")
+            self.audio_time = max(self.audio_time, end)
+        for start, end, word in words:
+            self.word_file.write(f"{format_timestamp(start)} --> {format_timestamp(end)}  {word}\n")
+            self.word_count += 1
+        self.pending += len(segments)
+        if self.pending >= self.flush_every:
+            self.sync("running")
+
+    def sync(self, state, **extra):
+        """落盘并发布进度标记"""
+        for f in (self.srt_file, self.word_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = 0
+        common = dict(segments=self.segment_count, words=self.word_count, audio_time=self.audio_time,
+                      source=self.source, **extra)
+        write_progress(self.output_srt, state=state, bytes=self.srt_file.tell(), **common)
+        write_progress(self.word_output_file, state=state, bytes=self.word_file.tell(), **common)
+
+    def close(self, state="done", **extra):
+        self.sync(state, **extra)
+        self.srt_file.close()
+        self.word_file.close()
+
+
+def resumable_state(output_srt, word_output_file, source):
+    """
+    上次流式识别中途失败、来源相同且已有落盘结果时，返回 (SRT标记, 词文件标记)，否则返回None
+    """
+    srt_state = current_state(output_srt)
+    word_state = current_state(word_output_file)
+    for state, path in ((srt_state, output_srt), (word_state, word_output_file)):
+        if not state or state.get("state") != "failed" or state.get("source") != source:
+            return None
+        if not os.path.exists(path) or os.path.getsize(path) < state.get("bytes", 0):
+            return None
+    if srt_state.get("audio_time", 0) <= 0:
+        return None
+    return srt_state, word_state
+
+
+def write_outputs(segments, words, output_srt, word_output_file):
+    """写出SRT字幕文件和词级时间戳文件，并打印识别摘要"""
+    full_text = "".join(seg[2] for seg in segments)
     print("识别结果:")
     print("-" * 50)
     print(full_text)
@@ -82,8 +154,11 @@ def transcribe_to_srt(audio_file, output_srt=None, model_size="large-v3", langua
 
     if segments:
         generate_srt(segments, output_srt)
+        clear_progress(output_srt)
+        clear_progress(word_output_file)
 
         # 写入词级时间戳文件
+        word_lines = [f"{format_timestamp(start)} --> {format_timestamp(end)}  {word}" for start, end, word in words]
         with open(word_output_file, "w", encoding="utf-8") as f:
             f.write("\n".join(word_lines))
         print(f"词级时间戳文件已生成: {word_output_file}")
@@ -98,6 +173,323 @@ def transcribe_to_srt(audio_file, output_srt=None, model_size="large-v3", langua
     else:
         print("警告: 没有检测到音频分段，无法生成SRT文件")
 
+
+def default_output_paths(audio_file, output_srt=None, word_output_file=None):
+    """根据音频文件路径补全SRT和词级时间戳文件路径"""
+    if output_srt is None:
+        base_name = os.path.splitext(audio_file)[0]
+        output_srt = f"{base_name}.srt"
+
+    # 如果未指定词级时间戳文件路径，则根据SRT文件路径生成
+    if word_output_file is None:
+        word_output_file = f"{os.path.splitext(output_srt)[0]}_words.txt"
+    return output_srt, word_output_file
+
+
+def transcribe_to_srt(audio_file, output_srt=None, model_size="large-v3", language="zh", word_output_file=None,
+                      workers=1, chunk_seconds=60, stream=False):
+    """将音频文件转录为SRT字幕文件，并保存词级时间戳
+
+    workers大于1时，长音频会在静音处切块并由多个进程并行识别。
+    stream为True时每识别出一个分段就追加写出，并发布进度标记供下游跟随读取；
+    上次流式识别中途失败时，保留已落盘的部分，从最后一个落盘分段的结束时间接着识别。
+    """
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"音频文件不存在: {audio_file}")
+
+    output_srt, word_output_file = default_output_paths(audio_file, output_srt, word_output_file)
+
+    if stream:
+        source = {"audio": file_hash(audio_file), "model": model_size, "language": language}
+        resume = resumable_state(output_srt, word_output_file, source)
+        writer = StreamingWriter(output_srt, word_output_file, source=source, resume=resume)
+        if resume:
+            print(f"接着上次中断的位置继续识别: 已有 {writer.segment_count} 个分段，从 "
+                  f"{format_timestamp(writer.audio_time)} 开始")
+        try:
+            segments, words, _ = run_asr(audio_file, model_size, language, workers, chunk_seconds,
+                                         on_result=writer.add, start=writer.audio_time)
+        except BaseException as e:
+            writer.close("failed", error=str(e))
+            print(f"识别中断，已写出 {writer.segment_count} 个分段: {output_srt}")
+            raise
+        writer.close("done")
+        print(f"流式写出完成: {output_srt}, {word_output_file} (共 {writer.segment_count} 个分段)")
+        return segments
+
+    # 收集分段 + 词级时间戳
+    segments, words, _ = run_asr(audio_file, model_size, language, workers, chunk_seconds)
+    write_outputs(segments, words, output_srt, word_output_file)
+
+    return segments
+
+
+def run_asr(audio_file, model_size, language, workers=1, chunk_seconds=60, on_result=None, start=0.0):
+    """
+    识别整段音频，返回 (分段列表, 词级时间戳列表, 音频时长)
+    start大于0时只识别第start秒之后的部分（单进程，时间戳仍相对整段音频）
+    """
+    # 从解码缓存读取16kHz音频，避免每次识别都重新解码
+    audio = load_audio(audio_file)
+    if start > 0:
+        audio = audio[int(start * SAMPLE_RATE):]
+    elif workers > 1:
+        if len(audio) > SAMPLE_RATE * chunk_seconds * 1.5:
+            segments, words = transcribe_chunked(audio_file, model_size, language, workers, chunk_seconds,
+                                                 on_result=on_result)
+            return segments, words, len(audio) / SAMPLE_RATE
+        print("音频较短，不切块，使用单进程识别")
+
+    print(f"正在加载faster-whisper模型: {model_size}")
+    model = WhisperModel(model_size)
+
+    print(f"正在转录音频文件: {audio_file}")
+    segments_gen, info = model.transcribe(
+        np.asarray(audio),
+        language=language,
+        word_timestamps=True,
+        vad_filter=True
+    )
+    segments, words = collect_segments(segments_gen, on_result, offset=start)
+    return segments, words, start + info.duration
+
+
+def find_chunk_bounds(audio, chunk_seconds=60, search_ratio=0.25):
+    """在目标长度附近的静音处切分音频，返回采样点边界列表 [0, ..., len(audio)]"""
+    db, frame_sec = frame_rms_db(audio, SAMPLE_RATE)
+    pauses = find_pauses(db, frame_sec, min_pause=0.2)
+    centers = [(start + end) / 2 for start, end in pauses]
+    duration = len(audio) / SAMPLE_RATE
+
+    bounds = [0.0]
+    while duration - bounds[-1] > chunk_seconds * (1 + search_ratio):
+        target = bounds[-1] + chunk_seconds
+        window = chunk_seconds * search_ratio
+        near = [c for c in centers if abs(c - target) <= window]
+        # 附近没有静音时只能硬切
+        bounds.append(min(near, key=lambda c: abs(c - target)) if near else target)
+    bounds.append(duration)
+    return [int(t * SAMPLE_RATE) for t in bounds]
+
+
+_worker_model = None
+
+
+def _init_chunk_worker(model_size, cpu_threads):
+    """进程池初始化：每个进程各自持有一个模型"""
+    global _worker_model
+    _worker_model = WhisperModel(model_size, cpu_threads=cpu_threads)
+
+
+def _transcribe_chunk(task):
+    """在子进程中识别一个音频块，时间戳加上块的起始偏移
+
+    子进程通过内存映射读取解码缓存中的片段，不在进程间传递音频数据。
+    """
+    audio_file, start, end, language = task
+    offset = start / SAMPLE_RATE
+    audio_chunk = np.asarray(load_audio(audio_file)[start:end])
+    segments_gen, _ = _worker_model.transcribe(
+        audio_chunk,
+        language=language,
+        word_timestamps=True,
+        vad_filter=True
+    )
+    segments, words = collect_segments(segments_gen)
+    segments = [(start + offset, end + offset, text) for start, end, text in segments]
+    words = [(start + offset, end + offset, word) for start, end, word in words]
+    return segments, words
+
+
+def merge_chunk_results(results, tolerance=0.05, on_result=None):
+    """按顺序合并各块的识别结果，去掉块边界处重复的分段和词
+
+    on_result: 每合并完一块就以 (新增分段, 新增词) 调用一次
+    """
+    segments = []
+    words = []
+    for chunk_segments, chunk_words in results:
+        last_seg_end = segments[-1][1] if segments else 0.0
+        last_word_end = words[-1][1] if words else 0.0
+        seg_count, word_count = len(segments), len(words)
+        for seg in chunk_segments:
+            if seg[0] < last_seg_end - tolerance and any(
+                    s[2].strip() == seg[2].strip() for s in segments[-3:]):
+                continue
+            segments.append(seg)
+        for word in chunk_words:
+            if word[0] < last_word_end - tolerance and any(
+                    w[2].strip() == word[2].strip() and w[1] > word[0] - tolerance for w in words[-5:]):
+                continue
+            words.append(word)
+        if on_result:
+            on_result(segments[seg_count:], words[word_count:])
+    return segments, words
+
+
+def transcribe_chunked(audio_file, model_size, language="zh", workers=None, chunk_seconds=60, on_result=None):
+    """将长音频在静音处切成约chunk_seconds秒的块，用进程池并行识别后合并
+
+    Args:
+        audio_file: 音频文件路径（解码结果由audio_cache缓存）
+        workers: 进程数，默认按CPU核数和块数决定
+    """
+    audio = load_audio(audio_file)
+    bounds = find_chunk_bounds(audio, chunk_seconds)
+    tasks = [(audio_file, start, end, language) for start, end in zip(bounds[:-1], bounds[1:])]
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(len(tasks), workers or cpu_count))
+    cpu_threads = max(1, cpu_count // workers)
+
+    print(f"音频时长 {len(audio) / SAMPLE_RATE:.1f} 秒，切分为 {len(tasks)} 块，"
+          f"使用 {workers} 个进程（每进程 {cpu_threads} 线程）并行识别，模型: {model_size}")
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_chunk_worker, initargs=(model_size, cpu_threads)) as pool:
+        # pool.map按顺序产出结果，前面的块完成即可合并写出
+        return merge_chunk_results(pool.map(_transcribe_chunk, tasks), on_result=on_result)
+
+
+def normalize_for_cer(text):
+    """去除标点和空白，只保留用于计算字符错误率的文字"""
+    return re.sub(r'[\W_]+', '', text)
+
+
+def compute_cer(reference, hypothesis):
+    """计算字符错误率（CER）= 编辑次数 / 参考文本字数，忽略标点和空白"""
+    ref = normalize_for_cer(reference)
+    hyp = normalize_for_cer(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    errors = 0
+    matcher = SequenceMatcher(None, ref, hyp, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            errors += max(i2 - i1, j2 - j1)
+    return errors / len(ref)
+
+
+def segment_error_rates(reference, segments):
+    """将识别文本与原文对齐，返回每个分段的字符错误率
+
+    缺字（原文有、识别结果没有）计入相邻的识别分段。
+    """
+    ref = normalize_for_cer(reference)
+    hyp_chars = []
+    owners = []
+    for idx, seg in enumerate(segments):
+        seg_text = normalize_for_cer(seg[2])
+        hyp_chars.append(seg_text)
+        owners.extend([idx] * len(seg_text))
+    hyp = "".join(hyp_chars)
+
+    errors = [0] * len(segments)
+    if not owners:
+        return [1.0] * len(segments)
+
+    matcher = SequenceMatcher(None, ref, hyp, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if j2 > j1:
+            # 替换/多识别：按字符计入所属分段，多出的原文字符计入最后一个分段
+            for j in range(j1, j2):
+                errors[owners[j]] += 1
+            errors[owners[j2 - 1]] += max(0, (i2 - i1) - (j2 - j1))
+        else:
+            # 漏识别：计入前一个字符所属的分段
+            owner = owners[min(j1, len(owners)) - 1] if j1 > 0 else owners[0]
+            errors[owner] += i2 - i1
+
+    return [errors[idx] / max(1, len(hyp_chars[idx])) for idx in range(len(segments))]
+
+
+def merge_time_ranges(ranges, padding=0.3, duration=None):
+    """合并重叠的时间区间，并在两侧留出少量余量"""
+    merged = []
+    for start, end in sorted(ranges):
+        start = max(0.0, start - padding)
+        end = end + padding if duration is None else min(duration, end + padding)
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def splice_ranges(segments, words, new_segments, new_words, ranges):
+    """用大模型在指定时间区间内的识别结果替换小模型的结果"""
+    def in_ranges(start, end):
+        mid = (start + end) / 2
+        return any(r_start <= mid < r_end for r_start, r_end in ranges)
+
+    kept_segments = [seg for seg in segments if not in_ranges(seg[0], seg[1])]
+    kept_words = [w for w in words if not in_ranges(w[0], w[1])]
+    merged_segments = sorted(kept_segments + [seg for seg in new_segments if in_ranges(seg[0], seg[1])])
+    merged_words = sorted(kept_words + [w for w in new_words if in_ranges(w[0], w[1])])
+    return merged_segments, merged_words
+
+
+def transcribe_two_tier(audio_file, content_file, output_srt=None, draft_model="small", model_size="large-v3",
+                        language="zh", word_output_file=None, cer_threshold=0.08, full_rerun_ratio=0.5,
+                        workers=1, chunk_seconds=60):
+    """两级识别：先用小模型转录并与原文计算字符错误率，只将超出阈值的分段用大模型重新识别
+
+    Args:
+        audio_file: 音频文件路径
+        content_file: 原文（配音脚本）文件路径
+        draft_model: 第一遍使用的小模型（tiny/base/small/medium）
+        model_size: 超出阈值时使用的大模型
+        cer_threshold: 字符错误率阈值，超过则升级到大模型
+        full_rerun_ratio: 需要重识别的时长占比超过该值时，直接整段使用大模型
+        workers: 整段识别时的并行进程数
+    """
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"音频文件不存在: {audio_file}")
+    if not os.path.exists(content_file):
+        raise FileNotFoundError(f"原文文件不存在: {content_file}")
+
+    output_srt, word_output_file = default_output_paths(audio_file, output_srt, word_output_file)
+    with open(content_file, "r", encoding="utf-8") as f:
+        reference = f.read()
+
+    segments, words, duration = run_asr(audio_file, draft_model, language, workers, chunk_seconds)
+
+    cer = compute_cer(reference, "".join(seg[2] for seg in segments))
+    print(f"小模型 {draft_model} 字符错误率: {cer:.2%} (阈值: {cer_threshold:.2%})")
+
+    if segments and cer <= cer_threshold:
+        print("小模型识别结果达标，无需大模型重新识别")
+        write_outputs(segments, words, output_srt, word_output_file)
+        return segments
+
+    rates = segment_error_rates(reference, segments)
+    bad_ranges = [(seg[0], seg[1]) for seg, rate in zip(segments, rates) if rate > cer_threshold]
+    ranges = merge_time_ranges(bad_ranges, duration=duration)
+    bad_duration = sum(end - start for start, end in ranges)
+
+    if not segments or bad_duration > duration * full_rerun_ratio:
+        print(f"需要重识别的时长占比过高，整段使用 {model_size} 重新识别")
+        segments, words, _ = run_asr(audio_file, model_size, language, workers, chunk_seconds)
+    else:
+        print(f"正在加载faster-whisper模型: {model_size}")
+        model = WhisperModel(model_size)
+        print(f"使用 {model_size} 重新识别 {len(ranges)} 个区间，共 {bad_duration:.1f} 秒:")
+        for start, end in ranges:
+            print(f"  [{format_timestamp(start)} --> {format_timestamp(end)}]")
+        clip_timestamps = [t for r in ranges for t in r]
+        segments_gen, _ = model.transcribe(
+            np.asarray(load_audio(audio_file)),
+            language=language,
+            word_timestamps=True,
+            clip_timestamps=clip_timestamps
+        )
+        new_segments, new_words = collect_segments(segments_gen)
+        segments, words = splice_ranges(segments, words, new_segments, new_words, ranges)
+
+    cer = compute_cer(reference, "".join(seg[2] for seg in segments))
+    print(f"最终字符错误率: {cer:.2%}")
+    write_outputs(segments, words, output_srt, word_output_file)
     return segments
 
 def transcribe_to_srt_v2(audio_file, output_srt=None, model_size="large-v3", language="zh"):
@@ -137,6 +529,7 @@ def transcribe_to_srt_v2(audio_file, output_srt=None, model_size="large-v3", lan
 
     if segments:
         generate_srt(segments, output_srt)
+        clear_progress(output_srt)
 
         print(f"\n共识别到 {len(segments)} 个分段:")
         for i, seg in enumerate(segments[:5], 1):
@@ -155,24 +548,49 @@ def main():
     """主函数"""
     if len(sys.argv) < 2:
         print("使用方法:")
-        print("python srt_gen.py <音频文件路径> [输出SRT文件路径] [模型大小] [语言代码] [词级时间戳文件路径]")
+        print("python srt_gen.py <音频文件路径> [输出SRT文件路径] [模型大小] [语言代码] [词级时间戳文件路径] [选项]")
         print("\n示例:")
         print("python srt_gen.py qinghuanv.wav")
         print("python srt_gen.py qinghuanv.wav output.srt")
         print("python srt_gen.py qinghuanv.wav output.srt base zh")
         print("python srt_gen.py qinghuanv.wav output.srt base zh words_output.txt")
+        print("python srt_gen.py qinghuanv.wav output.srt large-v3 zh words_output.txt --content content.txt --draft-model small")
+        print("\n选项:")
+        print("  --content FILE          原文文件，启用两级识别（小模型 + 字符错误率校验）")
+        print("  --draft-model MODEL     两级识别第一遍使用的模型（默认: small）")
+        print("  --cer-threshold RATE    字符错误率阈值，超过则使用大模型重识别（默认: 0.08）")
+        print("  --workers N             并行识别进程数，长音频在静音处切成约60秒的块并行识别（默认: 1）")
+        print("  --chunk-seconds SEC     并行识别时每块的目标时长（默认: 60）")
+        print("  --stream                边识别边写出SRT和词级时间戳，并写 <文件>.progress 进度标记；")
+        print("                          上次中途失败时从已落盘的部分接着识别")
         print("\n支持的模型: tiny, base, small, medium, large, large-v2, large-v3")
         print("常用语言代码: zh(中文), en(英文), ja(日文), ko(韩文)")
         return
 
-    audio_file = sys.argv[1]
-    output_srt = sys.argv[2] if len(sys.argv) > 2 else None
-    model_size = sys.argv[3] if len(sys.argv) > 3 else "large-v3"
-    language = sys.argv[4] if len(sys.argv) > 4 else "zh"
-    word_output_file = sys.argv[5] if len(sys.argv) > 5 else None
+    parser = argparse.ArgumentParser(description='语音转字幕工具')
+    parser.add_argument('audio_file', help='音频文件路径')
+    parser.add_argument('output_srt', nargs='?', default=None, help='输出SRT文件路径')
+    parser.add_argument('model_size', nargs='?', default='large-v3', help='模型大小')
+    parser.add_argument('language', nargs='?', default='zh', help='语言代码')
+    parser.add_argument('word_output_file', nargs='?', default=None, help='词级时间戳文件路径')
+    parser.add_argument('--content', help='原文文件路径，指定后启用两级识别')
+    parser.add_argument('--draft-model', default='small', help='两级识别第一遍使用的模型')
+    parser.add_argument('--cer-threshold', type=float, default=0.08, help='字符错误率阈值')
+    parser.add_argument('--workers', type=int, default=1, help='并行识别进程数，大于1时长音频切块并行识别')
+    parser.add_argument('--chunk-seconds', type=float, default=60, help='并行识别时每块的目标时长（秒）')
+    parser.add_argument('--stream', action='store_true', help='边识别边写出，并发布进度标记（不适用于两级识别）')
+    args = parser.parse_args()
 
     try:
-        transcribe_to_srt(audio_file, output_srt, model_size, language, word_output_file)
+        if args.content:
+            transcribe_two_tier(args.audio_file, args.content, args.output_srt,
+                                draft_model=args.draft_model, model_size=args.model_size,
+                                language=args.language, word_output_file=args.word_output_file,
+                                cer_threshold=args.cer_threshold, workers=args.workers,
+                                chunk_seconds=args.chunk_seconds)
+        else:
+            transcribe_to_srt(args.audio_file, args.output_srt, args.model_size, args.language, args.word_output_file,
+                              workers=args.workers, chunk_seconds=args.chunk_seconds, stream=args.stream)
         print("\n转录完成！")
     except Exception as e:
         print(f"转录失败: {str(e)}")
@@ -1,5 +1,6 @@
 import re, sys
 from datetime import datetime, timedelta
+from stream_progress import follow_lines, wait_until_done
 
 def parse_timestamp(ts_str):
     """解析SRT时间戳"""
@@ -9,15 +10,11 @@ def format_timestamp(dt):
     """格式化为SRT时间戳"""
     return dt.strftime("%H:%M:%S,%f")[:-3]
 
-def generate_srt_from_words(words_file, output_srt):
-    with open(words_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    subs = []
+def words_to_subs(lines):
+    """逐行读取词级时间戳，遇到句末标点产出一条字幕 (start, end, text)"""
     current_start = None
     current_end = None
     current_text = ""
-    index = 1
 
     # 正则匹配时间戳行
     pattern = re.compile(r"(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\s+(.*)")
@@ -37,29 +34,41 @@ def generate_srt_from_words(words_file, output_srt):
 
             # 检查单词是否以标点符号结尾
             if word and word[-1] in "，。！？,.!?;；:：":
-                subs.append((
+                yield (
                     format_timestamp(current_start),
                     format_timestamp(current_end),
                     current_text.strip()
-                ))
+                )
                 current_start = None
                 current_end = None
                 current_text = ""
 
     # 最后一句如果没标点，也写入
     if current_text:
-        subs.append((
+        yield (
             format_timestamp(current_start),
             format_timestamp(current_end),
             current_text.strip()
-        ))
+        )
+
+def generate_srt_from_words(words_file, output_srt, follow=False):
+    """由词级时间戳生成SRT；follow为True时跟随srt_gen.py --stream的输出，边识别边写字幕"""
+    if follow:
+        lines = follow_lines(words_file)
+    else:
+        # 上游仍在流式写出时等待其结束
+        wait_until_done(words_file)
+        with open(words_file, "r", encoding="utf-8") as f:
+            lines = f.readlines()
 
     # 写 SRT 文件
     with open(output_srt, "w", encoding="utf-8") as f:
-        for i, (start, end, text) in enumerate(subs, 1):
+        for i, (start, end, text) in enumerate(words_to_subs(lines), 1):
             f.write(f"{i}\n")
             f.write(f"{start} --> {end}\n")
             f.write(f"{text}\n\n")
+            if follow:
+                f.flush()
 
     print(f"SRT字幕文件已生成: {output_srt}")
 
@@ -67,5 +76,5 @@ def generate_srt_from_words(words_file, output_srt):
 if __name__ == "__main__":  
     words_txt = sys.argv[1]
     output_srt = sys.argv[2]
-    generate_srt_from_words(words_txt, output_srt)
-
+    follow = "--follow" in sys.argv[3:]
+    generate_srt_from_words(words_txt, output_srt, follow=follow)
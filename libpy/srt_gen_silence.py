@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静音检测字幕定时工具 - 不做语音识别，根据音频能量包络和原文标点生成SRT字幕
+
+适用于TTS配音：原文已知，只需确定每个分句的起止时间。
+1. 按帧计算RMS能量，找出停顿区间
+2. 按"，。！？"把原文切成分句，按字数比例分配到有声区间
+3. 把分句边界吸附到最近的停顿上
+输出与srt_gen.py相同格式的SRT文件和词级时间戳文件；吸附成功率低于阈值时可回退到Whisper识别。
+
+用法：python srt_gen_silence.py <音频文件> <原文文件> [输出SRT文件] [词级时间戳文件] [--fallback-model large-v3]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+from audio_cache import load_audio, ASR_SAMPLE_RATE
+
+CLAUSE_PUNC = "，。！？"
+
+
+def format_timestamp(seconds):
+    """将秒数转换为SRT时间格式 (HH:MM:SS,mmm)"""
+    millis = int(round(seconds * 1000))
+    hours = millis // 3600000
+    minutes = (millis % 3600000) // 60000
+    secs = (millis % 60000) // 1000
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis % 1000:03d}"
+
+
+def frame_rms_db(samples, rate, frame_ms=20):
+    """按帧计算RMS能量（dB），返回 (每帧能量, 帧长秒数)"""
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), frame_len / rate
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20.0 * np.log10(rms + 1e-10), frame_len / rate
+
+
+def find_pauses(db, frame_sec, silence_db=30.0, min_pause=0.12):
+    """找出停顿区间，返回 [(start, end), ...]（秒）
+
+    低于"95分位能量 - silence_db"的帧视为静音，持续时间不足min_pause的静音忽略。
+    """
+    if len(db) == 0:
+        return []
+    threshold = np.percentile(db, 95) - silence_db
+    silent = np.concatenate(([0], (db < threshold).astype(np.int8), [0]))
+    edges = np.diff(silent)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * frame_sec >= min_pause
+    return [(s * frame_sec, e * frame_sec) for s, e in zip(starts[keep], ends[keep])]
+
+
+def split_clauses(text):
+    """按"，。！？"切分原文，标点保留在分句末尾"""
+    text = re.sub(r"\s+", "", text)
+    return [c for c in re.findall(rf"[^{CLAUSE_PUNC}]+[{CLAUSE_PUNC}]*", text) if c]
+
+
+def clause_weight(clause):
+    """分句的发音字数（不计标点）"""
+    return max(1, len(re.sub(r"[\W_]+", "", clause)))
+
+
+def speech_bounds(pauses, duration):
+    """去掉首尾静音后的有声区间，以及中间的停顿列表"""
+    start, end = 0.0, duration
+    inner = list(pauses)
+    if inner and inner[0][0] <= 0.0:
+        start = inner.pop(0)[1]
+    if inner and inner[-1][1] >= duration - 1e-6:
+        end = inner.pop()[0]
+    return start, end, inner
+
+
+def speech_time_to_abs(t, start, inner):
+    """把"去掉停顿后的说话时间"换算回音频绝对时间"""
+    pos = start + t
+    for p_start, p_end in inner:
+        if pos >= p_start:
+            pos += p_end - p_start
+        else:
+            break
+    return pos
+
+
+def align_clauses(clauses, pauses, duration, snap_ratio=0.5, min_snap=0.4):
+    """按字数比例给分句分配时间，并把分句边界吸附到停顿上
+
+    Returns:
+        (分句时间列表 [(start, end, clause)], 置信度)
+        置信度为成功吸附到停顿的边界占比
+    """
+    start, end, inner = speech_bounds(pauses, duration)
+    speech_len = max(0.0, (end - start) - sum(p_end - p_start for p_start, p_end in inner))
+    weights = np.array([clause_weight(c) for c in clauses], dtype=np.float64)
+    cum = np.cumsum(weights) / weights.sum()
+
+    # 按比例估计每个分句边界的绝对时间
+    estimates = [speech_time_to_abs(f * speech_len, start, inner) for f in cum[:-1]]
+    window = max(min_snap, speech_len / len(clauses) * snap_ratio)
+
+    boundaries = []
+    snapped = 0
+    next_pause = 0
+    for est in estimates:
+        best = None
+        for k in range(next_pause, len(inner)):
+            p_start, p_end = inner[k]
+            center = (p_start + p_end) / 2
+            if center < est - window:
+                continue
+            if center > est + window:
+                break
+            if best is None or abs(center - est) < abs((inner[best][0] + inner[best][1]) / 2 - est):
+                best = k
+        if best is not None:
+            boundaries.append(inner[best])
+            next_pause = best + 1
+            snapped += 1
+        else:
+            prev_end = boundaries[-1][1] if boundaries else start
+            t = max(est, prev_end)
+            boundaries.append((t, t))
+
+    timed = []
+    cur = start
+    for clause, (b_start, b_end) in zip(clauses, boundaries + [(end, end)]):
+        timed.append((cur, max(cur, b_start), clause))
+        cur = b_end
+    confidence = snapped / len(estimates) if estimates else 1.0
+    return timed, confidence
+
+
+def clause_words(timed):
+    """把分句时间均分给每个字，标点附在前一个字上，生成词级时间戳"""
+    words = []
+    for c_start, c_end, clause in timed:
+        units = re.findall(r"[\W_]*[^\W_][\W_]*", clause) or [clause]
+        step = (c_end - c_start) / len(units)
+        for i, unit in enumerate(units):
+            words.append((c_start + i * step, c_start + (i + 1) * step, unit))
+    return words
+
+
+def write_outputs(timed, words, output_srt, word_output_file):
+    """写出SRT字幕文件和词级时间戳文件"""
+    with open(output_srt, "w", encoding="utf-8") as f:
+        for i, (start, end, text) in enumerate(timed, 1):
+            f.write(f"{i}\n")
+            f.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n")
+            f.write(f"{text}\n\n")
+    print(f"SRT字幕文件已生成: {output_srt}")
+
+    with open(word_output_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(f"{format_timestamp(s)} --> {format_timestamp(e)}  {w}" for s, e, w in words))
+    print(f"词级时间戳文件已生成: {word_output_file}")
+
+
+def silence_to_srt(audio_file, content_file, output_srt=None, word_output_file=None, silence_db=30.0,
+                   min_pause=0.12, min_confidence=0.6, fallback_model=None, language="zh"):
+    """根据静音检测和原文标点生成字幕，置信度不足且指定了fallback_model时回退到Whisper识别"""
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"音频文件不存在: {audio_file}")
+    if not os.path.exists(content_file):
+        raise FileNotFoundError(f"原文文件不存在: {content_file}")
+
+    if output_srt is None:
+        output_srt = f"{os.path.splitext(audio_file)[0]}.srt"
+    if word_output_file is None:
+        word_output_file = f"{os.path.splitext(output_srt)[0]}_words.txt"
+
+    begin = time.time()
+    with open(content_file, "r", encoding="utf-8") as f:
+        clauses = split_clauses(f.read())
+    if not clauses:
+        raise ValueError(f"原文为空: {content_file}")
+
+    samples = load_audio(audio_file)
+    duration = len(samples) / ASR_SAMPLE_RATE
+    db, frame_sec = frame_rms_db(samples, ASR_SAMPLE_RATE)
+    pauses = find_pauses(db, frame_sec, silence_db=silence_db, min_pause=min_pause)
+    timed, confidence = align_clauses(clauses, pauses, duration)
+
+    print(f"音频时长: {duration:.2f}秒, 停顿数: {len(pauses)}, 分句数: {len(clauses)}")
+    print(f"边界吸附置信度: {confidence:.2%} (阈值: {min_confidence:.2%})")
+
+    if confidence < min_confidence and fallback_model:
+        print(f"置信度不足，回退到Whisper识别: {fallback_model}")
+        from srt_gen import transcribe_to_srt
+        return transcribe_to_srt(audio_file, output_srt, fallback_model, language, word_output_file)
+
+    write_outputs(timed, clause_words(timed), output_srt, word_output_file)
+    print(f"耗时: {time.time() - begin:.3f}秒")
+    return timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据静音检测和原文标点生成SRT字幕（不做语音识别）')
+    parser.add_argument('audio_file', help='音频文件路径')
+    parser.add_argument('content_file', help='原文文件路径')
+    parser.add_argument('output_srt', nargs='?', default=None, help='输出SRT文件路径')
+    parser.add_argument('word_output_file', nargs='?', default=None, help='词级时间戳文件路径')
+    parser.add_argument('--silence-db', type=float, default=30.0, help='低于95分位能量多少dB视为静音（默认: 30）')
+    parser.add_argument('--min-pause', type=float, default=0.12, help='最短停顿时长，秒（默认: 0.12）')
+    parser.add_argument('--min-confidence', type=float, default=0.6, help='边界吸附置信度阈值（默认: 0.6）')
+    parser.add_argument('--fallback-model', help='置信度不足时回退使用的Whisper模型（如large-v3），不指定则不回退')
+    parser.add_argument('--language', default='zh', help='回退识别使用的语言代码')
+    args = parser.parse_args()
+
+    try:
+        silence_to_srt(args.audio_file, args.content_file, args.output_srt, args.word_output_file,
+                       silence_db=args.silence_db, min_pause=args.min_pause,
+                       min_confidence=args.min_confidence, fallback_model=args.fallback_model,
+                       language=args.language)
+        print("\n字幕定时完成！")
+    except Exception as e:
+        print(f"字幕定时失败: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
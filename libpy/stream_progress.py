@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式输出进度标记 - 识别过程中逐段写出的文件旁边放一个 <文件>.progress 标记
+
+标记是一个JSON文件，原子替换写入：
+    {"state": "running|done|failed", "pid": 123, "bytes": 4096, "segments": 10, "audio_time": 35.2}
+bytes 表示已经fsync落盘、可以安全读取的字节数。下游脚本（srt_final、srt_gen_fromwords）
+可以等待标记变为done后再处理，或者跟随读取已落盘的内容。
+"""
+
+import os
+import json
+import time
+
+
+def progress_path(output_file):
+    """进度标记文件路径"""
+    return f"{output_file}.progress"
+
+
+def write_progress(output_file, **state):
+    """原子写入进度标记"""
+    path = progress_path(output_file)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    state.setdefault("pid", os.getpid())
+    state["updated"] = time.time()
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_progress(output_file):
+    """读取进度标记，不存在时返回None"""
+    try:
+        with open(progress_path(output_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def clear_progress(output_file):
+    """删除进度标记（非流式写出时清理上一次残留的标记）"""
+    try:
+        os.remove(progress_path(output_file))
+    except OSError:
+        pass
+
+
+def _writer_alive(state):
+    pid = state.get("pid")
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def current_state(output_file):
+    """返回进度标记的状态；写入进程已退出但状态仍为running时视为failed"""
+    state = read_progress(output_file)
+    if state and state.get("state") == "running" and not _writer_alive(state):
+        state["state"] = "failed"
+        state.setdefault("error", "写入进程已退出")
+    return state
+
+
+def wait_until_done(output_file, poll=0.5, timeout=None):
+    """等待流式写出结束，返回最终状态；没有进度标记时立即返回None"""
+    begin = time.time()
+    state = current_state(output_file)
+    while state and state.get("state") == "running":
+        if timeout is not None and time.time() - begin > timeout:
+            break
+        time.sleep(poll)
+        state = current_state(output_file)
+    if state and state.get("state") == "failed":
+        print(f"警告: {output_file} 的写出过程未正常结束（{state.get('error', '未知原因')}），只使用已落盘的部分结果")
+    return state
+
+
+def follow_lines(output_file, poll=0.5):
+    """跟随读取流式写出的文件，逐行产出已落盘的完整行，写出结束后返回"""
+    offset = 0
+    pending = b""
+    while True:
+        state = current_state(output_file)
+        limit = state.get("bytes", 0) if state else None
+        if limit is None and os.path.exists(output_file):
+            limit = os.path.getsize(output_file)
+        if limit and limit > offset:
+            with open(output_file, "rb") as f:
+                f.seek(offset)
+                pending += f.read(limit - offset)
+            offset = limit
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8")
+        if not state or state.get("state") != "running":
+            if pending:
+                yield pending.decode("utf-8")
+            return
+        time.sleep(poll)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按预计朗读时长均衡切分文本 - 替代split -l 1（每行一段，段长从几个字到几千字不等）
+
+每行的朗读时长按字数估计，系数用以往生成的语音校准：扫描 data_*/NNN/ 下的文案（content_fix.txt）
+和语音（result.wav），拟合 时长 = 每字秒数 × 字数 + 每段固定开销。
+按原文顺序把行装入各段，使每段接近目标时长；超过目标时长的长行在句末（。！？等）处拆开，
+句子本身不会被拆开。输出文件名与split相同（<前缀>aa、<前缀>ab……），后续流程无需修改。
+
+校准结果在第一次分段时写入输出目录的 partition_calibration.json，之后同一本书一直使用它：
+历史语音不断增加（包括本书刚生成的段），每次重新校准系数都会变化，段的边界随之移动，已渲染的段全部失效。
+--recalibrate 重新校准并覆盖。
+指定 --first-id 时在输出目录写入 part_range.json（本次的段编号范围），concat_parts.py只合并到最后一段为止；
+编号超出本次段数的旧段目录（上次分段更多时留下的）只列出，不删除；确认后加 --prune-stale 才删除。
+
+用法：
+    python text_partition.py <文本文件> <输出前缀> [--target 60] [--head 1] [--calibrate "data_*"]
+                             [--recalibrate] [--first-id 2 [--prune-stale]]
+--target 0 表示每行一段（等同split -l 1）；--head N 表示前N行各自单独成段（如封面）。
+"""
+
+import os
+import re
+import glob
+import json
+import wave
+import shutil
+import argparse
+from itertools import product
+from string import ascii_lowercase
+
+# 没有可用的历史语音时的默认值（普通话朗读约每秒4.5字）
+DEFAULT_SEC_PER_CHAR = 0.22
+DEFAULT_SEC_PER_PART = 0.0
+CALIBRATION_NAME = "partition_calibration.json"
+PART_RANGE_NAME = "part_range.json"
+# 一句：到句末标点为止，句末标点后紧跟的引号、括号归入本句
+SENTENCE = re.compile(r'.+?(?:[。！？!?…；;]+[”’」』"\'）)]*|$)')
+
+
+def char_count(text):
+    """朗读字数：去掉空白后的字符数"""
+    return len(re.sub(r"\s+", "", text))
+
+
+def wav_duration(path):
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+def calibrate(pattern="data_*"):
+    """
+    用以往的文案和语音拟合 (每字秒数, 每段固定开销)
+    样本不足或拟合结果不合理时使用默认值
+    """
+    samples = []
+    for part_dir in glob.glob(os.path.join(pattern, "[0-9][0-9][0-9]")):
+        text_path = os.path.join(part_dir, "content_fix.txt")
+        wav_path = os.path.join(part_dir, "result.wav")
+        if not (os.path.isfile(text_path) and os.path.isfile(wav_path)):
+            continue
+        try:
+            with open(text_path, "r", encoding="utf-8") as f:
+                chars = char_count(f.read())
+            seconds = wav_duration(wav_path)
+        except (OSError, UnicodeDecodeError, wave.Error, EOFError):
+            continue
+        if chars > 0 and seconds > 0:
+            samples.append((chars, seconds))
+
+    if len(samples) >= 5:
+        # 最小二乘拟合 seconds = a * chars + b
+        n = len(samples)
+        mean_c = sum(c for c, _ in samples) / n
+        mean_s = sum(s for _, s in samples) / n
+        var_c = sum((c - mean_c) ** 2 for c, _ in samples)
+        if var_c > 0:
+            a = sum((c - mean_c) * (s - mean_s) for c, s in samples) / var_c
+            b = mean_s - a * mean_c
+            if a > 0 and b >= 0:
+                return a, b, n
+    if samples:
+        return sum(s for _, s in samples) / sum(c for c, _ in samples), 0.0, len(samples)
+    return DEFAULT_SEC_PER_CHAR, DEFAULT_SEC_PER_PART, 0
+
+
+def frozen_calibration(path, pattern="data_*", refresh=False):
+    """
+    读取path中保存的校准结果，没有（或refresh）时校准并保存
+    返回 (每字秒数, 每段固定开销, 样本段数)
+    """
+    if not refresh:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            return saved["sec_per_char"], saved["sec_per_part"], saved["samples"]
+        except (OSError, ValueError, KeyError):
+            pass
+    sec_per_char, sec_per_part, samples = calibrate(pattern)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sec_per_char": sec_per_char, "sec_per_part": sec_per_part, "samples": samples}, f, indent=1)
+    os.replace(tmp_path, path)
+    return sec_per_char, sec_per_part, samples
+
+
+def stale_parts(base_dir, next_id):
+    """编号不小于next_id的段目录名（上次分段更多时留下的）"""
+    if not os.path.isdir(base_dir):
+        return []
+    return [name for name in sorted(os.listdir(base_dir))
+            if re.fullmatch(r"\d{3,}", name) and int(name) >= next_id
+            and os.path.isdir(os.path.join(base_dir, name))]
+
+
+def write_part_range(base_dir, first_id, count):
+    """记录本次分段的段编号范围，合并时忽略范围之外的旧段目录"""
+    path = os.path.join(base_dir, PART_RANGE_NAME)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"first": first_id, "last": first_id + count - 1}, f)
+    os.replace(tmp_path, path)
+
+
+def read_part_range(base_dir):
+    """(第一段编号, 最后一段编号)，没有记录时返回None"""
+    try:
+        with open(os.path.join(base_dir, PART_RANGE_NAME), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        return int(saved["first"]), int(saved["last"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def report_stale_parts(base_dir, first_id, count, prune=False):
+    """记录段编号范围，列出（prune时删除）超出范围的旧段目录"""
+    write_part_range(base_dir, first_id, count)
+    stale = stale_parts(base_dir, first_id + count)
+    if not stale:
+        return
+    if prune:
+        for name in stale:
+            shutil.rmtree(os.path.join(base_dir, name))
+        print(f"已删除超出段数的旧段目录: {', '.join(stale)}")
+    else:
+        print(f"警告: 以下段目录超出本次段数（合并时忽略），确认不需要后可加 --prune-stale 删除: {', '.join(stale)}")
+
+
+def split_sentences(line):
+    """在句末标点后拆分（引号、括号跟随在句末标点之后）"""
+    return [s for s in SENTENCE.findall(line) if s.strip()]
+
+
+def partition(lines, target, sec_per_char=DEFAULT_SEC_PER_CHAR, sec_per_part=DEFAULT_SEC_PER_PART, head=0):
+    """
+    按顺序把行装入各段，返回 [(段文本, 预计秒数), ...]
+    同一行拆出的句子在段内直接相连，不同的行之间保留换行
+    """
+    lines = [line.strip() for line in lines if line.strip()]
+    estimate = lambda text: sec_per_char * char_count(text)
+    parts = [(line, sec_per_part + estimate(line)) for line in lines[:head]]
+    if target <= 0:
+        return parts + [(line, sec_per_part + estimate(line)) for line in lines[head:]]
+
+    # 切分单元：(文本, 是否是新一行的开头)
+    units = []
+    for line in lines[head:]:
+        pieces = split_sentences(line) if estimate(line) > target else [line]
+        units.extend((piece, i == 0) for i, piece in enumerate(pieces))
+
+    current, seconds = "", 0.0
+    for text, new_line in units:
+        d = estimate(text)
+        # 当前段非空，且加入后比不加入离目标更远时，另起一段
+        if current and abs(seconds + d - target) > abs(seconds - target):
+            parts.append((current, sec_per_part + seconds))
+            current, seconds = "", 0.0
+        current += ("\n" if current and new_line else "") + text
+        seconds += d
+    if current:
+        parts.append((current, sec_per_part + seconds))
+    return parts
+
+
+def split_suffixes():
+    """与GNU split默认后缀相同：aa…yz，之后自动加长为zaaa…"""
+    prefix = ""
+    length = 2
+    while True:
+        for letters in product(ascii_lowercase, repeat=length):
+            if letters[0] == "z":
+                break
+            yield prefix + "".join(letters)
+        prefix += "z"
+        length += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按预计朗读时长均衡切分文本（替代split -l 1）')
+    parser.add_argument('input', help='文本文件')
+    parser.add_argument('prefix', help='输出文件前缀（如data_history/text_part_）')
+    parser.add_argument('--target', type=float, default=60, help='每段目标时长（秒，默认: 60；0表示每行一段）')
+    parser.add_argument('--head', type=int, default=0, help='前N行各自单独成段（如封面，默认: 0）')
+    parser.add_argument('--calibrate', default='data_*', help='用于校准语速的历史输出目录（glob，默认: data_*）')
+    parser.add_argument('--sec-per-char', type=float, help='直接指定每字秒数，不做校准')
+    parser.add_argument('--recalibrate', action='store_true', help=f'重新校准并覆盖输出目录中的{CALIBRATION_NAME}')
+    parser.add_argument('--first-id', type=int, help='第一段的段目录编号；指定时记录段编号范围，并列出超出范围的旧段目录')
+    parser.add_argument('--prune-stale', action='store_true', help='删除编号超出本次段数的旧段目录（其中的渲染结果会丢失）')
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(args.prefix) or "."
+    if args.sec_per_char:
+        sec_per_char, sec_per_part, samples = args.sec_per_char, DEFAULT_SEC_PER_PART, 0
+    else:
+        sec_per_char, sec_per_part, samples = frozen_calibration(os.path.join(base_dir, CALIBRATION_NAME),
+                                                                 args.calibrate, args.recalibrate)
+    print(f"语速: 每字 {sec_per_char:.3f} 秒，每段 {sec_per_part:.2f} 秒（校准样本 {samples} 段）")
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        parts = partition(f.readlines(), args.target, sec_per_char, sec_per_part, args.head)
+
+    os.makedirs(base_dir, exist_ok=True)
+    for old in glob.glob(glob.escape(args.prefix) + "*"):
+        os.remove(old)
+    for (text, seconds), suffix in zip(parts, split_suffixes()):
+        with open(args.prefix + suffix, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"{args.prefix}{suffix}: {char_count(text)}字，约{seconds:.0f}秒")
+    if parts:
+        longest = max(seconds for _, seconds in parts)
+        print(f"共 {len(parts)} 段，最长约 {longest:.0f} 秒")
+    if args.first_id is not None:
+        report_stale_parts(base_dir, args.first_id, len(parts), args.prune_stale)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ import sys
 import re
 from datetime import timedelta
 from moviepy.editor import ImageClip, AudioFileClip, CompositeVideoClip, TextClip
+from moviepy.audio.AudioClip import AudioClip
+import numpy as np
 from PIL import Image
 
 
@@ -124,6 +126,30 @@ class VideoMerger:
             if subtitle_ext not in self.supported_subtitle_formats:
                 raise ValueError(f"不支持的字幕格式: {subtitle_ext}")
     
+    def load_audio_clip(self, audio_path):
+        """
+        加载音频剪辑，优先使用解码缓存（audio_cache），避免重复解码
+        
+        Args:
+            audio_path (str): 音频文件路径
+            
+        Returns:
+            AudioClip: 音频剪辑
+        """
+        try:
+            from audio_cache import load_pcm
+            pcm, rate = load_pcm(audio_path)
+
+            # 按块从内存映射中取采样，只转换当前块，不复制整段音频
+            def make_frame(t):
+                index = np.clip(np.round(np.asarray(t) * rate).astype(np.int64), 0, len(pcm) - 1)
+                return pcm[index] / 32768.0
+
+            return AudioClip(make_frame, duration=len(pcm) / rate, fps=rate)
+        except Exception as e:
+            print(f"解码缓存不可用，直接读取音频文件: {e}")
+            return AudioFileClip(audio_path)
+    
     def get_image_info(self, image_path):
         """获取图片信息"""
         with Image.open(image_path) as img:
@@ -292,7 +318,7 @@ class VideoMerger:
             print(f"图片尺寸: {width}x{height}")
             
             # 加载音频文件
-            audio_clip = AudioFileClip(audio_path)
+            audio_clip = self.load_audio_clip(audio_path)
             audio_duration = audio_clip.duration
             print(f"音频时长: {audio_duration:.2f}秒")
             
@@ -391,7 +417,7 @@ class VideoMerger:
             print(f"开始处理（自定义时长模式）...")
             
             # 加载音频文件
-            audio_clip = AudioFileClip(audio_path)
+            audio_clip = self.load_audio_clip(audio_path)
             audio_duration = audio_clip.duration
             
             # 确定最终视频时长
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段工作目录 - 中间文件放在临时目录（如tmpfs），成功后只把声明的最终产物移回段目录
+
+每段会产生十几到二十个中间文件（result.wav、各种.srt/.txt、video.mp4、video_ass.mp4……），
+下游只用到x_final.mp4（中间视频不带音轨时还有result.wav）。指定临时目录后：
+    - 各阶段的输出写到 <临时目录>/<段标识>/，路径固定，失败后重跑可以从断点继续
+    - 成功后把最终产物移到段目录，删除临时目录，并在段目录写入 render_done.json（调用方给出的键，如pipeline.pipeline_key）
+    - 键未变化且最终产物都在时，整段跳过
+    - persist中的文件（流水线清单、语音和识别结果）也保存到段目录，下次运行时先复制回临时目录，
+      修改字幕参数或字体时流水线仍能按清单跳过语音生成和识别，只重跑下游阶段
+      （清单中的键包含路径，临时目录下段的位置固定，同一临时目录下才能复用）
+    - keep=True（调试）时把全部中间文件移回段目录，与不使用临时目录时的布局相同
+不指定临时目录时直接在段目录中工作，行为与原来一致。
+
+用法（shell中查看某段的临时目录）：
+    python workdir.py path <段目录> <临时目录>
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+
+DONE_NAME = "render_done.json"
+FINAL_ARTIFACTS = ("x_final.mp4",)
+
+
+def scratch_path(part_dir, scratch_root):
+    """段在临时目录下的固定位置（不同输出目录下的同名段不冲突）"""
+    part_dir = os.path.abspath(part_dir)
+    tag = hashlib.sha1(part_dir.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(scratch_root, f"{tag}_{os.path.basename(part_dir)}")
+
+
+class PartWorkdir:
+    """
+    一段的工作目录
+    path: 各阶段输出所在的目录（使用临时目录时在临时目录下，否则就是段目录）
+    """
+
+    def __init__(self, part_dir, scratch_root=None, keep=False, finals=FINAL_ARTIFACTS, persist=()):
+        self.part_dir = part_dir
+        self.scratch = bool(scratch_root)
+        self.keep = keep
+        self.finals = list(finals)
+        self.persist = [name for name in persist if name not in self.finals]
+        self.path = scratch_path(part_dir, os.path.abspath(scratch_root)) if self.scratch else part_dir
+        os.makedirs(self.part_dir, exist_ok=True)
+        os.makedirs(self.path, exist_ok=True)
+        if self.scratch:
+            self._seed(list(persist))
+
+    def _seed(self, names):
+        """把段目录中保存的文件复制到临时目录（临时目录中已有的是上次中断时留下的，更新，不覆盖）"""
+        for name in names:
+            src = os.path.join(self.part_dir, name)
+            dst = os.path.join(self.path, name)
+            if os.path.isfile(src) and not os.path.exists(dst):
+                # 保留修改时间，清单中缓存的文件哈希仍然有效
+                shutil.copy2(src, f"{dst}.tmp{os.getpid()}")
+                os.replace(f"{dst}.tmp{os.getpid()}", dst)
+
+    def is_done(self, key):
+        """上次成功时的键与本次相同，且最终产物都在段目录中"""
+        if not self.scratch:
+            return False
+        try:
+            with open(os.path.join(self.part_dir, DONE_NAME), "r", encoding="utf-8") as f:
+                done = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return done.get("key") == key and all(os.path.isfile(os.path.join(self.part_dir, name))
+                                              for name in self.finals)
+
+    def finish(self, key):
+        """把最终产物和persist中的文件（keep时为全部文件）移到段目录，删除临时目录，记录键"""
+        if not self.scratch:
+            return
+        names = sorted(os.listdir(self.path)) if self.keep else self.finals + self.persist
+        for name in names:
+            src = os.path.join(self.path, name)
+            if not os.path.exists(src):
+                if name in self.persist:
+                    continue
+                raise FileNotFoundError(f"缺少最终产物: {src}")
+            dst = os.path.join(self.part_dir, name)
+            if os.path.isdir(src):
+                shutil.rmtree(dst, ignore_errors=True)
+                shutil.move(src, dst)
+                continue
+            # 跨文件系统时先复制为临时文件再改名，段目录中不会出现写了一半的文件
+            tmp_path = f"{dst}.tmp{os.getpid()}"
+            shutil.move(src, tmp_path)
+            os.replace(tmp_path, dst)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+        tmp_path = os.path.join(self.part_dir, f"{DONE_NAME}.tmp{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "finals": self.finals}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.part_dir, DONE_NAME))
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] != "path":
+        print("用法: python workdir.py path <段目录> <临时目录>")
+        sys.exit(1)
+    print(scratch_path(sys.argv[2], sys.argv[3]))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ EFFECT="none"          # 动态效果
 EFFECT_SPEED="1.0"     # 效果速度
 FINAL_ZOOM="1.5"       # 最终放大倍数
 COLOR_ONLY="false"     # 是否只生成纯色背景视频
+NO_AUDIO="false"       # 输出不带音轨（中间视频，音频在最终合成时统一编码一次）
 
 # 显示帮助信息
 show_help() {
@@ -36,6 +37,7 @@ show_help() {
     echo "  -s, --speed SPEED           效果速度(默认: 1.0)"
     echo "  --final-zoom SCALE          最终放大倍数(默认: 1.5，仅用于 zoom_in 效果)"
     echo "  --color-only                只生成纯色背景视频，不需要输入图片文件"
+    echo "  --no-audio                  输出不带音轨（音频只用于确定时长）"
     echo "  --help                      显示此帮助信息"
     echo ""
     echo "示例:"
@@ -181,10 +183,15 @@ generate_video() {
     esac
     
     ffmpeg_cmd="$ffmpeg_cmd[scaled]scale='min(${WIDTH},iw)':'min(${HEIGHT},ih)':force_original_aspect_ratio=decrease[resized];"
-    ffmpeg_cmd="$ffmpeg_cmd[2:v][resized]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2[video];"
-    ffmpeg_cmd="$ffmpeg_cmd[1:a]volume=${AUDIO_VOLUME}[audio]"
-    ffmpeg_cmd="$ffmpeg_cmd\" -map \"[video]\" -map \"[audio]\""
-    ffmpeg_cmd="$ffmpeg_cmd -t ${duration} -r ${FPS} -c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k -pix_fmt yuv420p \"$output_file\""
+    if [[ "$NO_AUDIO" == "true" ]]; then
+        ffmpeg_cmd="$ffmpeg_cmd[2:v][resized]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2[video]"
+        ffmpeg_cmd="$ffmpeg_cmd\" -map \"[video]\" -an"
+    else
+        ffmpeg_cmd="$ffmpeg_cmd[2:v][resized]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2[video];"
+        ffmpeg_cmd="$ffmpeg_cmd[1:a]volume=${AUDIO_VOLUME}[audio]"
+        ffmpeg_cmd="$ffmpeg_cmd\" -map \"[video]\" -map \"[audio]\" -c:a aac -b:a 128k"
+    fi
+    ffmpeg_cmd="$ffmpeg_cmd -t ${duration} -r ${FPS} -c:v libx264 -preset medium -crf 23 -pix_fmt yuv420p \"$output_file\""
     
     echo ""
     echo "执行命令:"
@@ -240,11 +247,15 @@ generate_color_video() {
     
     # 添加淡出效果
     local fade_out_start=$(echo "${duration}-1" | bc)
-    ffmpeg_cmd="$ffmpeg_cmd -filter_complex \"[0:v]fade=t=out:st=${fade_out_start}:d=1[video];"
-    ffmpeg_cmd="$ffmpeg_cmd[1:a]volume=${AUDIO_VOLUME}[audio]\""
-    
-    ffmpeg_cmd="$ffmpeg_cmd -map \"[video]\" -map \"[audio]\""
-    ffmpeg_cmd="$ffmpeg_cmd -t ${duration} -r ${FPS} -c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k -pix_fmt yuv420p \"$output_file\""
+    if [[ "$NO_AUDIO" == "true" ]]; then
+        ffmpeg_cmd="$ffmpeg_cmd -filter_complex \"[0:v]fade=t=out:st=${fade_out_start}:d=1[video]\""
+        ffmpeg_cmd="$ffmpeg_cmd -map \"[video]\" -an"
+    else
+        ffmpeg_cmd="$ffmpeg_cmd -filter_complex \"[0:v]fade=t=out:st=${fade_out_start}:d=1[video];"
+        ffmpeg_cmd="$ffmpeg_cmd[1:a]volume=${AUDIO_VOLUME}[audio]\""
+        ffmpeg_cmd="$ffmpeg_cmd -map \"[video]\" -map \"[audio]\" -c:a aac -b:a 128k"
+    fi
+    ffmpeg_cmd="$ffmpeg_cmd -t ${duration} -r ${FPS} -c:v libx264 -preset medium -crf 23 -pix_fmt yuv420p \"$output_file\""
     
     echo ""
     echo "执行命令:"
@@ -317,6 +328,10 @@ parse_args() {
                 COLOR_ONLY="true"
                 shift
                 ;;
+            --no-audio)
+                NO_AUDIO="true"
+                shift
+                ;;
             --help)
                 show_help
                 exit 0
@@ -1,6 +1,32 @@
 #cover srt
 line_max_chars=15
 ass_font_size=120
+#asr: 两级识别，先用小模型识别并与原文计算字符错误率，超出阈值的区间再用large-v3重识别（none表示直接使用large-v3）
+asr_draft_model=small
+asr_cer_threshold=0.08
+#并行识别进程数，大于1时长音频在静音处切成约60秒的块并行识别
+asr_workers=1
+#流式识别输出（仅asr_draft_model=none时生效）：边识别边写出字幕，下游等待进度标记或跟随读取；中途失败后重跑从已落盘处继续
+asr_stream=false
+#字幕定时引擎: whisper(语音识别) 或 silence(静音检测+原文标点，不做识别，置信度不足时回退到large-v3)
+srt_engine=whisper
+#静态字幕叠加：字幕不加动画(effect none)，预渲染为PNG后用overlay烧录，不再逐帧经过libass
+ass_overlay=false
+#字幕动画效果（ass_overlay=true时固定为none）
+ass_effect=fade
+#中间视频的音频: none(不带音轨，最终合成时按采样拼接各段result.wav，只编码一次AAC) 或 aac(每段视频自带AAC音轨)
+intermediate_audio=none
+#书文本分段的目标朗读时长（秒）：按以往语音校准的语速把行合并/在句末拆分，使各段时长接近；0表示一行一段（split -l 1）
+part_target_seconds=60
+#单次渲染的分段并行数：大于1时part_render把时间轴切成N段各用一个ffmpeg进程编码再流复制拼接（适合多核机器上的长视频）
+render_chunks=1
+#封面背景图缓存（libpy/bg_cache.py）：多段共用的背景图只缩放、加动效一次，各段解码无损的缓存背景；
+#是否更快取决于机器，先用 python libpy/bg_cache.py bench <背景图> 测量，更快时再设为true
+bg_cache=false
+#中间文件的临时目录（如/dev/shm/booktube）：各段的中间文件写在这里，成功后只把x_final.mp4等最终产物移回段目录；空表示直接在段目录中工作
+work_scratch_dir=
+#使用临时目录时仍保留全部中间文件（移回段目录，调试用）
+keep_intermediates=false
 
 # 获取内容图片
 function content_pic_get() {
@@ -93,23 +119,19 @@ function cover_srt_gen() {
         srt_gen $cover_text $cover_voice_file $cover_voice_srt $cover_voice_srt_words $cover_voice_srt_words_punc $cover_voice_srt_final
     fi
     #srt_gen $content_file_fix $content_voice_file $content_srt $content_srt_words $content_srt_words_punc $content_srt_final
-    if [ $bg_color != "black" ]; then
+    #背景参数（图片视频或纯色视频，在下面与字幕、标题一起一次编码生成）
+    if [ $bg_color != "black" ] && [ -f $bg_color ]; then
         echo "图片背景视频"
-        if [ -f $bg_color ]; then
-            cp $bg_color $cover_pic_text_first
-            #生成图片视频
-            rm -f $cover_pic_video
-            #sh image_to_video.sh $cover_pic_text_first $cover_voice_file $cover_pic_video -e zoom_in -s 2.0 --final-zoom 2.0
-            sh libsh/image_to_video.sh $cover_pic_text_first $cover_voice_file $cover_pic_video -e null
-        else
+        cp $bg_color $cover_pic_text_first
+        #sh image_to_video.sh $cover_pic_text_first $cover_voice_file $cover_pic_video -e zoom_in -s 2.0 --final-zoom 2.0
+        cover_bg_args="--image $cover_pic_text_first -e none"
+    else
+        if [ $bg_color != "black" ]; then
             echo "图片不存在，使用黑色背景图片"
-            rm -f $cover_pic_video
-            sh libsh/image_to_video.sh --color-only -b black $cover_voice_file $cover_pic_video
+        else
+            echo "纯色背景视频"
         fi
-    else
-        echo "纯色背景视频"
-        rm -f $cover_pic_video
-        sh libsh/image_to_video.sh --color-only -b black $cover_voice_file $cover_pic_video
+        cover_bg_args="--color-only -b black"
     fi
 
     #字幕校验
@@ -129,17 +151,20 @@ function cover_srt_gen() {
     #     --font "鸿雷板书简体-正式版" --size 120 --color $font_color --effect typewriter --max-chars 5
     python libpy/srt2ass_with_effect.py $cover_voice_srt_final $cover_voice_srt_ass --align $align \
         --font "鸿雷板书简体-正式版" --size $ass_font_size --color $font_color --max-chars $line_max_chars
-    #mp4合并ass
+    #背景、ass字幕和大字标题（title为null时不加）在一个滤镜图中完成，只编码一次
     rm -f $cover_video_ass
-    ffmpeg -i $cover_pic_video -vf "ass=$cover_voice_srt_ass:fontsdir=./sys_font" -c:a copy $cover_video_ass
-
-    #是否在最终的视频上添加大字背景
-    if [ $title != "null" ]; then
-        video_bg_srt_gen $cover_video_ass $title $cover_video_bg_srt
-        cp $cover_video_bg_srt $cover_pic_dir/x_final.mp4
-    else
-        cp $cover_video_ass $cover_pic_dir/x_final.mp4
+    local cover_audio_args=""
+    if [ "$intermediate_audio" == "none" ]; then
+        cover_audio_args="--no-audio"
+    fi
+    #bg_cache=true时封面背景图（sys_picture中的同一张图）的缩放和叠加只做一次，各段解码缓存的背景视频（纯黑背景不缓存）
+    local cover_cache_args=""
+    if [ "$bg_cache" == "true" ]; then
+        cover_cache_args="--bg-cache"
     fi
+    python libpy/part_render.py $cover_voice_file $cover_video_ass $cover_bg_args $cover_cache_args \
+        --ass $cover_voice_srt_ass --title "$title" $cover_audio_args --chunks $render_chunks
+    cp $cover_video_ass $cover_pic_dir/x_final.mp4
 }
 
 function content_video_pic_gen() {
@@ -150,11 +175,38 @@ function content_video_pic_gen() {
     #sh image_to_video.sh $local_pic $local_voice_file $local_content_video -e kenburns
     #sh image_to_video.sh $local_pic $local_voice_file $local_content_video -e fade
     #sh image_to_video.sh $local_pic $local_voice_file $local_content_video -e move_down
-    sh libsh/image_to_video.sh $local_pic $local_voice_file $local_content_video -e null
+    local local_audio_args=""
+    if [ "$intermediate_audio" == "none" ]; then
+        local_audio_args="--no-audio"
+    fi
+    sh libsh/image_to_video.sh $local_pic $local_voice_file $local_content_video -e null $local_audio_args
 }
 
 #content_video_pic_gen
 
+function srt_asr() {
+    #语音识别，输出原始字幕和逐字时间
+    local_content=$1
+    local_voice=$2
+    local_srt=$3
+    local_srt_words=$4
+    local asr_stream_flag=""
+    if [ $asr_stream == "true" ] && [ $srt_engine != "silence" ] && [ $asr_draft_model == "none" ]; then
+        #流式识别保留上次中途失败时已落盘的部分结果，srt_gen.py按进度标记接着识别（来源不同时重新开始）
+        asr_stream_flag="--stream"
+    else
+        rm -f $local_srt $local_srt_words $local_srt.progress $local_srt_words.progress
+    fi
+    if [ $srt_engine == "silence" ]; then
+        python libpy/srt_gen_silence.py $local_voice $local_content $local_srt $local_srt_words --fallback-model large-v3
+    elif [ $asr_draft_model != "none" ]; then
+        python libpy/srt_gen.py $local_voice $local_srt large-v3 zh $local_srt_words \
+            --content $local_content --draft-model $asr_draft_model --cer-threshold $asr_cer_threshold --workers $asr_workers
+    else
+        python libpy/srt_gen.py $local_voice $local_srt large-v3 zh $local_srt_words --workers $asr_workers $asr_stream_flag
+    fi
+}
+
 function srt_gen() {
     #语音转字幕
     local_content=$1
@@ -163,8 +215,8 @@ function srt_gen() {
     local_srt_words=$4
     local_srt_words_punc=$5
     local_srt_final=$6
-    rm -f $local_srt $local_srt_words $local_srt_final
-    python libpy/srt_gen.py $local_voice $local_srt large-v3 zh $local_srt_words
+    rm -f $local_srt_final
+    srt_asr $local_content $local_voice $local_srt $local_srt_words
     #python srt_punc_map.py $local_content $local_srt_words $local_srt_words_punc
     python libpy/srt_final.py $local_content $local_srt_words $local_srt_words_punc
     python libpy/srt_gen_fromwords.py $local_srt_words_punc $local_srt_final
@@ -188,8 +240,14 @@ function srt_fix() {
 function srt_ass_gen() {
     local_correct_srt=$1
     local_srt_ass=$2
+    local_overlay_dir=${local_srt_ass%.*}_overlay
+    rm -rf $local_overlay_dir
+    local_overlay_args=""
+    if [ "$ass_overlay" == "true" ]; then
+        local_overlay_args="--effect none --overlay-dir $local_overlay_dir"
+    fi
     python libpy/srt2ass_with_effect.py  --align 5 --font "鸿雷板书简体-正式版" --size $ass_font_size \
-        --color red $local_correct_srt $local_srt_ass --max-chars $line_max_chars
+        --color red $local_correct_srt $local_srt_ass --max-chars $line_max_chars --effect $ass_effect $local_overlay_args
 }
 
 # 添加背景文字（可选）
@@ -198,7 +256,8 @@ function video_bg_srt_gen() {
     local_title=$2
     local_video_bg_srt=$3
     rm -f $local_video_bg_srt
-    ffmpeg -i $local_video -vf "drawtext=text='$local_title':fontfile=./sys_font/Aa剑豪体.ttf:fontsize=160:fontcolor=red@0.8:x=(W-tw)/2:y=100:" $local_video_bg_srt
+    local_title_font=$(python libpy/font_subset.py font ./sys_font/Aa剑豪体.ttf "$local_title")
+    ffmpeg -i $local_video -vf "drawtext=text='$local_title':fontfile=$local_title_font:fontsize=160:fontcolor=red@0.8:x=(W-tw)/2:y=100:" -c:a copy $local_video_bg_srt
 }
 
 # 用新字体生成mp4字幕文件
@@ -208,7 +267,15 @@ function gen_ass_video() {
     local_ass_video=$3
     rm -f $local_ass_video
     #ffmpeg -i jiqimao/result_video_rotate.mp4 -vf "ass=jiqimao/result_srt.ass" -c:a copy output.mp4
-    ffmpeg -i $local_srt_video -vf "ass=$local_ass_file:fontsdir=./sys_font" -c:a copy $local_ass_video
+    local_overlay_filter=${local_ass_file%.*}_overlay/filter.txt
+    if [ "$ass_overlay" == "true" ] && [ -f $local_overlay_filter ]; then
+        #静态字幕已预渲染为PNG，按滤镜脚本叠加，只有动画字幕经过libass
+        ffmpeg -i $local_srt_video -filter_complex_script $local_overlay_filter -map "[vout]" -map "0:a?" -c:a copy $local_ass_video
+        return
+    fi
+    #只加载字幕实际用到的字形子集，按字符集合哈希缓存在sys_cache/fonts
+    local_fonts_dir=$(python libpy/font_subset.py ass $local_ass_file)
+    ffmpeg -i $local_srt_video -vf "ass=$local_ass_file:fontsdir=$local_fonts_dir" -c:a copy $local_ass_video
 }
 
 # 视频添加水印
@@ -219,75 +286,85 @@ function video_add_watermark() {
     local_video_pre_header=$local_video"_pre_text.mp4"
     if [ $pre_text != "null" ]; then
         rm -f $local_video_pre_header
-        ffmpeg -i $local_video -vf "drawtext=text='$pre_text':fontfile=./sys_font/鸿雷板书简体-正式版.ttf:fontsize=36:fontcolor=white:x=10:y=10" $local_video_pre_header
+        pre_text_font=$(python libpy/font_subset.py font ./sys_font/鸿雷板书简体-正式版.ttf "$pre_text")
+        ffmpeg -i $local_video -vf "drawtext=text='$pre_text':fontfile=$pre_text_font:fontsize=36:fontcolor=white:x=10:y=10" -c:a copy $local_video_pre_header
     fi
 
     if [ $pre_text != "null" ] && [ $post_text != "null" ]; then
         local_video_post_header=$local_video"_post_text.mp4"
         rm -f $local_video_post_header
         #ffmpeg -i $local_video_pre_header -vf "drawtext=text='@版权所有':fontfile=./font/鸿雷板书简体-正式版.ttf:fontsize=36:fontcolor=white@0.8:x=W-tw-10:y=10:shadowcolor=black:shadowx=2:shadowy=2" $local_video_post_header
-        ffmpeg -i $local_video_pre_header -vf "drawtext=text='$post_text':fontfile=./sys_font/鸿雷板书简体-正式版.ttf:fontsize=36:fontcolor=white:x=W-tw-10:y=10" $local_video_post_header
+        post_text_font=$(python libpy/font_subset.py font ./sys_font/鸿雷板书简体-正式版.ttf "$post_text")
+        ffmpeg -i $local_video_pre_header -vf "drawtext=text='$post_text':fontfile=$post_text_font:fontsize=36:fontcolor=white:x=W-tw-10:y=10" -c:a copy $local_video_post_header
     fi 
 }
 
+#内容页视频：由libpy/pipeline.py按依赖执行各阶段（语音、识别、字幕、图片视频、烧录），输入和参数未变化的阶段直接跳过
+#第五个参数（原jump_long_time，跳过内容图和语音）已不需要：内容图只在不存在时获取，语音在文案和音色不变时自动跳过
 function content_video_gen() {
     local_dir=$1
     local_title=$2
     local_content_file=$3
     voice=$4
-    jump_long_time=$5
     pic_content_file=$local_dir/pic_content.txt
     content_file=$local_dir/content.txt
     content_file_fix=$local_dir/content_fix.txt
-    content_video=$local_dir/video.mp4
-    content_video_ass=$local_dir/video_ass.mp4
-    content_voice_file=$local_dir/result.wav
-    content_srt=$local_dir/content.srt
-    content_srt_words=$local_dir/content_srt_words.txt
-    content_srt_words_punc=$local_dir/content_srt_words_punc.txt
-    content_srt_final=$local_dir/content_srt_final.srt
-    content_correct_srt=$local_dir/content_corrected.srt
-    content_correct_srt_merge=$local_dir/content_corrected_merge.srt
-    content_correct_ass=$local_dir/content_corrected.ass
     content_pic=$local_dir/pic_cover_0.jpg
 
     mkdir -p $local_dir
 
-    if [ $jump_long_time == "jump_false" ]; then
-        #生成内容图
+    #内容图只在不存在时获取
+    if [ ! -f $content_pic ]; then
         if [ -f $local_title ]; then
             cp $local_title $pic_content_file
         else
             echo $local_title > $pic_content_file
         fi
         content_pic_get $local_dir $pic_content_file
-        #如果内容图不存在，则退出
         if [ ! -f $content_pic ]; then
             echo "图片文件下载失败，exit"
             exit 1
         fi
-        #生成语音
-        echo "我步入丛林，因为我希望生活得有意义……以免在临终时，发现自己从来没有活过。" > $content_file
-        if [ -f $local_content_file ]; then
-            cp $local_content_file $content_file
+    fi
+    echo "我步入丛林，因为我希望生活得有意义……以免在临终时，发现自己从来没有活过。" > $content_file
+    if [ -f $local_content_file ]; then
+        cp $local_content_file $content_file
+    fi
+    content_fix $content_file $content_file_fix
+    python libpy/pipeline.py $local_dir --content $content_file_fix --pic $content_pic --voice $voice \
+        --var srt_engine=$srt_engine --var asr_draft_model=$asr_draft_model --var asr_cer_threshold=$asr_cer_threshold \
+        --var asr_workers=$asr_workers --var asr_stream=$asr_stream --var ass_font_size=$ass_font_size \
+        --var line_max_chars=$line_max_chars --var ass_effect=$ass_effect --var ass_overlay=$ass_overlay \
+        --var intermediate_audio=$intermediate_audio $(scratch_args) || exit 1
+}
+
+#整本书按段并发渲染（语音、识别、ffmpeg分别限制并发数），输出到 $2/NNN/x_final.mp4
+function book_render() {
+    local_book_file=$1
+    local_base_dir=$2
+    voice=$3
+    python libpy/book_renderer.py $local_book_file $local_base_dir --voice $voice \
+        --var srt_engine=$srt_engine --var asr_draft_model=$asr_draft_model --var asr_cer_threshold=$asr_cer_threshold \
+        --var asr_workers=$asr_workers --var asr_stream=$asr_stream --var ass_font_size=$ass_font_size \
+        --var line_max_chars=$line_max_chars --var ass_effect=$ass_effect --var ass_overlay=$ass_overlay \
+        --var intermediate_audio=$intermediate_audio --target $part_target_seconds $(scratch_args)
+}
+
+#流水线的工作目录参数（work_scratch_dir、keep_intermediates）
+function scratch_args() {
+    if [ -n "$work_scratch_dir" ]; then
+        echo "--scratch $work_scratch_dir"
+        if [ "$keep_intermediates" == "true" ]; then
+            echo "--keep-intermediates"
         fi
-        #原文纠错（去引用）
-        content_fix $content_file $content_file_fix
-        #语音生成
-        #cover_voice_gen "$(cat $content_file)" $dir
-        voice_gen $content_file_fix $local_dir $voice
-        #生成视频
-        content_video_pic_gen $content_pic $content_voice_file $content_video
     fi
+}
 
-    #生成字幕
-    srt_gen $content_file_fix $content_voice_file $content_srt $content_srt_words $content_srt_words_punc $content_srt_final
-    #字幕转ass
-    srt_ass_gen $content_srt_final $content_correct_ass
-    #生成带ass字幕的视频
-    gen_ass_video $content_video $content_correct_ass $content_video_ass
-    #生成最终视频
-    cp  $content_video_ass $local_dir/x_final.mp4
+#最终合成时的音频参数：中间视频不带音轨时，从各段目录的result.wav拼接旁白
+function final_audio_args() {
+    if [ "$intermediate_audio" == "none" ]; then
+        echo "--part-wav result.wav"
+    fi
 }
 
 #整体添加bgm
@@ -308,6 +385,17 @@ function split_file_txt() {
     split -l $line_num $local_file_txt $prefix
 }
 
+#按预计朗读时长均衡分段（part_target_seconds），文件命名与split相同；第三个参数为单独成段的开头行数（如封面），
+#第四个参数为第一段的目录编号（默认002），编号超出段数的旧段目录合并时忽略（只列出不删除）；语速校准结果固定在输出目录的partition_calibration.json
+function partition_file_txt() {
+    local_file_txt=$1
+    prefix=$2
+    head_lines=${3:-0}
+    first_id=${4:-2}
+    python libpy/text_partition.py $local_file_txt $prefix --target $part_target_seconds --head $head_lines \
+        --first-id $first_id
+}
+
 function ds() {
     mkdir -p ai_responses_tmp ai_responses
     for file in $(ls ai_responses_tmp/*.md); do
@@ -9,21 +9,11 @@ function merge() {
 
     mkdir -p $base_dir
 
-    max_num=100
-    rm -f $video_list
-    for((i=0;i<$max_num;i++)); do
-        dir=$base_dir/$00$i
-        mp4_file=$dir/x_final.mp4
-        if [ -f $mp4_file ]; then   
-            echo "file '$mp4_file'" >> $video_list
-        else
-            break
-        fi
-    done
-    # 合并视频
-    rm -f $final_video $bgm_video
-    ffmpeg -f concat -safe 0 -i $video_list -c copy $final_video
-    video_add_bgm $final_video $bgm_file $bgm_video
+    # 按编号扫描全部段（缺失的段跳过），检查编码参数并只重新编码不一致的段
+    python libpy/concat_parts.py $base_dir --list-out $video_list
+    # 合并视频并混入背景音乐（一次完成）
+    rm -f $bgm_video
+    python libpy/final_assemble.py $bgm_video --list $video_list --bgm $bgm_file -v 0.4 -l -f 1 -F 1 $(final_audio_args)
     
     # 删除临时文件
     #rm video_list.txt
@@ -40,12 +30,12 @@ function all() {
     #cover_srt_gen $base_dir/001 "《${title}》" "《${title}》" sys_picture/cover_pic_heng_169.jpg white bottom $voice srt_gen_on
     #cover_srt_gen 001 "毛姆的《${title}》" "《${title}》" black white bottom
     #内容页视频
-    #对file_txt进行分段，一行一个文件，并且添加文件后缀
+    #对file_txt按预计朗读时长分段，每段一个文件，并且添加文件后缀
     id=1
     mkdir -p $base_dir
     prefix=$base_dir/text_part_
     rm -rf $prefix*
-    split_file_txt $file_txt 1 $prefix
+    partition_file_txt $file_txt $prefix
     for file in $(ls $prefix*); do
         id=$(($id+1))
         dir_id="$(printf "%03d" $id)"
@@ -59,4 +49,11 @@ function all() {
     done
 }
 
+#并发渲染全部内容页（替代all中的逐段循环），之后用merge合并
+function all_parallel() {
+    voice=guodegang
+    file_txt=ai_responses_plain.txt
+    book_render $file_txt $base_dir $voice
+}
+
 func $1
\ No newline at end of file
@@ -13,28 +13,14 @@ function merge() {
 
     mkdir -p $base_dir
 
-    max_num=100
-    rm -f $video_list
-    for((i=0;i<$max_num;i++)); do
-        dir_id="$(printf "%03d" $i)"
-        dir=$base_dir/$dir_id
-        mp4_file=$dir/x_final.mp4
-        if [ -f $mp4_file ]; then   
-            echo "$mp4_file"
-            # 使用绝对路径，确保ffmpeg能正确找到文件
-            abs_path=$(realpath $mp4_file)
-            echo "file '$abs_path'" >> $video_list
-        else
-            echo "not found: $mp4_file"
-            break
-        fi
-    done
-    # 合并视频
-    rm -f $final_video $bgm_video
+    # 按编号扫描全部段（缺失的段跳过），检查编码参数并只重新编码不一致的段
+    python libpy/concat_parts.py $base_dir --list-out $video_list
+    # 合并视频、背景音乐和水印一次编码完成（输出文件名与原video_add_watermark一致）
+    final_deliver=$bgm_video"_post_text.mp4"
+    rm -f $final_deliver
     # 确保在项目根目录下执行ffmpeg命令
-    ffmpeg -f concat -safe 0 -i $video_list -c copy $final_video
-    video_add_bgm $final_video $bgm_file $bgm_video
-    video_add_watermark $bgm_video "《一句顶一万句》——刘震云" "@kumi的读书日记"
+    python libpy/final_assemble.py $final_deliver --list $video_list --bgm $bgm_file -v 0.4 -l -f 1 -F 1 $(final_audio_args) \
+        --pre-text "《一句顶一万句》——刘震云" --post-text "@kumi的读书日记"
     
     # 删除临时文件
     #rm video_list.txt
@@ -50,7 +36,7 @@ function all() {
     #封面视频
     
     #内容页视频
-    #对file_txt进行分段，一行一个文件，并且添加文件后缀
+    #对file_txt按预计朗读时长分段，每段一个文件，并且添加文件后缀
     id=-1
     jump_to_id=-14
     jump_flag=jump_true
@@ -59,7 +45,7 @@ function all() {
     mkdir -p $base_dir
     prefix=$base_dir/text_part_
     rm -rf $prefix*
-    split_file_txt $file_txt 1 $prefix
+    partition_file_txt $file_txt $prefix 1 0
     for file in $(ls $prefix*); do
         id=$(($id+1))
         if [ $jump_to_id -lt 0 ]; then